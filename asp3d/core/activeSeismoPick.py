@@ -5,7 +5,6 @@
 #   This file is part of ActiveSeismoPick3D
 #----------------------------------------------------------------------------
 
-import math
 import numpy as np
 import os
 import sys
@@ -13,19 +12,86 @@ from datetime import datetime
 
 from asp3d.core import seismicArrayPreparation
 from asp3d.core import seismicshot
+from asp3d.core.picktable import PickTable
+from asp3d.core.surveystore import isSurveyStore
+from asp3d.core.surveystore import loadSurveyStore
+from asp3d.core.surveystore import saveSurveyStore
+from asp3d.core.waveformcache import WaveformCache
 from asp3d.gui.threads import Multipicker_Thread
 from asp3d.util.surveyUtils import cleanUp
-from asp3d.util.utils import worker
-
-
-def picker(st_tuple):
-    shot, traceID = st_tuple
-    return (shot.getShotnumber(), traceID, shot.pickTrace(traceID))
+from asp3d.util.utils import iworker
+from asp3d.util.utils import iworkerPrefetch
+
+
+def picker(shot_tuple):
+    '''
+    Picks all traces of a single shot, filters the picks by SNR and sets the earliest and
+    latest possible picks. Used as function for the picking processes.
+
+    :param: shot_tuple, (shot, paras, traceIDs, snrthresholds, cachedir). shot can either be a SeismicShot [object]
+    or the path of its data file. In the latter case the shot is read inside the process (using the waveform
+    cache in cachedir) and paras (SeismicShot.getParas()), traceIDs and snrthresholds are used to restore its state.
+    :type: tuple
+
+    Returns a tuple (shotnumber, traceIDs, values) with values containing the PickTable columns of the traces.
+    '''
+    shot, paras, traceIDs, snrthresholds, cachedir = shot_tuple
+    if not isinstance(shot, seismicshot.SeismicShot):
+        shot = seismicshot.SeismicShot(shot, cachedir=cachedir)
+        for name, value in paras.items():
+            shot.setParameters(name, value)
+        shot.traceIDs = list(traceIDs)
+        shot.removeEmptyTraces()
+        for traceID, snrthreshold in zip(traceIDs, snrthresholds):
+            shot.setSNRthreshold(traceID, snrthreshold)
+
+    shot.pickAllTraces()
+    shot.filterSNR()
+    shot.setEarllatepicks()
+
+    traceIDs = np.array(shot.getTraceIDlist(), dtype=int)
+    table = shot.getPickTable()
+    values = table.getValues(table.addRows(shot.getShotnumber(), traceIDs))
+    return shot.getShotnumber(), traceIDs, values
+
+
+def loadShot(shot_tuple):
+    '''
+    Reads the data file of a shot and prepares the shot for the survey (shotnumber, coordinates,
+    removal of traces without receiver or without data, initial pickwindow).
+    Can be used in parallel (see Survey._generateSurvey).
+
+    :param: shot_tuple, ((shotnumber, obsfile, receiverCoords, sourceCoords, lazy, cachedir), filedata).
+    filedata is the content of obsfile (or None, to read the file inside this function)
+
+    Returns (shotnumber, shot, removed, deleted). removed: traceIDs of traces in the data file without receiver,
+    deleted: traceIDs of receivers without data. The shot is returned without receiver coordinates.
+    '''
+    (shotnumber, obsfile, receiverCoords, sourceCoords, lazy, cachedir), filedata = shot_tuple
+    shot = seismicshot.SeismicShot(obsfile, lazy=lazy, cachedir=cachedir, filedata=filedata)
+    shot.setShotnumber(shotnumber)
+    shot.setReceiverCoords(receiverCoords)
+    shot.setSourceCoords(sourceCoords)
+    removed = shot.removeEmptyTraces()
+    deleted = shot.updateTraceList()
+    shot.setInitialPickwindow()
+    # receiver coordinates are shared between the shots of a survey, they are set again afterwards
+    shot.setReceiverCoords(None)
+    return shotnumber, shot, removed, deleted
+
+
+def _readShotFile(shot_tuple):
+    # prefetching of the data files for loadShot, files are read from the waveform cache if there is one
+    obsfile, cachedir = shot_tuple[1], shot_tuple[5]
+    if cachedir is not None:
+        return
+    with open(obsfile, 'rb') as infile:
+        return infile.read()
 
 
 class Survey(object):
     def __init__(self, path, sourcefile=None, receiverfile=None, seisArray=None, useDefaultParas=False, fstart=None,
-                 fend=None):
+                 fend=None, lazy=False, maxMemory=None, cachedir=None, cores=1, progressCallback=None):
         '''
         The Survey Class contains all shots [class: Seismicshot] of a survey
         as well as the aquisition geometry and the topography.
@@ -34,20 +100,41 @@ class Survey(object):
 
         It contains several methods e.g. for plotting of all picks (and postprocessing),
         creating plots for all shots.
+
+        :param: lazy, only read the trace headers when generating the survey, waveform data is read on demand
+        :type: bool
+
+        :param: maxMemory, memory budget for the waveform data of a lazy survey [MB]. If exceeded,
+        the data of the least recently used shots is released. None for no limit.
+        :type: float
+
+        :param: cachedir, directory for a binary cache of the waveform data. It is written when a data file is
+        read for the first time and used instead of the data file as long as the file is not modified.
+        :type: string
+
+        :param: cores, number of processes reading the data files, 'max' for all CPUs. If larger than 1,
+        the data files are read by a pool of threads and decoded by a pool of processes.
+        :type: int
+
+        :param: progressCallback, called as progressCallback(processed, total) after every loaded shot
+        :type: function
         '''
         self.data = {}
+        self._cachedir = cachedir
+        self._waveformCache = WaveformCache(maxMemory) if lazy else None
         self.seisarray = seisArray
         self._topography = None
         self._recfile = receiverfile
         self._sourcefile = sourcefile
         self._obsdir = path
-        self._generateSurvey(fstart, fend)
-        self._initiate_SRfiles()
+        self._initiateCoords()
+        self._generateSurvey(fstart, fend, cores, progressCallback)
+        self._setTwoDim()
         if useDefaultParas == True:
             self.setParametersForAllShots()
-        self._removeAllEmptyTraces()
-        self._updateShots()
-        self.setInitialPickwindow()
+            # the initial pickwindow also sets the cut window of the shots
+            self.setInitialPickwindow()
+        self._initPickTable()
         self.picked = False
 
     def _coordsFromSeisArray(self):
@@ -80,7 +167,7 @@ class Survey(object):
             z = float(line[3])
             self._sourceCoords[sourceID] = (x, y, z)
 
-    def _initiate_SRfiles(self):
+    def _initiateCoords(self):
         if self._recfile == None and self._sourcefile == None:
             if self.seisarray == None:
                 raise RuntimeError('No SeisArray defined. No source or receiver file given.')
@@ -88,18 +175,24 @@ class Survey(object):
         else:
             self._coordsFromFiles()
             self.loadArray(self._obsdir, self._recfile, self._sourcefile)
+
+    def _initiate_SRfiles(self):
+        self._initiateCoords()
         for shotnumber in self.data.keys():
             shot = self.data[shotnumber]
             shot.setShotnumber(shotnumber)
             shot.setReceiverCoords(self._receiverCoords)
             shot.setSourceCoords(self._sourceCoords[shotnumber])
+        self._setTwoDim()
+
+    def _setTwoDim(self):
         if self.check2D():
             print('Survey is two dimensional!')
             self.twoDim = True
         else:
             self.twoDim = False
 
-    def _generateSurvey(self, fstart=None, fend=None):
+    def _generateSurvey(self, fstart=None, fend=None, cores=1, progressCallback=None):
         shot_dict = {}
         shotlist = self.getShotlist()
         obsfiles = []
@@ -108,61 +201,71 @@ class Survey(object):
             # fileending = '.sg2'
             if fend == None:
                 fend = '_pickle.dat'
-            obsfile=os.path.join(self._obsdir, fstart + str(shotnumber)) + fend
+            obsfile = os.path.abspath(os.path.join(self._obsdir, fstart + str(shotnumber)) + fend)
             if not os.path.exists(obsfile):
                 print('File {filename} does not exist'.format(filename=obsfile))
                 continue
             obsfiles.append((shotnumber, obsfile))
-            
-        for shotnumber, obsfile in obsfiles:
-            if obsfile not in shot_dict.keys():
-                shot_dict[shotnumber] = []
-            shot_dict[shotnumber] = seismicshot.SeismicShot(obsfile)
-            shot_dict[shotnumber].setParameters('shotnumber', shotnumber)
 
         if not len(obsfiles) > 0:
             raise ValueError('No files found.')
-        
-        self.data = shot_dict
+
+        shotlist_load = [(shotnumber, obsfile, self._receiverCoords, self._sourceCoords[shotnumber],
+                          self.isLazy(), self.getCachedir()) for shotnumber, obsfile in obsfiles]
+        if cores == 1:
+            results = (loadShot((shot_tuple, None)) for shot_tuple in shotlist_load)
+        else:
+            results = iworkerPrefetch(loadShot, shotlist_load, _readShotFile, cores)
+
+        removed_dict = {}
+        for count, (shotnumber, shot, removed, deleted) in enumerate(results, 1):
+            shot.setReceiverCoords(self._receiverCoords)
+            shot._waveformCache = self._waveformCache
+            shot_dict[shotnumber] = shot
+            removed_dict[shotnumber] = (removed, deleted)
+            if progressCallback is not None:
+                progressCallback(count, len(obsfiles))
+
+        # keep the order of the shotlist
+        self.data = dict((shotnumber, shot_dict[shotnumber]) for shotnumber, obsfile in obsfiles)
         print ("Generated Survey object for %d shots" % len(shotlist))
         print ("Total number of traces: %d \n" % self.countAllTraces())
+        self._logRemovedTraces([(shotnumber,) + removed_dict[shotnumber] for shotnumber, obsfile in obsfiles])
 
-    def _removeAllEmptyTraces(self):
+    def _logRemovedTraces(self, removed_list):
         '''
-        Removes traces of the dataset that are not found in the input receiver files.
+        Writes the traces removed by loadShot to log files.
+
+        :param: removed_list, (shotnumber, removed, deleted) for every shot of the survey
+        :type: list
         '''
+        # traces of the dataset that are not found in the input receiver files
         logfile = 'removeEmptyTraces.out'
         count = 0
-        for shot in self.data.values():
-            removed = shot.removeEmptyTraces()
+        for shotnumber, removed, del_traceIDs in removed_list:
             if removed is not None:
                 if count == 0: outfile = open(logfile, 'w')
                 count += 1
                 outfile.writelines('shot: %s, removed empty traces: %s\n'
-                                   % (shot.getShotnumber(), removed))
+                                   % (shotnumber, removed))
         print ("\nremoveEmptyTraces: Finished! Removed %d traces" % count)
         if count > 0:
             print ("See %s for more information "
                    "on removed traces." % (logfile))
             outfile.close()
 
-    def _updateShots(self):
-        '''
-        Removes traces that do not exist in the dataset for any reason,
-        but were set in the input files.
-        '''
+        # traces that do not exist in the dataset for any reason, but were set in the input files
         logfile = 'updateShots.out'
         count = 0
         countTraces = 0
-        for shot in self.data.values():
-            del_traceIDs = shot.updateTraceList()
+        for shotnumber, removed, del_traceIDs in removed_list:
             if len(del_traceIDs) > 0:
                 if count == 0: outfile = open(logfile, 'w')
                 count += 1
                 countTraces += len(del_traceIDs)
                 outfile.writelines("shot: %s, removed traceID(s) %s because "
                                    "they were not found in the corresponding stream\n"
-                                   % (shot.getShotnumber(), del_traceIDs))
+                                   % (shotnumber, del_traceIDs))
 
         print ("\nupdateShots: Finished! Updated %d shots and removed "
                "%d traces" % (count, countTraces))
@@ -171,6 +274,43 @@ class Survey(object):
                    "on removed traces." % (logfile))
             outfile.close()
 
+    def _initPickTable(self):
+        '''
+        Generates the PickTable of the survey, which contains the picks of all shots.
+        '''
+        self.picktable = PickTable()
+        for shot in self.data.values():
+            shot.setPickTable(self.picktable)
+
+    def getPickTable(self):
+        return self.picktable
+
+    def _getDistances(self, rows):
+        '''
+        Returns the source-receiver distances for rows of the PickTable.
+        '''
+        shotnumbers = self.picktable.getShotnumbers()[rows]
+        traceIDs = self.picktable.getTraceIDs()[rows]
+        ushots, ishots = np.unique(shotnumbers, return_inverse=True)
+        utraces, itraces = np.unique(traceIDs, return_inverse=True)
+        srcLocs = np.array([self.getShot(shotnumber).getSrcLoc() for shotnumber in ushots], dtype=float)
+        recLocs = np.array([self._receiverCoords.get(traceID, (np.nan, np.nan, np.nan))
+                            for traceID in utraces], dtype=float)
+        srcLocs = srcLocs.reshape(-1, 3)[ishots]
+        recLocs = recLocs.reshape(-1, 3)[itraces]
+        # artificial traceID 0 is located at the source
+        recLocs[traceIDs == 0] = srcLocs[traceIDs == 0]
+        return np.sqrt(np.sum((srcLocs - recLocs) ** 2, axis=1))
+
+    def isLazy(self):
+        return getattr(self, '_waveformCache', None) is not None
+
+    def getWaveformCache(self):
+        return getattr(self, '_waveformCache', None)
+
+    def getCachedir(self):
+        return getattr(self, '_cachedir', None)
+
     def check2D(self):
         if self.seisarray is None:
             print('Check2D: No SeisArray defined')
@@ -319,9 +459,6 @@ class Survey(object):
         :type: tuple
         '''
         starttime = datetime.now()
-        count = 0
-        tpicksum = starttime - starttime
-
         shotlist = []
 
         if repick:
@@ -330,25 +467,30 @@ class Survey(object):
         if threading:
             self.gui = gui
 
+        if cores < 1:
+            raise ValueError('cores must be >= 1')
+
         print('pickAllShots: Setting pick parameters...')
         for shot in self.data.values():
             shot.setVmin(vmin)
             shot.setVmax(vmax)
-            count += 1
             shot.setPickParameters(folm=folm, method=HosAic, aicwindow=aicwindow)
-            for traceID in shot.getTraceIDlist():
-                st_tuple =(shot, traceID)
-                shotlist.append(st_tuple)
-            
+            # only send the filename to the picking processes if possible, so that the
+            # stream of the shot does not have to be pickled
+            obsfile = shot.getParas()['shotname']
+            if cores > 1 and os.path.isfile(obsfile):
+                rows = self.picktable.addRows(shot.getShotnumber(), shot.getTraceIDlist())
+                shotlist.append((obsfile, shot.getParas(), shot.getTraceIDlist(),
+                                 self.picktable.getColumn('snrthreshold')[rows], self.getCachedir()))
+            else:
+                shotlist.append((shot, None, None, None, None))
 
         print('pickAllShots: Starting to pick...')
         tstartpick = datetime.now()
         if cores > 1:
             print('Picking parallel on %s cores.' % cores)
-        elif cores == 1:
-            print('Picking serial on one core.')
         else:
-            raise ValueError('cores must be >= 1')
+            print('Picking serial on one core.')
         if threading:
             # self.mtp_obj = multithread_picker(parent = self.gui.mainwindow, survey = self,
             #                                   ncores = cores, callback = self.finishPicking)
@@ -357,8 +499,11 @@ class Survey(object):
             self.pickstarttime = starttime
             self.results = mpt.run()
             mpt.finished.connect(self.finishMultipickerThread)
+        elif cores > 1:
+            picks = iworker(picker, shotlist, cores)
+            self.finishPicking(picks, threading=False, starttime=tstartpick)
         else:
-            picks = worker(picker, shotlist, cores)
+            picks = (picker(shot_tuple) for shot_tuple in shotlist)
             self.finishPicking(picks, threading=False, starttime=tstartpick)
 
     def clearAllPicks(self):
@@ -376,28 +521,33 @@ class Survey(object):
         del (self.pickstarttime)
 
     def finishPicking(self, picks=None, threading=True, starttime=None):
-        print('Done!')
-        print('\npickAllShots: Finished\n')
+        '''
+        Sets the picks (already filtered by SNR, including earliest and latest possible picks)
+        returned by the picking processes.
 
+        :param: picks, (shotnumber, traceIDs, values) for each shot as returned by picker.
+        Can also be a generator, then the picks are set as soon as a shot is finished.
+        :type: iterable
+        '''
         if picks:
-            for item in picks:
-                shotnumber, traceID, pick = item
-                self.getShotForShotnumber(shotnumber).setPick(traceID, pick, revised=False)
-
-                    # tpicksum += (datetime.now() - tstartpick);
-                    # tpick = tpicksum / count
-                    # tremain = (tpick * (len(self.getShotDict()) - count))
-                    # tend = datetime.now() + tremain
-                    # progress = float(count) / float(len(self.getShotDict())) * 100
-                    # self._update_progress(shot.getShotname(), tend, progress)
+            nshots = len(self.getShotDict())
+            for count, item in enumerate(picks, 1):
+                shotnumber, traceIDs, values = item
+                self.picktable.setValues(self.picktable.addRows(shotnumber, traceIDs), values)
+
+                if starttime and not threading:
+                    tpick = (datetime.now() - starttime) / count
+                    tend = datetime.now() + tpick * (nshots - count)
+                    progress = float(count) / float(nshots) * 100
+                    self._update_progress(shotnumber, tend, progress)
+
+        print('\nDone!')
+        print('\npickAllShots: Finished\n')
 
         if starttime:
             tpick = datetime.now() - starttime
             print('Finished picking after %s [H:MM:SS].' % tpick)
 
-        self.filterSNR()
-        self.setEarllate()
-
         self.picked = True
         ntraces = self.countAllTraces()
         pickedtraces = self.countAllPickedTraces()
@@ -410,41 +560,27 @@ class Survey(object):
     def filterSNR(self):
         print('Starting filterSNR...')
         for shot in self.data.values():
-            for traceID in shot.getTraceIDlist():
-                shot.setSNR(traceID)
-                # if shot.getSNR(traceID)[0] < snrthreshold:
-                if shot.getPick(traceID) <= 0:
-                    shot.removePick(traceID)
-                if shot.getSNR(traceID)[0] < shot.getSNRthreshold(traceID):
-                    shot.removePick(traceID)
+            shot.filterSNR()
 
     def setEarllate(self):
         print('Starting setEarllate...')
         for shot in self.data.values():
-            for traceID in shot.getTraceIDlist():
-                shot.setEarllatepick(traceID)
+            shot.setEarllatepicks()
 
     def cleanBySPE(self, maxSPE):
         '''
         Sets all picks as invalid if they exceed a certain value of the symmetric pick error.
         '''
-        for shot in self.data.values():
-            for traceID in shot.getTraceIDlist():
-                if shot.getPickFlag(traceID):
-                    if shot.getSymmetricPickError(traceID) > maxSPE:
-                        shot.setPickFlag(traceID, False)
+        pickflag = self.picktable.getColumn('pickflag')
+        with np.errstate(invalid='ignore'):
+            pickflag[pickflag & (self.picktable.getColumn('spe') > maxSPE)] = False
 
     def plotSPE(self):
         '''
         Plots the symmetric pick error sorted by magnitude.
         '''
         import matplotlib.pyplot as plt
-        spe = []
-        for shot in self.data.values():
-            for traceID in shot.getTraceIDlist():
-                if shot.getPickFlag(traceID):
-                    spe.append(shot.getSymmetricPickError(traceID))
-        spe.sort()
+        spe = np.sort(self.picktable.getColumn('spe')[self.picktable.getColumn('pickflag')])
         plt.plot(spe, label='SPE')
         plt.ylabel('Symmetric Pickerror')
         plt.legend()
@@ -454,15 +590,14 @@ class Survey(object):
         Recovers all manually removed picks. Still regards SNR threshold.
         '''
         print('Recovering survey...')
-        numpicks = 0
-        for shot in self.data.values():
-            for traceID in shot.getTraceIDlist():
-                if not shot.getPickFlag(traceID):
-                    shot.setPickFlag(traceID, True)
-                    if shot.getSNR(traceID)[0] < shot.getSNRthreshold(traceID):
-                        shot.removePick(traceID)
-                    else:
-                        numpicks += 1
+        table = self.picktable
+        pickflag = table.getColumn('pickflag')
+        removed = table.getColumn('picked') & ~pickflag
+        with np.errstate(invalid='ignore'):
+            lowSNR = removed & (table.getColumn('snr') < table.getColumn('snrthreshold'))
+        pickflag[removed & ~lowSNR] = True
+        table.getColumn('revised')[lowSNR] = False
+        numpicks = np.count_nonzero(removed & ~lowSNR)
         print('Recovered %d picks' % numpicks)
 
     def setArtificialPick(self, traceID, pick):
@@ -471,26 +606,13 @@ class Survey(object):
         '''
         for shot in self.data.values():
             shot.setPick(traceID, pick, revised=True)
-            shot.picks[traceID]['epp'] = pick
-            shot.picks[traceID]['lpp'] = pick
-            shot.picks[traceID]['spe'] = pick
+            for name in ['epp', 'lpp', 'spe']:
+                self.picktable.setValue(shot.getShotnumber(), traceID, name, pick)
             shot.setPickwindow(traceID, shot.getCut())
 
     def setInitialPickwindow(self):
         for shot in self.data.values():
-            length_differs = False
-            for index, traceID in enumerate(shot.getTraceIDlist()):
-                stats = shot.stream.traces[index].stats
-                if index == 0:
-                    pickwindow_0 = (0, (stats.endtime - stats.starttime))
-                pickwindow = (0, (stats.endtime - stats.starttime))
-                if not pickwindow == pickwindow_0:
-                    length_differs = True
-                    print('Warning: individual trace length differs for shot %s' % shot.getShotnumber())
-                shot.setPickwindow(traceID, pickwindow)
-            if length_differs:
-                print('Warning: Can not set a consistent CUT-window for all traces of shot %s' % shot.getShotnumber())
-            shot.setCut(pickwindow)
+            shot.setInitialPickwindow()
 
     def countAllTraces(self):
         '''
@@ -562,16 +684,17 @@ class Survey(object):
         Key: shotnumber
         '''
         info_dict = {}
+        table = self.picktable
+        shotnumbers = table.getShotnumbers()
+        pickflag = table.getColumn('pickflag')
+        snr = table.getColumn('snr')
+        distances = self._getDistances(table.getRows())
         for shot in self.data.values():
-            pickedTraces = 0
-            snrlist = []
-            dist = []
+            rows = shotnumbers == shot.getShotnumber()
             numtraces = len(shot.getTraceIDlist())
-            for traceID in shot.getTraceIDlist():
-                snrlist.append(shot.getSNR(traceID)[0])
-                dist.append(shot.getDistance(traceID))
-                if shot.getPickFlag(traceID):
-                    pickedTraces += 1
+            pickedTraces = np.count_nonzero(pickflag[rows])
+            snrlist = snr[rows]
+            dist = distances[rows]
             info_dict[shot.getShotnumber()] = {'numtraces': numtraces,
                                                'picked traces': [pickedTraces,
                                                                  '%2.2f %%' % (
@@ -624,20 +747,20 @@ class Survey(object):
             srcfile.writelines('%10s\n' % 1)
             srcfile.writelines('%10s %10s %10s\n' % (1, 1, ttfilename))
             ttfile = open(directory + '/' + ttfilename, 'w')
-            traceIDlist = shot.getTraceIDlist()
-            traceIDlist.sort()
-            ttfile.writelines(str(self.countPickedTraces(shot)) + '\n')
-            for traceID in traceIDlist:
-                if shot.getPickFlag(traceID):
-                    pick = shot.getPick(traceID) * fmtomo_factor
-                    delta = shot.getSymmetricPickError(traceID) * fmtomo_factor
-                    (x, y, z) = shot.getRecLoc(traceID)
-                    ttfile.writelines('%20s %20s %20s %10s %10s\n' % (
-                        getAngle(y), getAngle(x), (-1) * z, pick, delta))
-                    LatAll.append(getAngle(y))
-                    LonAll.append(getAngle(x))
-                    DepthAll.append((-1) * z)
-                    count += 1
+            rows = self.picktable.getRows(shotnumber)
+            rows = rows[self.picktable.getColumn('pickflag')[rows]]
+            rows = rows[np.argsort(self.picktable.getTraceIDs()[rows], kind='mergesort')]
+            picks = self.picktable.getColumn('mpp')[rows] * fmtomo_factor
+            deltas = self.picktable.getColumn('spe')[rows] * fmtomo_factor
+            ttfile.writelines(str(len(rows)) + '\n')
+            for traceID, pick, delta in zip(self.picktable.getTraceIDs()[rows], picks, deltas):
+                (x, y, z) = shot.getRecLoc(traceID)
+                ttfile.writelines('%20s %20s %20s %10s %10s\n' % (
+                    getAngle(y), getAngle(x), (-1) * z, pick, delta))
+                LatAll.append(getAngle(y))
+                LonAll.append(getAngle(x))
+                DepthAll.append((-1) * z)
+                count += 1
             ttfile.close()
         srcfile.close()
         msg = 'Wrote output for {0} traces\n' \
@@ -658,39 +781,24 @@ class Survey(object):
         '''
         Counts all picked traces of a shot (type Seismicshot).
         '''
-        count = 0
-        for traceID in shot.getTraceIDlist():
-            if shot.getPickFlag(traceID):
-                count += 1
-        return count
+        rows = self.picktable.getRows(shot.getShotnumber())
+        return np.count_nonzero(self.picktable.getColumn('pickflag')[rows])
 
     def countAllPickedTraces(self):
         '''
         Counts all picked traces of the survey.
         '''
-        count = 0
         if not self.picked:
-            return count
-
-        for shot in self.data.values():
-            for traceID in shot.getTraceIDlist():
-                if shot.getPickFlag(traceID):
-                    count += 1
-        return count
+            return 0
+        return np.count_nonzero(self.picktable.getColumn('pickflag'))
 
     def countAllRevisedTraces(self):
         '''
         Counts all picked traces of the survey.
         '''
-        count = 0
         if not self.picked:
-            return count
-
-        for shot in self.data.values():
-            for traceID in shot.getTraceIDlist():
-                if shot.getRevised(traceID):
-                    count += 1
-        return count
+            return 0
+        return np.count_nonzero(self.picktable.getColumn('revised'))
 
     def plotAllShots(self, rows=3, columns=4, mode='3d'):
         '''
@@ -782,24 +890,20 @@ class Survey(object):
             return ax
 
     def preparePlotAllPicks(self, plotRemoved=False):
-        dist = []
-        pick = []
-        snrlog = []
-        pickerror = []
-        spe = []
+        table = self.picktable
+        if plotRemoved == True:
+            rows = np.flatnonzero(table.getColumn('picked'))
+        else:
+            rows = np.flatnonzero(table.getColumn('pickflag'))
 
-        for shot in self.data.values():
-            for traceID in shot.getTraceIDlist():
-                if plotRemoved == False:
-                    if shot.getPickFlag(
-                            traceID) or plotRemoved == True:
-                        dist.append(shot.getDistance(traceID))
-                        pick.append(shot.getPick(traceID))
-                        snrlog.append(math.log10(shot.getSNR(traceID)[0]))
-                        pickerror.append(shot.getPickError(traceID))
-                        spe.append(shot.getSymmetricPickError(traceID))
+        dist = self._getDistances(rows)
+        pick = table.getColumn('mpp')[rows]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            snrlog = np.log10(table.getColumn('snr')[rows])
+        pickerror = np.abs(table.getColumn('epp')[rows] - table.getColumn('lpp')[rows]) / 2
+        spe = table.getColumn('spe')[rows]
 
-        return dist, pick, snrlog, pickerror, spe
+        return dist.tolist(), pick.tolist(), snrlog.tolist(), pickerror.tolist(), spe.tolist()
 
     def createPlot(self, dist, pick, inkByVal, label=None, ax=None, cbar=None):
         '''
@@ -850,24 +954,36 @@ class Survey(object):
         '''
         Save Survey object to a file. 
         Can be loaded by using Survey.from_pickle(filename).
+
+        The waveform data is not saved, it is read again from the data files of the shots. Their
+        absolute paths are stored, so the survey can be loaded from any working directory, but the
+        data files must not be moved or deleted. The picks are saved to the directory
+        filename + '.picks'. Saving the survey to the same file again only writes
+        the picks of shots that changed (see asp3d.core.surveystore).
         '''
-        try:
-            import cPickle
-        except ImportError:
-            import _pickle as cPickle
         cleanUp(self)
-        outfile = open(filename, 'wb')
-
-        cPickle.dump(self, outfile, -1)
-        print('saved Survey to file %s' % (filename))
+        written = saveSurveyStore(self, filename)
+        print('saved Survey to file %s (picks of %d shot(s) updated)' % (filename, written))
 
     @staticmethod
-    def from_pickle(filename):
+    def from_pickle(filename, maxMemory=None):
+        '''
+        Load Survey object from a file written by Survey.saveSurvey (or a pickled Survey object).
+
+        :param: maxMemory, memory budget for the waveform data [MB]. The waveform data of a saved
+        Survey is read on demand. None for no limit.
+        :type: float
+        '''
         try:
             import cPickle
         except ImportError:
             import _pickle as cPickle
-        infile = open(filename, 'rb')
-        survey = cPickle.load(infile)
+        with open(filename, 'rb') as infile:
+            survey = cPickle.load(infile)
+        if isSurveyStore(survey):
+            loadSurveyStore(survey, filename, maxMemory)
+        elif getattr(survey, 'picktable', None) is None:
+            # survey saved before the PickTable was introduced
+            survey._initPickTable()
         print('Loaded %s' % filename)
         return survey
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+#   Copyright 2017 Marcel Paffrath (Ruhr-Universitaet Bochum, Germany)
+#
+#   This file is part of ActiveSeismoPick3D
+#----------------------------------------------------------------------------
+
+import numpy as np
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+
+class CoordinateTable(object):
+    '''
+    Storage for the coordinates of points (e.g. receivers, sources or topography points).
+    Every point ID is one row containing the coordinates (x, y, z) and the flags burried and
+    measured (False for interpolated points). Rows are kept in the order the points were added.
+
+    Coordinates that are not set are NaN.
+    '''
+
+    def __init__(self):
+        self._index = {}
+        self._nrows = 0
+        self._ids = np.zeros(0, dtype=int)
+        self._coords = np.zeros((0, 3), dtype=float)
+        self._burried = np.zeros(0, dtype=bool)
+        self._measured = np.zeros(0, dtype=bool)
+
+    def __len__(self):
+        return self._nrows
+
+    def __contains__(self, pointID):
+        return pointID in self._index
+
+    def _reserve(self, nrows):
+        '''
+        Enlarges the arrays (at least doubling their size) to hold nrows rows.
+        '''
+        size = len(self._ids)
+        if nrows <= size:
+            return
+        size = max(nrows, 2 * size, 64)
+
+        def enlarge(array, fill):
+            new = np.empty((size,) + array.shape[1:], dtype=array.dtype)
+            new[:self._nrows] = array[:self._nrows]
+            new[self._nrows:] = fill
+            return new
+
+        self._ids = enlarge(self._ids, -1)
+        self._coords = enlarge(self._coords, np.nan)
+        self._burried = enlarge(self._burried, False)
+        self._measured = enlarge(self._measured, False)
+
+    def addPoint(self, pointID, coordinates=(np.nan, np.nan, np.nan), burried=False, measured=True):
+        '''
+        Adds a point (or overwrites an existing one) and returns its row index.
+
+        :param: coordinates, (x, y, z)
+        :type: tuple
+
+        :param: burried, None is treated as False
+        :type: bool
+        '''
+        row = self._index.get(pointID)
+        if row is None:
+            self._reserve(self._nrows + 1)
+            row = self._nrows
+            self._ids[row] = pointID
+            self._index[pointID] = row
+            self._nrows += 1
+        self._coords[row] = coordinates
+        self._burried[row] = bool(burried)
+        self._measured[row] = measured
+        return row
+
+    def getRow(self, pointID):
+        return self._index[pointID]
+
+    def getIDs(self):
+        return self._ids[:self._nrows]
+
+    def getCoords(self):
+        '''
+        Returns a view on the (N, 3) array of coordinates.
+        '''
+        return self._coords[:self._nrows]
+
+    def getBurried(self):
+        return self._burried[:self._nrows]
+
+    def getMeasured(self):
+        return self._measured[:self._nrows]
+
+    def getCoordinates(self, pointID):
+        return tuple(self._coords[self._index[pointID]].tolist())
+
+    def getCoordinate(self, pointID, axis):
+        return float(self._coords[self._index[pointID], axis])
+
+    def setCoordinate(self, pointID, axis, value):
+        self._coords[self._index[pointID], axis] = np.nan if value is None else value
+
+    def getXYZ(self, mask=None):
+        '''
+        Returns the x, y and z coordinates of all points (or of the points selected by a boolean mask)
+        as three arrays. Without mask (or if all points are selected) the arrays are views on the table.
+        '''
+        coords = self.getCoords()
+        if mask is not None and not mask.all():
+            coords = coords[mask]
+        return coords[:, 0], coords[:, 1], coords[:, 2]
+
+    def asDict(self, measuredOnly=False):
+        '''
+        Returns a read-only dictionary-like view on the table. Key: point ID, value: (x, y, z)
+        '''
+        return CoordinateDict(self, measuredOnly)
+
+    def getFlagDict(self, flag, measuredOnly=False):
+        '''
+        Returns a dictionary containing a flag ('burried' or 'measured') for all points (or all measured points).
+        '''
+        ids = self.getIDs()
+        flags = {'burried': self.getBurried(), 'measured': self.getMeasured()}[flag]
+        if measuredOnly:
+            ids = ids[self.getMeasured()]
+            flags = flags[self.getMeasured()]
+        return dict(zip(ids.tolist(), flags.tolist()))
+
+
+class CoordinateDict(Mapping):
+    '''
+    Read-only dictionary view on a CoordinateTable. Key: point ID, value: (x, y, z)
+    '''
+
+    def __init__(self, table, measuredOnly=False):
+        self._table = table
+        self._measuredOnly = measuredOnly
+
+    def _selected(self, row):
+        return not self._measuredOnly or self._table.getMeasured()[row]
+
+    def __getitem__(self, pointID):
+        row = self._table.getRow(pointID)
+        if not self._selected(row):
+            raise KeyError(pointID)
+        return tuple(self._table.getCoords()[row].tolist())
+
+    def __contains__(self, pointID):
+        return pointID in self._table and self._selected(self._table.getRow(pointID))
+
+    def __iter__(self):
+        ids = self._table.getIDs()
+        if self._measuredOnly:
+            ids = ids[self._table.getMeasured()]
+        return iter(ids.tolist())
+
+    def __len__(self):
+        if self._measuredOnly:
+            return int(np.count_nonzero(self._table.getMeasured()))
+        return len(self._table)
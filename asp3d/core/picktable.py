@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+#   Copyright 2017 Marcel Paffrath (Ruhr-Universitaet Bochum, Germany)
+#
+#   This file is part of ActiveSeismoPick3D
+#----------------------------------------------------------------------------
+
+import numpy as np
+
+
+class PickTable(object):
+    '''
+    Columnar storage for the picks of one or several shots. Every (shotnumber, traceID)
+    pair is one row, every pick attribute is one numpy array (column), so that survey wide
+    queries can be done with boolean masks instead of looping over all shots and traces.
+
+    Float columns are NaN if not set, boolean columns are False if not set.
+    '''
+    floatColumns = ('mpp', 'epp', 'lpp', 'spe',
+                    'snr', 'snrdb', 'noiselevel', 'snrthreshold',
+                    'pwleft', 'pwright')
+    boolColumns = ('picked', 'pickflag', 'revised', 'snrset')
+
+    def __init__(self):
+        self._index = {}
+        self._nrows = 0
+        self._shotnumbers = np.zeros(0, dtype=int)
+        self._traceIDs = np.zeros(0, dtype=int)
+        self._columns = {}
+        for name in self.floatColumns:
+            self._columns[name] = np.zeros(0, dtype=float)
+        for name in self.boolColumns:
+            self._columns[name] = np.zeros(0, dtype=bool)
+
+    def __len__(self):
+        return self._nrows
+
+    def _reserve(self, nrows):
+        '''
+        Enlarges the arrays (at least doubling their size) to hold nrows rows.
+        '''
+        size = len(self._shotnumbers)
+        if nrows <= size:
+            return
+        size = max(nrows, 2 * size, 64)
+
+        def enlarge(array, fill):
+            new = np.empty(size, dtype=array.dtype)
+            new[:self._nrows] = array[:self._nrows]
+            new[self._nrows:] = fill
+            return new
+
+        self._shotnumbers = enlarge(self._shotnumbers, -1)
+        self._traceIDs = enlarge(self._traceIDs, -1)
+        for name in self.floatColumns:
+            self._columns[name] = enlarge(self._columns[name], np.nan)
+        for name in self.boolColumns:
+            self._columns[name] = enlarge(self._columns[name], False)
+
+    def addRows(self, shotnumber, traceIDs):
+        '''
+        Adds rows for all traceIDs of a shot (if they do not exist yet) and returns the
+        row indices of all of them.
+
+        :param: shotnumber
+        :type: int
+
+        :param: traceIDs
+        :type: list
+        '''
+        rows = []
+        for traceID in traceIDs:
+            key = (shotnumber, traceID)
+            if not key in self._index:
+                self._reserve(self._nrows + 1)
+                self._shotnumbers[self._nrows] = shotnumber
+                self._traceIDs[self._nrows] = traceID
+                self._index[key] = self._nrows
+                self._nrows += 1
+            rows.append(self._index[key])
+        return np.array(rows, dtype=int)
+
+    def getRow(self, shotnumber, traceID, create=False):
+        '''
+        Returns the row index of (shotnumber, traceID). Returns None if it does not
+        exist, unless create is True.
+        '''
+        row = self._index.get((shotnumber, traceID))
+        if row is None and create:
+            row = self.addRows(shotnumber, [traceID])[0]
+        return row
+
+    def getRows(self, shotnumber=None):
+        '''
+        Returns the row indices of all rows (or all rows of a certain shot).
+        '''
+        if shotnumber is None:
+            return np.arange(self._nrows)
+        return np.flatnonzero(self.getShotnumbers() == shotnumber)
+
+    def getShotnumbers(self):
+        return self._shotnumbers[:self._nrows]
+
+    def getTraceIDs(self):
+        return self._traceIDs[:self._nrows]
+
+    def getColumn(self, name):
+        '''
+        Returns a view on a column. Changes of the returned array change the table.
+        '''
+        return self._columns[name][:self._nrows]
+
+    def getValue(self, shotnumber, traceID, name):
+        row = self.getRow(shotnumber, traceID)
+        if row is None:
+            return np.nan if name in self.floatColumns else False
+        return self._columns[name][row]
+
+    def setValue(self, shotnumber, traceID, name, value):
+        row = self.getRow(shotnumber, traceID, create=True)
+        self._columns[name][row] = np.nan if value is None else value
+
+    def getValues(self, rows):
+        '''
+        Returns a dictionary containing all columns for the given rows.
+
+        Key: column name
+        '''
+        return dict((name, self._columns[name][rows]) for name in self.floatColumns + self.boolColumns)
+
+    def setValues(self, rows, values):
+        '''
+        Sets the columns for the given rows from a dictionary as returned by getValues.
+        '''
+        for name, column in values.items():
+            self._columns[name][rows] = column
+
+    def renameShot(self, shotnumber, newShotnumber):
+        '''
+        Moves all rows of shotnumber to newShotnumber.
+        '''
+        rows = self.getRows(shotnumber)
+        for row in rows:
+            key = (shotnumber, self._traceIDs[row])
+            if (newShotnumber, key[1]) in self._index:
+                raise ValueError('Row for shot %s, traceID %s already exists' % (newShotnumber, key[1]))
+            self._index[(newShotnumber, key[1])] = self._index.pop(key)
+        self._shotnumbers[rows] = newShotnumber
+
+    def copyRows(self, table, rows):
+        '''
+        Copies rows of another PickTable into this table (existing rows are overwritten).
+
+        :param: table, source table
+        :type: `~asp3d.core.picktable.PickTable`
+
+        :param: rows, row indices of the source table
+        :type: `~numpy.ndarray`
+        '''
+        rows = np.asarray(rows, dtype=int)
+        targets = np.array([self.getRow(shotnumber, traceID, create=True) for shotnumber, traceID
+                            in zip(table._shotnumbers[rows], table._traceIDs[rows])], dtype=int)
+        for name in self.floatColumns + self.boolColumns:
+            self._columns[name][targets] = table._columns[name][rows]
@@ -9,14 +9,18 @@ import matplotlib.pyplot as plt
 import numpy as np
 import sys
 from scipy.interpolate import griddata
+from scipy.interpolate import CloughTocher2DInterpolator, LinearNDInterpolator, NearestNDInterpolator
 from mpl_toolkits.mplot3d import Axes3D
 
+from asp3d.core.coordinatetable import CoordinateTable
+from asp3d.util import fmtomoIO, vtkIO
+
 plt.style.use(['fivethirtyeight', 'ggplot'])
 
 
 def readMygridNlayers(filename):
     infile = open(filename, 'r')
-    nlayers = len(infile.readlines()) / 2
+    nlayers = len(infile.readlines()) // 2
     infile.close()
 
     return nlayers
@@ -51,6 +55,39 @@ def readMygrid(filename):
     return ztop, zbot, vtop, vbot
 
 
+class TopographySurface(object):
+    '''
+    Topography interpolated on a regular (theta, phi) grid with cushion nodes, as generated by
+    SeisArray.getTopographySurface. Interfaces parallel to the topography (e.g. elevated topography,
+    bottom interface) are derived by adding an offset.
+    '''
+
+    def __init__(self, x, y, z, shape):
+        '''
+        :param: x, y, z, cartesian coordinates of the grid points, ordered theta (outer loop), phi (inner loop)
+        :type: `~numpy.ndarray`
+
+        :param: shape, (number of points in theta, number of points in phi) including cushion nodes
+        :type: tuple
+        '''
+        self.x = x
+        self.y = y
+        self.z = z
+        self.shape = shape
+
+    def getZgrid(self, offset=0.):
+        '''
+        Returns the z values (+ offset) as 2D array (theta, phi).
+        '''
+        return (self.z + offset).reshape(self.shape)
+
+    def getPoints(self, offset=0.):
+        '''
+        Returns the surface (z + offset) in form of a list of points [(x1, y1, z1), (x2, y2, z2), ...].
+        '''
+        return list(zip(self.x.tolist(), self.y.tolist(), (self.z + offset).tolist()))
+
+
 class SeisArray(object):
     '''
     Can be used to interpolate missing values of a receiver grid, if only support points were measured.
@@ -66,12 +103,11 @@ class SeisArray(object):
 
     def __init__(self, recfile, interpolationMode=False):
         self.recfile = recfile
-        self._receiverCoords = {}
-        self._measuredReceivers = {}
-        self._burriedReceivers = {}
-        self._measuredTopo = {}
-        self._sourceCoords = {}
-        self._burriedSources = {}
+        self._receivers = CoordinateTable()
+        self._topo = CoordinateTable()
+        self._sources = CoordinateTable()
+        self._interpolators = {}
+        self._topographySurfaces = {}
         self._receiverlist = open(self.recfile, 'r').readlines()
         if interpolationMode == True:
             self._init_interpolationMode()
@@ -79,6 +115,31 @@ class SeisArray(object):
             self._init_normal()
         self.set2D()
 
+    def __getstate__(self):
+        # the interpolators are recomputed on demand
+        state = self.__dict__.copy()
+        state['_interpolators'] = {}
+        return state
+
+    def __setstate__(self, state):
+        # SeisArrays saved before the coordinates were stored in CoordinateTables
+        if '_receiverCoords' in state:
+            receivers = CoordinateTable()
+            measured = state.pop('_measuredReceivers')
+            burried = state.pop('_burriedReceivers')
+            for traceID, coords in state.pop('_receiverCoords').items():
+                receivers.addPoint(traceID, [np.nan if value is None else value for value in coords],
+                                   burried.get(traceID, False), traceID in measured)
+            topo = CoordinateTable()
+            for pointID, coords in state.pop('_measuredTopo').items():
+                topo.addPoint(pointID, coords)
+            sources = CoordinateTable()
+            burried = state.pop('_burriedSources')
+            for pointID, coords in state.pop('_sourceCoords').items():
+                sources.addPoint(pointID, coords, burried.get(pointID, False))
+            state.update({'_receivers': receivers, '_topo': topo, '_sources': sources})
+        self.__dict__.update(state)
+
     def _init_normal(self):
         self.interpolationMode = False
         self._setReceiverCoords_normal()
@@ -116,9 +177,7 @@ class SeisArray(object):
             burried = self._checkBurried(line, index=6)
             if burried is None:
                 print('Warning, could not recognize burried/surface status for receiver %s' % traceID)
-            self._receiverCoords[traceID] = (x, y, z)
-            self._measuredReceivers[traceID] = (x, y, z)
-            self._burriedReceivers[traceID] = burried
+            self._receivers.addPoint(traceID, (x, y, z), burried)
 
     def _setReceiverCoords_normal(self):
         '''
@@ -132,9 +191,7 @@ class SeisArray(object):
             burried = self._checkBurried(line, index=4)
             if burried is None:
                 print('Warning, could not recognize burried/surface status for receiver %s' % traceID)
-            self._receiverCoords[traceID] = (x, y, z)
-            self._measuredReceivers[traceID] = (x, y, z)
-            self._burriedReceivers[traceID] = burried
+            self._receivers.addPoint(traceID, (x, y, z), burried)
 
     def _setGeophoneNumbers(self):
         for line in self._getReceiverlist():
@@ -168,12 +225,7 @@ class SeisArray(object):
             self.twoDim = False
 
     def _check0(self, lst):
-        for element in lst:
-            if element == 0:
-                pass
-            else:
-                return False
-        return True
+        return bool(np.all(np.asarray(lst) == 0))
 
     def _getReceiverlines(self):
         return self._receiverlines
@@ -182,31 +234,44 @@ class SeisArray(object):
         return self._receiverlist
 
     def getReceiverCoordinates(self):
-        return self._receiverCoords
+        '''
+        Returns a read-only dictionary view on all receivers (measured and interpolated).
+        Key: traceID, value: (x, y, z)
+        '''
+        return self._receivers.asDict()
+
+    def getReceiverTable(self):
+        return self._receivers
+
+    def getSourceTable(self):
+        return self._sources
+
+    def getTopoTable(self):
+        return self._topo
 
     def getBurriedSources(self):
-        return self._burriedSources
+        return self._sources.getFlagDict('burried')
 
     def getBurriedReceivers(self):
-        return self._burriedReceivers
+        return self._receivers.getFlagDict('burried', measuredOnly=True)
 
     def _getXreceiver(self, traceID):
-        return self._receiverCoords[traceID][0]
+        return self._receivers.getCoordinate(traceID, 0)
 
     def _getYreceiver(self, traceID):
-        return self._receiverCoords[traceID][1]
+        return self._receivers.getCoordinate(traceID, 1)
 
     def _getZreceiver(self, traceID):
-        return self._receiverCoords[traceID][2]
+        return self._receivers.getCoordinate(traceID, 2)
 
     def _getXshot(self, shotnumber):
-        return self._sourceCoords[shotnumber][0]
+        return self._sources.getCoordinate(shotnumber, 0)
 
     def _getYshot(self, shotnumber):
-        return self._sourceCoords[shotnumber][1]
+        return self._sources.getCoordinate(shotnumber, 1)
 
     def _getZshot(self, shotnumber):
-        return self._sourceCoords[shotnumber][2]
+        return self._sources.getCoordinate(shotnumber, 2)
 
     def _getReceiverValue(self, traceID, coordinate):
         setCoordinate = {'X': self._getXreceiver,
@@ -218,25 +283,25 @@ class SeisArray(object):
         return self._geophoneNumbers[traceID]
 
     def getMeasuredReceivers(self):
-        return self._measuredReceivers
+        return self._receivers.asDict(measuredOnly=True)
 
     def getMeasuredTopo(self):
-        return self._measuredTopo
+        return self._topo.asDict()
 
     def getSourceCoordinates(self):
-        return self._sourceCoords
+        return self._sources.asDict()
 
     def _setXvalue(self, traceID, value):
         self._checkKey(traceID)
-        self._receiverCoords[traceID][0] = value
+        self._receivers.setCoordinate(traceID, 0, value)
 
     def _setYvalue(self, traceID, value):
         self._checkKey(traceID)
-        self._receiverCoords[traceID][1] = value
+        self._receivers.setCoordinate(traceID, 1, value)
 
     def _setZvalue(self, traceID, value):
         self._checkKey(traceID)
-        self._receiverCoords[traceID][2] = value
+        self._receivers.setCoordinate(traceID, 2, value)
 
     def _setValue(self, traceID, coordinate, value):
         setCoordinate = {'X': self._setXvalue,
@@ -245,40 +310,9 @@ class SeisArray(object):
         setCoordinate[coordinate](traceID, value)
 
     def _checkKey(self, traceID):
-        if not traceID in self._receiverCoords.keys():
-            self._receiverCoords[traceID] = [None, None, None]
-
-    def _checkTraceIDdirection(self, traceID1, traceID2):
-        if traceID2 > traceID1:
-            direction = +1
-            return direction
-        if traceID2 < traceID1:
-            direction = -1
-            return direction
-        err_msg = "Same Value for traceID1 = %s and traceID2 = %s" % (traceID1, traceID2)
-        raise RuntimeError(err_msg)
-
-    def _checkCoordDirection(self, traceID1, traceID2, coordinate):
-        '''
-        Checks whether the interpolation direction is positive or negative
-        '''
-        if self._getReceiverValue(traceID1, coordinate) < self._getReceiverValue(traceID2, coordinate):
-            direction = +1
-            return direction
-        if self._getReceiverValue(traceID1, coordinate) > self._getReceiverValue(traceID2, coordinate):
-            direction = -1
-            return direction
-        err_msg = "Same Value for traceID1 = %s and traceID2 = %s" % (traceID1, traceID2)
-        raise RuntimeError(err_msg)
-
-    def _interpolateMeanDistances(self, traceID1, traceID2, coordinate):
-        '''
-        Returns the mean distance between two traceID's depending on the number of geophones in between
-        '''
-        num_spaces = abs(self._getGeophoneNumber(traceID1) - self._getGeophoneNumber(traceID2))
-        mean_distance = abs(
-            self._getReceiverValue(traceID1, coordinate) - self._getReceiverValue(traceID2, coordinate)) / num_spaces
-        return mean_distance
+        # interpolated receivers are added without coordinates
+        if not traceID in self._receivers:
+            self._receivers.addPoint(traceID, measured=False)
 
     def checkInterpolationMode(self):
         if self.interpolationMode == False:
@@ -291,23 +325,45 @@ class SeisArray(object):
         '''
         if not self.checkInterpolationMode():
             return
-        for lineID in self._getReceiverlines().keys():
-            number_measured = len(self._getReceiverlines()[lineID])
-            for index, traceID1 in enumerate(self._getReceiverlines()[lineID]):
-                if index + 1 < number_measured:
-                    traceID2 = self._getReceiverlines()[lineID][index + 1]
+        axis = {'X': 0, 'Y': 1, 'Z': 2}[coordinate]
+        for measuredIDs in self._getReceiverlines().values():
+            traceIDs, values = self._interpolateReceiverline(measuredIDs, axis)
+            for traceID in traceIDs.tolist():
+                self._checkKey(traceID)
+            rows = [self._receivers.getRow(traceID) for traceID in traceIDs.tolist()]
+            self._receivers.getCoords()[rows, axis] = values
+
+    def _interpolateReceiverline(self, measuredIDs, axis):
+        '''
+        Returns the traceIDs between the measured receivers of one receiver line and their values
+        for the coordinate axis. Between two consecutive measured receivers the values are
+        interpolated linearly depending on the number of geophones in between.
+
+        :param: measuredIDs, traceIDs of the measured receivers in the order of the receiver line
+        :type: list
+        '''
+        measuredIDs = np.asarray(measuredIDs, dtype=int)
+        geophones = np.array([self._getGeophoneNumber(traceID) for traceID in measuredIDs.tolist()])
+        rows = [self._receivers.getRow(traceID) for traceID in measuredIDs.tolist()]
+        values = self._receivers.getCoords()[rows, axis]
+
+        steps = np.diff(measuredIDs)
+        if not steps.all():
+            index = np.flatnonzero(steps == 0)[0]
+            err_msg = "Same Value for traceID1 = %s and traceID2 = %s" % (measuredIDs[index], measuredIDs[index + 1])
+            raise RuntimeError(err_msg)
 
-                    traceID_dir = self._checkTraceIDdirection(traceID1, traceID2)
-                    traceID_interp = traceID1 + traceID_dir
+        # number of traceIDs between two consecutive measured receivers
+        counts = np.abs(steps) - 1
+        pair = np.repeat(np.arange(len(steps)), counts)
+        # position (1, 2, ...) of every interpolated traceID counted from the first receiver of its pair
+        position = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + 1
 
-                    coord_dir = self._checkCoordDirection(traceID1, traceID2, coordinate)
-                    mean_distance = self._interpolateMeanDistances(traceID1, traceID2, coordinate)
+        # mean distance between two geophones of each pair
+        mean_distance = np.diff(values) / np.abs(np.diff(geophones))
 
-                    while (traceID_dir * traceID_interp) < (traceID_dir * traceID2):
-                        self._setValue(traceID_interp, coordinate,
-                                       (self._getReceiverValue(traceID_interp - traceID_dir, coordinate)
-                                        + coord_dir * (mean_distance)))
-                        traceID_interp += traceID_dir
+        traceIDs = measuredIDs[pair] + np.sign(steps)[pair] * position
+        return traceIDs, values[pair] + mean_distance[pair] * position
 
     def addMeasuredTopographyPoints(self, filename):
         '''
@@ -320,7 +376,8 @@ class SeisArray(object):
             x = float(line.split()[1])
             y = float(line.split()[2])
             z = float(line.split()[3])
-            self._measuredTopo[pointID] = (x, y, z)
+            self._topo.addPoint(pointID, (x, y, z))
+        self._resetInterpolation()
 
     def addSourceLocations(self, filename):
         '''
@@ -338,20 +395,39 @@ class SeisArray(object):
             burried = self._checkBurried(line, index=4)
             if burried is None:
                 print('Warning, could not recognize burried/surface status for source %s' % pointID)
-            self._sourceCoords[pointID] = (x, y, z)
-            self._burriedSources[pointID] = burried
+            self._sources.addPoint(pointID, (x, y, z), burried)
+        self._resetInterpolation()
 
     def interpZcoords4rec(self, method='linear'):
         '''
         Interpolates z values for all receivers.
         '''
-        measured_x, measured_y, measured_z = self.getAllMeasuredPointsLists()
+        interpolated = ~self._receivers.getMeasured()
+        if interpolated.any():
+            coords = self._receivers.getCoords()
+            interpolator = self._getInterpolator(method)
+            coords[interpolated, 2] = interpolator(coords[interpolated, 0], coords[interpolated, 1])
 
-        for traceID in self.getReceiverCoordinates().keys():
-            if type(self.getReceiverCoordinates()[traceID]) is not tuple:
-                z = griddata((measured_x, measured_y), measured_z,
-                             (self._getXreceiver(traceID), self._getYreceiver(traceID)), method=method)
-                self._setZvalue(traceID, float(z))
+    def _getInterpolator(self, method='linear', excludeBurried=False):
+        '''
+        Returns an interpolator for the z values of all measured points (see getAllMeasuredPointsLists).
+        The triangulation of the measured points is computed once for every method and reused
+        until measured points are added to the SeisArray.
+        '''
+        # SeisArrays saved before the interpolators were cached do not have the attribute
+        if not hasattr(self, '_interpolators'):
+            self._interpolators = {}
+        key = (method, excludeBurried)
+        if not key in self._interpolators:
+            measured_x, measured_y, measured_z = self.getAllMeasuredPointsLists(excludeBurried)
+            points = np.column_stack((measured_x, measured_y))
+            interpolators = {'nearest': NearestNDInterpolator,
+                             'linear': LinearNDInterpolator,
+                             'cubic': CloughTocher2DInterpolator}
+            if not method in interpolators:
+                raise ValueError('Unknown interpolation method %s' % method)
+            self._interpolators[key] = interpolators[method](points, measured_z)
+        return self._interpolators[key]
 
     def _getAngle(self, distance):
         '''
@@ -373,74 +449,45 @@ class SeisArray(object):
 
     def getMeasuredReceiverLists(self, excludeBurried=False):
         '''
-        Returns a list of all measured receivers known to SeisArray.
-        '''
-        x = []
-        y = []
-        z = []
-        for traceID in self.getMeasuredReceivers().keys():
-            if excludeBurried:
-                if self.getBurriedReceivers()[traceID]:
-                    continue
-            x.append(self.getMeasuredReceivers()[traceID][0])
-            y.append(self.getMeasuredReceivers()[traceID][1])
-            z.append(self.getMeasuredReceivers()[traceID][2])
-        return x, y, z
+        Returns x, y, z arrays of all measured receivers known to SeisArray.
+        '''
+        mask = self._receivers.getMeasured()
+        if excludeBurried:
+            mask = mask & ~self._receivers.getBurried()
+        return self._receivers.getXYZ(mask)
 
     def getMeasuredTopoLists(self):
         '''
-        Returns a list of all measured topography points known to the SeisArray.
+        Returns x, y, z arrays of all measured topography points known to the SeisArray.
         '''
-        x = []
-        y = []
-        z = []
-        for pointID in self.getMeasuredTopo().keys():
-            x.append(self.getMeasuredTopo()[pointID][0])
-            y.append(self.getMeasuredTopo()[pointID][1])
-            z.append(self.getMeasuredTopo()[pointID][2])
-        return x, y, z
+        return self._topo.getXYZ()
 
     def getSourceLocsLists(self, excludeBurried=False):
         '''
-        Returns a list of all measured source locations known to SeisArray.
-        '''
-        x = []
-        y = []
-        z = []
-        for pointID in self.getSourceCoordinates().keys():
-            if excludeBurried:
-                if self.getBurriedSources()[pointID]:
-                    continue
-            x.append(self.getSourceCoordinates()[pointID][0])
-            y.append(self.getSourceCoordinates()[pointID][1])
-            z.append(self.getSourceCoordinates()[pointID][2])
-        return x, y, z
+        Returns x, y, z arrays of all measured source locations known to SeisArray.
+        '''
+        if excludeBurried:
+            return self._sources.getXYZ(~self._sources.getBurried())
+        return self._sources.getXYZ()
 
     def getAllMeasuredPointsLists(self, excludeBurried=False):
         '''
-        Returns a list of all measured points known to SeisArray.
+        Returns x, y, z arrays of all measured points known to SeisArray.
         '''
         mtopo_x, mtopo_y, mtopo_z = self.getMeasuredTopoLists()
         msource_x, msource_y, msource_z = self.getSourceLocsLists(excludeBurried)
         mrec_x, mrec_y, mrec_z = self.getMeasuredReceiverLists(excludeBurried)
 
-        x = mtopo_x + mrec_x + msource_x
-        y = mtopo_y + mrec_y + msource_y
-        z = mtopo_z + mrec_z + msource_z
+        x = np.concatenate((mtopo_x, mrec_x, msource_x))
+        y = np.concatenate((mtopo_y, mrec_y, msource_y))
+        z = np.concatenate((mtopo_z, mrec_z, msource_z))
         return x, y, z
 
     def getReceiverLists(self):
         '''
-        Returns a list of all receivers (measured and interpolated).
+        Returns x, y, z arrays of all receivers (measured and interpolated).
         '''
-        x = []
-        y = []
-        z = []
-        for traceID in self.getReceiverCoordinates().keys():
-            x.append(self.getReceiverCoordinates()[traceID][0])
-            y.append(self.getReceiverCoordinates()[traceID][1])
-            z.append(self.getReceiverCoordinates()[traceID][2])
-        return x, y, z
+        return self._receivers.getXYZ()
 
     def _interpolateXY4rec(self):
         '''
@@ -498,18 +545,49 @@ class SeisArray(object):
         :param: elevation, default: 0.25 (elevate topography so that no source lies above the surface)
         type: float
         '''
-
-        surface = []
-
         print("Interpolating interface on regular grid with the dimensions:")
         print("nTheta = %s, nPhi = %s, thetaSN = %s, phiWE = %s" % (nTheta, nPhi, thetaSN, phiWE))
         print("method = %s, elevation = %s" % (method, elevation))
 
+        surface = self.getTopographySurface(nTheta, nPhi, thetaSN, phiWE, method, showProgress)
+        return surface.getPoints(elevation)
+
+    def getTopographySurface(self, nTheta, nPhi, thetaSN, phiWE, method='linear', showProgress=True):
+        '''
+        Returns the topography interpolated on a regular grid with cushion nodes (without elevation).
+        The surface is computed once for every set of parameters and is reused until measured points
+        are added to the SeisArray.
+
+        :param: nTheta, number of points in theta (NS)
+        type: integer
+
+        :param: nPhi, number of points in phi (WE)
+        type: integer
+
+        :param: thetaSN (S, N) extensions of the model in degree
+        type: tuple
+
+        :param: phiWE (W, E) extensions of the model in degree
+        type: tuple
+        '''
+        # SeisArrays saved before the surfaces were cached do not have the attribute
+        if not hasattr(self, '_topographySurfaces'):
+            self._topographySurfaces = {}
+        key = (nTheta, nPhi, tuple(thetaSN), tuple(phiWE), method)
+        if not key in self._topographySurfaces:
+            self._topographySurfaces[key] = self._interpolateTopographySurface(nTheta, nPhi, thetaSN, phiWE,
+                                                                               method, showProgress)
+        return self._topographySurfaces[key]
+
+    def _resetInterpolation(self):
+        # measured points changed: the cached interpolators and surfaces are not valid anymore
+        self._interpolators = {}
+        self._topographySurfaces = {}
+
+    def _interpolateTopographySurface(self, nTheta, nPhi, thetaSN, phiWE, method, showProgress):
         thetaS, thetaN = thetaSN
         phiW, phiE = phiWE
 
-        measured_x, measured_y, measured_z = self.getAllMeasuredPointsLists(excludeBurried=True)
-
         # need to determine the delta to add two cushion nodes around the min/max values
         deltaTheta = (thetaN - thetaS) / (nTheta - 1)
         deltaPhi = (phiE - phiW) / (nPhi - 1)
@@ -517,30 +595,26 @@ class SeisArray(object):
         thetaGrid = np.linspace(thetaS - deltaTheta, thetaN + deltaTheta, num=nTheta + 2)  # +2 cushion nodes
         phiGrid = np.linspace(phiW - deltaPhi, phiE + deltaPhi, num=nPhi + 2)  # +2 cushion nodes
 
-        nTotal = len(thetaGrid) * len(phiGrid)
-        count = 0
-        for theta in thetaGrid:
-            for phi in phiGrid:
-                xval = self._getDistance(phi)
-                yval = self._getDistance(theta)
-
-                z = griddata((measured_x, measured_y), measured_z, (xval, yval), method=method)
-                # in case the point lies outside, nan will be returned. Find nearest:
-                if np.isnan(z) == True:
-                    z = griddata((measured_x, measured_y), measured_z, (xval, yval), method='nearest')
-                z = float(z) + elevation
-                surface.append((xval, yval, z))
-                count += 1
-                progress = float(count) / float(nTotal) * 100
-                if showProgress:
-                    self._update_progress(progress)
-
-        return surface
+        # grid points ordered theta (outer loop), phi (inner loop)
+        ygrid, xgrid = np.meshgrid(self._getDistance(thetaGrid), self._getDistance(phiGrid), indexing='ij')
+        xgrid = xgrid.ravel()
+        ygrid = ygrid.ravel()
+
+        # interpolate all grid points at once using the cached triangulation of the measured points
+        z = self._getInterpolator(method, excludeBurried=True)(xgrid, ygrid)
+        # in case a point lies outside, nan will be returned. Find nearest:
+        outside = np.isnan(z)
+        if outside.any():
+            z[outside] = self._getInterpolator('nearest', excludeBurried=True)(xgrid[outside], ygrid[outside])
+        if showProgress:
+            self._update_progress(100.)
+
+        return TopographySurface(xgrid, ygrid, z, (len(thetaGrid), len(phiGrid)))
 
     def generateFMTOMOinputFromArray(self, nPointsPropgrid, nPointsInvgrid,
                                      zBotTop, cushionfactor, interpolationMethod='linear',
                                      customgrid='mygrid.in', elevation=0.25, writeVTK=True,
-                                     showProgress=True):
+                                     showProgress=True, vtkformat='ascii'):
         '''
         Generate FMTOMO input files from the SeisArray dimensions.
         Generates: vgridsref.in, interfacesref.in, propgrid.in
@@ -556,6 +630,10 @@ class SeisArray(object):
 
         :param: cushionfactor, adds cushioning around the model (0.1 = 10%)
         :type: float
+
+        :param: vtkformat, format of the VTK files written if writeVTK is True: 'ascii', 'binary' (legacy VTK)
+        or 'xml' (VTK XML)
+        :type: str
         '''
 
         nPhiP, nThetaP, nRP = nPointsPropgrid
@@ -589,31 +667,23 @@ class SeisArray(object):
                                                    method=interpolationMethod, showProgress=showProgress)
 
         if writeVTK == True:
-            self.surface2VTK(interf1, filename='interface1.vtk')
-            self.surface2VTK(interf2, filename='interface2.vtk')
-            self.receivers2VTK()
-            self.sources2VTK()
+            self.surface2VTK(interf1, filename='interface1.vtk', vtkformat=vtkformat)
+            self.surface2VTK(interf2, filename='interface2.vtk', vtkformat=vtkformat)
+            self.receivers2VTK(vtkformat=vtkformat)
+            self.sources2VTK(vtkformat=vtkformat)
             # fmtomoUtils.vgrids2VTK()
 
     def generateReceiversIn(self, outfilename='receivers.in'):
-        outfile = open(outfilename, 'w')
-
         recx, recy, recz = self.getReceiverLists()
         nsrc = len(self.getSourceCoordinates())
-        outfile.write('%s\n' % (len(zip(recx, recy, recz)) * nsrc))
-
-        for index in range(nsrc):
-            for point in zip(recx, recy, recz):
-                rx, ry, rz = point
-                rad = - rz
-                lat = self._getAngle(ry)
-                lon = self._getAngle(rx)
-                outfile.write('%15s %15s %15s\n' % (rad, lat, lon))
-                outfile.write('%15s\n' % (1))
-                outfile.write('%15s\n' % (index + 1))
-                outfile.write('%15s\n' % (1))
 
-        outfile.close()
+        # all receivers for every source
+        coords = np.column_stack((-recz, self._getAngle(recy), self._getAngle(recx)))
+        receivers = {'coords': np.tile(coords, (nsrc, 1)),
+                     'paths': 1,
+                     'source': np.repeat(np.arange(1, nsrc + 1), len(recx)),
+                     'path': 1}
+        fmtomoIO.writeReceivers(outfilename, receivers)
 
     def generateInterfaces(self, nTheta, nPhi, depthmax, cushionfactor=0.1,
                            outfilename='interfacesref.in', method='linear',
@@ -636,7 +706,6 @@ class SeisArray(object):
 
         print('\n------------------------------------------------------------')
         print('Generating interfaces...')
-        nInterfaces = 2
 
         # generate dimensions of the grid from array
         thetaSN, phiWE = self.getThetaPhiFromArray(cushionfactor)
@@ -645,31 +714,19 @@ class SeisArray(object):
         phiW, phiE = phiWE
         R = 6371.
 
-        outfile = open(outfilename, 'w')
-
         # determine the deltas
         deltaTheta = abs(thetaN - thetaS) / float((nTheta - 1))
         deltaPhi = abs(phiE - phiW) / float((nPhi - 1))
 
-        # write header for interfaces grid file (in RADIANS)
-        outfile.write('%10s\n' % (nInterfaces))
-        outfile.write('%10s %10s\n' % (nTheta + 2, nPhi + 2))  # +2 cushion nodes
-        outfile.write('%10s %10s\n' % (np.deg2rad(deltaTheta), np.deg2rad(deltaPhi)))
-        outfile.write('%10s %10s\n' % (np.deg2rad(thetaS - deltaTheta), np.deg2rad(phiW - deltaPhi)))
-
         interface1 = self.interpolateTopography(nTheta, nPhi, thetaSN, phiWE, elevation=elevation, method=method, showProgress=showProgress)
         interface2 = self.interpolateOnRegularGrid(nTheta, nPhi, thetaSN, phiWE, -depthmax, method=method, showProgress=showProgress)
+        surface = self.getTopographySurface(nTheta, nPhi, thetaSN, phiWE, method)
 
-        for point in interface1:
-            z = point[2]
-            outfile.write('%10s\n' % (z + R))
-
-        outfile.write('\n')
-        for point in interface2:
-            z = point[2]
-            outfile.write('%10s\n' % (z + R))
-
-        outfile.close()
+        # interfaces grid file in RADIANS, +2 cushion nodes
+        fmtomoIO.writeInterfaces(outfilename, (nTheta + 2, nPhi + 2),
+                                 (np.deg2rad(deltaTheta), np.deg2rad(deltaPhi)),
+                                 (np.deg2rad(thetaS - deltaTheta), np.deg2rad(phiW - deltaPhi)),
+                                 [surface.getZgrid(elevation) + R, surface.getZgrid(-depthmax) + R])
 
         if returnInterfaces == True:
             return interface1, interface2
@@ -725,8 +782,6 @@ class SeisArray(object):
         :param: refinement, (refinement factor, number of local cells for refinement) used by FMTOMO
         type: tuple
         '''
-        outfile = open(outfilename, 'w')
-
         print('\n------------------------------------------------------------')
         print('Generating Propagation Grid for nTheta = %s, nPhi'
               ' = %s, nR = %s and a cushioning of %s'
@@ -752,12 +807,8 @@ class SeisArray(object):
         deltaPhi = abs(phiE - phiW) / float(nPhi - 1)
         deltaR = abs(rbot - rtop) / float(nR - 1)
 
-        outfile.write('%10s %10s %10s\n' % (nR, nTheta, nPhi))
-        outfile.write('%10s %10s %10s\n' % (deltaR, deltaTheta, deltaPhi))
-        outfile.write('%10s %10s %10s\n' % (rtop, thetaS, phiW))
-        outfile.write('%10s %10s\n' % refinement)
-
-        outfile.close()
+        fmtomoIO.writePropgrid(outfilename, (nR, nTheta, nPhi), (deltaR, deltaTheta, deltaPhi),
+                               (rtop, thetaS, phiW), refinement)
 
         print('Created Propagation Grid and saved it to %s' % outfilename)
         print('------------------------------------------------------------')
@@ -805,7 +856,6 @@ class SeisArray(object):
         R = 6371.
         vmin = 0.34
         decm = 0.3  # diagonal elements of the covariance matrix (grid3dg's default value is 0.3)
-        outfile = open(outfilename, 'w')
 
         # generate dimensions of the grid from array
         if thetaSN is None and phiWE is None:
@@ -829,13 +879,6 @@ class SeisArray(object):
         nTotal = len(rGrid) * len(thetaGrid) * len(phiGrid)
         print("Total number of grid nodes: %s" % nTotal)
 
-        # write header for velocity grid file (in RADIANS)
-        outfile.write('%10s %10s \n' % (1, 1))
-        outfile.write('%10s %10s %10s\n' % (nR + 2, nTheta + 2, nPhi + 2))
-        outfile.write('%10s %10s %10s\n' % (deltaR, np.deg2rad(deltaTheta), np.deg2rad(deltaPhi)))
-        outfile.write(
-            '%10s %10s %10s\n' % (rbot - deltaR, np.deg2rad(thetaS - deltaTheta), np.deg2rad(phiW - deltaPhi)))
-
         surface = self.interpolateTopography(nTheta, nPhi, thetaSN, phiWE, elevation=elevation, method=method, showProgress=showProgress)
 
         nlayers = readMygridNlayers(infilename)
@@ -845,46 +888,42 @@ class SeisArray(object):
               "Output filename = %s, interpolation method = %s" % (outfilename, method))
         print("nTheta = %s, nPhi = %s, nR = %s, "
               "thetaSN = %s, phiWE = %s, Rbt = %s" % (nTheta, nPhi, nR, thetaSN, phiWE, Rbt))
-        count = 0
 
-        for radius in rGrid:
-            for theta in thetaGrid:
-                for phi in phiGrid:
-                    xval = self._getDistance(phi)
-                    yval = self._getDistance(theta)
-                    for point in surface:
-                        if point[0] == xval and point[1] == yval:
-                            topo = point[2]
-                            break
-                    depth = -(R + topo - radius)
-                    if depth > 1:
-                        vel = 0.0
-                    elif 1 >= depth > 0:  # cushioning around topography
-                        vel = vtop[0]
-                    else:
-                        for index in range(nlayers):
-                            if (ztop[index]) >= depth > (zbot[index]):
-                                vel = (depth - ztop[index]) / (zbot[index] - ztop[index]) * (
-                                    vbot[index] - vtop[index]) + vtop[index]
-                                break
-                        if not (ztop[index]) >= depth > (zbot[index]):
-                            err_msg = 'ERROR in grid inputfile, could not find velocity'
-                            'for a z-value of %s in the inputfile' % (depth - topo)
-                            raise ValueError(err_msg)
-                    count += 1
-                    if not vel >= 0:
-                        err_msg = 'vel < 0'
-                        raise ValueError(err_msg)
-
-                    outfile.write('%10s %10s\n' % (vel, decm))
-
-                    progress = float(count) / float(nTotal) * 100
-                    if showProgress:
-                        self._update_progress(progress)
+        # topography as array (theta, phi)
+        topo = self.getTopographySurface(nTheta, nPhi, thetaSN, phiWE, method).getZgrid(elevation)
+        depth = -(R + topo[np.newaxis, :, :] - rGrid[:, np.newaxis, np.newaxis])
+
+        ztop, zbot, vtop, vbot = (np.array(values, dtype=float) for values in (ztop, zbot, vtop, vbot))
+        vel = np.zeros(depth.shape)
+        vel[(1 >= depth) & (depth > 0)] = vtop[0]  # cushioning around topography
+
+        # layers are ordered from top to bottom, find the first layer with a bottom above depth
+        below = depth <= 0
+        depth_below = depth[below]
+        index = np.searchsorted(-zbot, -depth_below, side='right')
+        found = index < nlayers
+        found[found] = ztop[index[found]] >= depth_below[found]
+        if not found.all():
+            err_msg = ('ERROR in grid inputfile, could not find velocity '
+                       'for a z-value of %s in the inputfile' % depth_below[~found][0])
+            raise ValueError(err_msg)
+        vel[below] = (depth_below - ztop[index]) / (zbot[index] - ztop[index]) * (
+            vbot[index] - vtop[index]) + vtop[index]
+        if not (vel >= 0).all():
+            err_msg = 'vel < 0'
+            raise ValueError(err_msg)
+
+        count = vel.size
+        # velocity grid file in RADIANS
+        fmtomoIO.writeVgrid(outfilename, (nR + 2, nTheta + 2, nPhi + 2),
+                            (deltaR, np.deg2rad(deltaTheta), np.deg2rad(deltaPhi)),
+                            (rbot - deltaR, np.deg2rad(thetaS - deltaTheta), np.deg2rad(phiW - deltaPhi)),
+                            vel, decm)
+        if showProgress:
+            self._update_progress(100.)
 
         print('\nWrote %d points to file %s for %d layers' % (count, outfilename, nlayers))
         print('------------------------------------------------------------')
-        outfile.close()
 
         if returnTopo == True:
             return surface
@@ -985,9 +1024,9 @@ class SeisArray(object):
         xmt, ymt, zmt = self.getMeasuredTopoLists()
         xmr, ymr, zmr = self.getMeasuredReceiverLists()
 
-        x = xmt + xmr
-        y = ymt + ymr
-        z = zmt + zmr
+        x = np.concatenate((xmt, xmr))
+        y = np.concatenate((ymt, ymr))
+        z = np.concatenate((zmt, zmr))
 
         xaxis = np.arange(min(x) + 1, max(x), step)
         yaxis = np.arange(min(y) + 1, max(y), step)
@@ -1015,147 +1054,42 @@ class SeisArray(object):
         sys.stdout.write("%d%% done   \r" % (progress))
         sys.stdout.flush()
 
-    def surface2VTK(self, surface, filename='surface.vtk'):
+    def surface2VTK(self, surface, filename='surface.vtk', vtkformat='ascii'):
         '''
         Generates a vtk file from all points of a surface as generated by interpolateTopography.
-        '''
-        outfile = open(filename, 'w')
-
-        nPoints = len(surface)
-
-        # write header
-        print("Writing header for VTK file...")
-        outfile.write('# vtk DataFile Version 3.1\n')
-        outfile.write('Surface Points\n')
-        outfile.write('ASCII\n')
-        outfile.write('DATASET POLYDATA\n')
-        outfile.write('POINTS %15d float\n' % (nPoints))
-
-        # write coordinates
-        print("Writing coordinates to VTK file...")
-        for point in surface:
-            x = point[0]
-            y = point[1]
-            z = point[2]
-
-            outfile.write('%10f %10f %10f \n' % (x, y, z))
 
-        outfile.write('VERTICES %15d %15d\n' % (nPoints, 2 * nPoints))
-
-        # write indices
-        print("Writing indices to VTK file...")
-        for index in range(nPoints):
-            outfile.write('%10d %10d\n' % (1, index))
-
-        # outfile.write('POINT_DATA %15d\n' %(nPoints))
-        # outfile.write('SCALARS traceIDs int %d\n' %(1))
-        # outfile.write('LOOKUP_TABLE default\n')
-
-        # # write traceIDs
-        # print("Writing traceIDs to VTK file...")
-        # for traceID in traceIDs:
-        #     outfile.write('%10d\n' %traceID)
-
-        outfile.close()
-        print("Wrote %d points to file: %s" % (nPoints, filename))
+        :param: vtkformat, 'ascii', 'binary' (legacy VTK) or 'xml' (VTK XML, written to a .vtp file)
+        :type: str
+        '''
+        points = np.array(surface, dtype=float).reshape(-1, 3)
+        filename = vtkIO.writePolyData(filename, 'Surface Points', points, vertices=True, vtkformat=vtkformat)
+        print("Wrote %d points to file: %s" % (len(points), filename))
         return
 
-    def receivers2VTK(self, filename='receivers.vtk'):
+    def receivers2VTK(self, filename='receivers.vtk', vtkformat='ascii'):
         '''
         Generates a vtk file from all receivers of the SeisArray object.
-        '''
-        outfile = open(filename, 'w')
-        traceIDs = []
-
-        for traceID in self.getReceiverCoordinates():
-            traceIDs.append(traceID)
-
-        nPoints = len(traceIDs)
-
-        # write header
-        print("Writing header for VTK file...")
-        outfile.write('# vtk DataFile Version 3.1\n')
-        outfile.write('Receivers with traceIDs\n')
-        outfile.write('ASCII\n')
-        outfile.write('DATASET POLYDATA\n')
-        outfile.write('POINTS %15d float\n' % (nPoints))
-
-        # write coordinates
-        print("Writing coordinates to VTK file...")
-        for traceID in traceIDs:
-            x = self._getXreceiver(traceID)
-            y = self._getYreceiver(traceID)
-            z = self._getZreceiver(traceID)
-
-            outfile.write('%10f %10f %10f \n' % (x, y, z))
-
-        outfile.write('VERTICES %15d %15d\n' % (nPoints, 2 * nPoints))
-
-        # write indices
-        print("Writing indices to VTK file...")
-        for index in range(nPoints):
-            outfile.write('%10d %10d\n' % (1, index))
-
-        outfile.write('POINT_DATA %15d\n' % (nPoints))
-        outfile.write('SCALARS traceIDs int %d\n' % (1))
-        outfile.write('LOOKUP_TABLE default\n')
 
-        # write traceIDs
-        print("Writing traceIDs to VTK file...")
-        for traceID in traceIDs:
-            outfile.write('%10d\n' % traceID)
-
-        outfile.close()
-        print("Wrote %d receiver for to file: %s" % (nPoints, filename))
+        :param: vtkformat, 'ascii', 'binary' (legacy VTK) or 'xml' (VTK XML, written to a .vtp file)
+        :type: str
+        '''
+        traceIDs = self._receivers.getIDs()
+        filename = vtkIO.writePolyData(filename, 'Receivers with traceIDs', self._receivers.getCoords(),
+                                       vertices=True, pointData=[('traceIDs', traceIDs)], vtkformat=vtkformat)
+        print("Wrote %d receiver for to file: %s" % (len(traceIDs), filename))
         return
 
-    def sources2VTK(self, filename='sources.vtk'):
+    def sources2VTK(self, filename='sources.vtk', vtkformat='ascii'):
         '''
         Generates a vtk-file for all source locations in the SeisArray object.
-        '''
-        outfile = open(filename, 'w')
-        shotnumbers = []
-
-        for shotnumber in self.getSourceCoordinates():
-            shotnumbers.append(shotnumber)
-
-        nPoints = len(shotnumbers)
-
-        # write header
-        print("Writing header for VTK file...")
-        outfile.write('# vtk DataFile Version 3.1\n')
-        outfile.write('Shots with shotnumbers\n')
-        outfile.write('ASCII\n')
-        outfile.write('DATASET POLYDATA\n')
-        outfile.write('POINTS %15d float\n' % (nPoints))
-
-        # write coordinates
-        print("Writing coordinates to VTK file...")
-        for shotnumber in shotnumbers:
-            x = self._getXshot(shotnumber)
-            y = self._getYshot(shotnumber)
-            z = self._getZshot(shotnumber)
 
-            outfile.write('%10f %10f %10f \n' % (x, y, z))
-
-        outfile.write('VERTICES %15d %15d\n' % (nPoints, 2 * nPoints))
-
-        # write indices
-        print("Writing indices to VTK file...")
-        for index in range(nPoints):
-            outfile.write('%10d %10d\n' % (1, index))
-
-        outfile.write('POINT_DATA %15d\n' % (nPoints))
-        outfile.write('SCALARS shotnumbers int %d\n' % (1))
-        outfile.write('LOOKUP_TABLE default\n')
-
-        # write shotnumber
-        print("Writing shotnumbers to VTK file...")
-        for shotnumber in shotnumbers:
-            outfile.write('%10d\n' % shotnumber)
-
-        outfile.close()
-        print("Wrote %d sources to file: %s" % (nPoints, filename))
+        :param: vtkformat, 'ascii', 'binary' (legacy VTK) or 'xml' (VTK XML, written to a .vtp file)
+        :type: str
+        '''
+        shotnumbers = self._sources.getIDs()
+        filename = vtkIO.writePolyData(filename, 'Shots with shotnumbers', self._sources.getCoords(),
+                                       vertices=True, pointData=[('shotnumbers', shotnumbers)], vtkformat=vtkformat)
+        print("Wrote %d sources to file: %s" % (len(shotnumbers), filename))
         return
 
     def saveSeisArray(self, filename='seisArray.pickle'):
@@ -6,6 +6,8 @@
 #   This file is part of ActiveSeismoPick3D
 #----------------------------------------------------------------------------
 
+import io
+import os
 import matplotlib.pyplot as plt
 import numpy as np
 import warnings
@@ -16,10 +18,17 @@ from obspy import Trace
 from obspy.core import read
 from mpl_toolkits.mplot3d import Axes3D
 
+from asp3d.core.picktable import PickTable
 from asp3d.util.charfuns import AICcf
 from asp3d.util.charfuns import HOScf
+from asp3d.util.charfuns import calcAIC
+from asp3d.util.charfuns import calcHOScfArray
+from asp3d.util.streamCache import readStreamCache
+from asp3d.util.streamCache import writeStreamCache
 from asp3d.util.utils import getSNR
+from asp3d.util.utils import getSNRArray
 from asp3d.util.utils import earllatepicker
+from asp3d.util.utils import earllatepickerArray
 
 try:
     import copy_reg as copyreg
@@ -38,74 +47,275 @@ class SeismicShot(object):
     SuperClass for a seismic shot object.
     '''
 
-    def __init__(self, obsfile):
+    def __init__(self, obsfile, lazy=False, waveformCache=None, cachedir=None, filedata=None):
         '''
         Initialize seismic shot object giving an inputfile.
 
         :param: obsfile, ((!SEG2/SEGY!)) file readable by obspy
         :type: string
+
+        :param: lazy, only read the trace headers, the waveform data is read on first access
+        :type: bool
+
+        :param: waveformCache, used to keep the memory of lazy shots within a budget
+        :type: `~asp3d.core.waveformcache.WaveformCache`
+
+        :param: cachedir, directory of the on-disk cache for the waveform data (see asp3d.util.streamCache),
+        None for no cache
+        :type: string
+
+        :param: filedata, content of obsfile if it was already read into memory
+        :type: bytes
         '''
-        self.stream = read(obsfile)
-        self.data = self.stream
-        self.renameChannelIDs(obsfile)
+        self._waveformCache = waveformCache
+        self._cachedir = cachedir
+        if lazy:
+            self._stream = None
+            self._headers = self._readHeaders(obsfile, filedata)
+        else:
+            self._stream = self._readStream(obsfile, filedata=filedata)
+            self._headers = None
+        self._buildTraceIndex()
         # self.recCoordlist = None
         # self.srcCoordlist = None
         self.traceIDs = None
-        self.picks = {}
+        self._picktable = PickTable()
         self.hos_picks = {}
         self.aic_picks = {}
         self.pickduration = {}
-        self.pwindow = {}
         self.manualpicks = {}
-        self.snr = {}
-        self.snrthreshold = {}
         self.timeArray = {}
         self.traces4plot = {}
         self.paras = {}
-        self.paras['shotname'] = obsfile
+        # absolute path, lazy shots of a saved Survey read their waveforms from it again
+        self.paras['shotname'] = os.path.abspath(obsfile)
         self.folm = None
 
-    def renameChannelIDs(self, obsfile):
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.isLazy():
+            # waveform data of lazy shots is read from file again
+            state['_stream'] = None
+            state['_traceIndex'] = None
+        return state
+
+    def __setstate__(self, state):
+        # shots saved before lazy loading was introduced
+        if 'stream' in state:
+            state['_stream'] = state.pop('stream')
+            state.pop('data', None)
+        state.setdefault('_headers', None)
+        state.setdefault('_waveformCache', None)
+        state.setdefault('_cachedir', None)
+        self.__dict__.update(state)
+
+    @property
+    def stream(self):
+        self._touchData()
+        return self._stream
+
+    @stream.setter
+    def stream(self, stream):
+        self._stream = stream
+        self._buildTraceIndex()
+
+    def _readStream(self, obsfile, headonly=False, filedata=None):
+        if self._cachedir is not None:
+            stream = readStreamCache(obsfile, self._cachedir, headonly)
+            if stream is not None:
+                return stream
+
+        def source():
+            if filedata is None:
+                return obsfile
+            return io.BytesIO(filedata)
+
+        stream = read(source(), headonly=headonly)
         # experimental feature to read in synthetic data generated by SPECFEM_for_ASKI
         # first checking format and re-reading seismic unix file with unpacking _header
-        if self.stream[0].stats._format == 'SU':
+        if stream[0].stats._format == 'SU':
             print('Reading SU File... Re-reading Stream with "unpacking_header" attribute')
-            self.stream = read(obsfile, unpack_trace_headers=True)
+            stream = read(source(), unpack_trace_headers=True, headonly=headonly)
+        self.renameChannelIDs(stream)
 
-        for trace in self.stream:
+        # some formats (e.g. SEG2) read the data even if headonly is set
+        if self._cachedir is not None and all(len(trace.data) == trace.stats.npts for trace in stream):
+            writeStreamCache(stream, obsfile, self._cachedir)
+        return stream
+
+    def _readHeaders(self, obsfile, filedata=None):
+        '''
+        Returns a stream containing the trace headers of obsfile only (traces without data).
+        '''
+        stream = self._readStream(obsfile, headonly=True, filedata=filedata)
+        return Stream([Trace(header=trace.stats) for trace in stream])
+
+    def renameChannelIDs(self, stream):
+        for trace in stream:
             if trace.stats._format == 'SEG2':
                 trace.stats.channel = int(trace.stats.seg2['CHANNEL_NUMBER'])
             if trace.stats._format == 'SU':
                 traceID = int(trace.stats.su['trace_header']['trace_number_within_the_original_field_record'])
                 trace.stats.channel = traceID
 
+    def isLazy(self):
+        return self._headers is not None
+
+    def isLoaded(self):
+        '''
+        Returns True if the waveform data of the shot is in memory.
+        '''
+        return self._stream is not None
+
+    def loadData(self):
+        '''
+        Reads the waveform data of a lazy shot. Traces that were removed from the shot are skipped.
+        '''
+        if self.isLoaded():
+            return
+        stream = self._readStream(self.paras['shotname'])
+        traceIndex = self._getTraceIndex()
+        stream.traces = [trace for trace in stream if int(trace.stats.channel) in traceIndex]
+        self._stream = stream
+        self._buildTraceIndex()
+        if self._waveformCache is not None:
+            self._waveformCache.add(self, sum(trace.data.nbytes for trace in stream))
+
+    def releaseData(self):
+        '''
+        Releases the waveform data of a lazy shot. It will be read again on the next access.
+        '''
+        if not self.isLazy() or not self.isLoaded():
+            return
+        self._stream = None
+        self._buildTraceIndex()
+        if self._waveformCache is not None:
+            self._waveformCache.remove(self)
+
+    def getHeaders(self):
+        '''
+        Returns the stream without reading the waveform data of a lazy shot.
+        Traces of lazy shots that are not loaded contain no data.
+        '''
+        if self.isLoaded():
+            return self._stream
+        return self._headers
+
+    def _buildTraceIndex(self):
+        '''
+        Builds the index of all traces in the stream. Key: traceID (channel), value: list of traces.
+        '''
+        self._traceIndex = {}
+        for trace in self.getHeaders():
+            self._traceIndex.setdefault(int(trace.stats.channel), []).append(trace)
+
+    def _getTraceIndex(self):
+        # shots saved before the index was introduced do not have it
+        if getattr(self, '_traceIndex', None) is None:
+            self._buildTraceIndex()
+        return self._traceIndex
+
+    def _getPickTable(self):
+        # shots saved before the PickTable was introduced still contain the pick dictionaries
+        if getattr(self, '_picktable', None) is None:
+            self._picktable = PickTable()
+            self._importPickDicts()
+        return self._picktable
+
+    def _importPickDicts(self):
+        '''
+        Moves the picks of the former dictionaries (picks, snr, snrthreshold, pwindow) to the PickTable.
+        '''
+        for traceID, pick in self.__dict__.pop('picks', {}).items():
+            self.setPick(traceID, pick.get('mpp'), pick.get('revised', False))
+            self.setPickFlag(traceID, pick.get('pickflag', False))
+            for name in ['epp', 'lpp', 'spe']:
+                self._setTableValue(traceID, name, pick.get(name))
+        for traceID, snr in self.__dict__.pop('snr', {}).items():
+            self._setSNRvalues(traceID, snr)
+        for traceID, snrthreshold in self.__dict__.pop('snrthreshold', {}).items():
+            self.setSNRthreshold(traceID, snrthreshold)
+        for traceID, pickwindow in self.__dict__.pop('pwindow', {}).items():
+            self.setPickwindow(traceID, pickwindow)
+
+    def _getTableKey(self):
+        # rows of a shot without shotnumber are stored with shotnumber -1
+        return self.paras.get('shotnumber', -1)
+
+    def _getTableValue(self, traceID, name):
+        return self._getPickTable().getValue(self._getTableKey(), traceID, name)
+
+    def _setTableValue(self, traceID, name, value):
+        self._getPickTable().setValue(self._getTableKey(), traceID, name, value)
+
+    def getPickTable(self):
+        '''
+        Returns the PickTable containing the picks of this shot.
+        '''
+        return self._getPickTable()
+
+    def setPickTable(self, picktable):
+        '''
+        Moves all picks of the shot to picktable (e.g. the PickTable of a Survey) and uses
+        it from now on. Rows are added for all traceIDs of the shot.
+
+        :param: picktable
+        :type: `~asp3d.core.picktable.PickTable`
+        '''
+        oldtable = self._getPickTable()
+        key = self._getTableKey()
+        picktable.addRows(key, self.getTraceIDlist())
+        if oldtable is not picktable:
+            picktable.copyRows(oldtable, oldtable.getRows(key))
+        self._picktable = picktable
+
+    def getPickTraceIDs(self):
+        '''
+        Returns a list of all traceIDs that were picked (including removed picks).
+        '''
+        table = self._getPickTable()
+        rows = table.getRows(self._getTableKey())
+        rows = rows[table.getColumn('picked')[rows]]
+        return [int(traceID) for traceID in table.getTraceIDs()[rows]]
+
     def removeEmptyTraces(self):
-        traceIDs = []
         removed = []
-        traceIDs = list(self.getReceiverCoords().keys())
+        receivers = self.getReceiverCoords()
 
-        for trace in self.stream:
-            try:
-                traceIDs.index(int(trace.stats.channel))
-            except:
-                self.stream.remove(trace)
-                removed.append(int(trace.stats.channel))
+        for traceID, traces in list(self._getTraceIndex().items()):
+            if traceID not in receivers:
+                removed += [traceID] * len(traces)
+                self.removeTrace(traceID)
 
         if len(removed) > 0:
             return removed
 
+    def _touchData(self):
+        # reads the waveform data of a lazy shot if necessary and marks it as recently used
+        if not self.isLoaded():
+            self.loadData()
+        elif self._waveformCache is not None:
+            self._waveformCache.touch(self)
+
+    def _getLoadedTraceIndex(self):
+        # the trace index pointing to the traces containing the waveform data
+        self._touchData()
+        return self._getTraceIndex()
+
     def removeTrace(self, traceID):
-        for trace in self.stream:
-            if traceID == trace.stats.channel:
-                self.stream.remove(trace)
+        if len(self._getTraceIndex().pop(traceID, [])) > 0:
+            for stream in (self._stream, self._headers):
+                if stream is not None:
+                    stream.traces = [trace for trace in stream if int(trace.stats.channel) != traceID]
 
     def updateTraceList(self):
         '''
         Looks for empty traces, returns a list of deleted traceIDs.
         '''
         traceIDs = []
-        for traceID in self.getTraceIDlist():
-            if traceID not in self.getStreamTraceIDs():
+        traceIndex = self._getTraceIndex()
+        for traceID in list(self.getTraceIDlist()):
+            if traceID not in traceIndex:
                 self.traceIDs.remove(traceID)
                 traceIDs.append(traceID)
         return traceIDs
@@ -155,6 +365,9 @@ class SeismicShot(object):
         self.setParameters('tgap', tgap)
 
     def setShotnumber(self, shotnumber):
+        oldkey = self._getTableKey()
+        if oldkey != shotnumber:
+            self._getPickTable().renameShot(oldkey, shotnumber)
         self.setParameters('shotnumber', shotnumber)
 
     def setReceiverCoords(self, receiver):
@@ -244,27 +457,24 @@ class SeismicShot(object):
         return self.manualpicks[traceID]['lpp']
 
     def getPick(self, traceID, returnRemoved=False):
-        if self.getPickFlag(traceID):
-            return self.picks[traceID]['mpp']
-        if returnRemoved == True:
-            return self.picks[traceID]['mpp']
+        if self.getPickFlag(traceID) or returnRemoved == True:
+            pick = self._getTableValue(traceID, 'mpp')
+            if not np.isnan(pick):
+                return pick
 
     def getPickIncludeRemoved(self, traceID):
         return self.getPick(traceID, returnRemoved=True)
 
     def getEarliest(self, traceID):
         if self.getPickFlag(traceID):
-            return self.picks[traceID]['epp']
+            return self._getTableValue(traceID, 'epp')
 
     def getLatest(self, traceID):
         if self.getPickFlag(traceID):
-            return self.picks[traceID]['lpp']
+            return self._getTableValue(traceID, 'lpp')
 
     def getSymmetricPickError(self, traceID):
-        if self.picks[traceID].has_key('spe'):
-            pickerror = self.picks[traceID]['spe']
-        else:
-            pickerror = np.nan
+        pickerror = self._getTableValue(traceID, 'spe')
         if np.isnan(pickerror) == True:
             print("SPE is NaN for shot %s, traceID %s" % (self.getShotnumber(), traceID))
         return pickerror
@@ -276,10 +486,7 @@ class SeismicShot(object):
         return pickerror
 
     def getStreamTraceIDs(self):
-        traceIDs = []
-        for trace in self.stream:
-            traceIDs.append(int(trace.stats.channel))
-        return traceIDs
+        return list(self._getTraceIndex().keys())
 
     def getTraceIDlist(self):
         '''
@@ -292,18 +499,20 @@ class SeismicShot(object):
         return self.traceIDs
 
     def getPickwindow(self, traceID):
-        try:
-            self.pwindow[traceID]
-        except KeyError as e:
+        if np.isnan(self._getTableValue(traceID, 'pwleft')):
             print('no pickwindow for trace %s, set to %s' % (traceID, self.getCut()))
             self.setPickwindow(traceID, self.getCut())
-        return self.pwindow[traceID]
+        return (self._getTableValue(traceID, 'pwleft'), self._getTableValue(traceID, 'pwright'))
 
     def getSNR(self, traceID):
-        return self.snr[traceID]
+        '''
+        Returns (SNR, SNRdB, noiselevel) as calculated by setSNR.
+        '''
+        if self._getTableValue(traceID, 'snrset'):
+            return tuple(self._getTableValue(traceID, name) for name in ['snr', 'snrdb', 'noiselevel'])
 
     def getSNRthreshold(self, traceID):
-        return self.snrthreshold[traceID]
+        return self._getTableValue(traceID, 'snrthreshold')
 
     # def getRecCoordlist(self):
     #     if self.recCoordlist is None:
@@ -371,15 +580,14 @@ class SeismicShot(object):
         :param: traceID
         :type: int
         '''
-        # traces = [trace for trace in self.stream if int(trace.stats.seg2['CHANNEL_NUMBER']) == traceID]
-        traces = [trace for trace in self.stream if int(trace.stats.channel) == traceID]
+        traces = self._getLoadedTraceIndex().get(traceID, [])
         if len(traces) == 1:
             return Stream(traces)
         self.setPick(traceID, None)
         warnings.warn('ambigious or empty traceID: %s' % traceID)
 
     def getStream(self):
-        return self.data
+        return self.stream
     
     def getTrace(self, traceID):
         return self.getSingleStream(traceID)[0]
@@ -421,6 +629,124 @@ class SeismicShot(object):
 
         return setHosAic[self.getMethod()]
 
+    def pickAllTraces(self):
+        '''
+        Intitiate picking for all traces of the shot at once. Traces with the same
+        number of samples are stacked into one array, so that the characteristic
+        functions and the threshold picker are calculated for all of them in one pass.
+        Sets the picks for all traces and returns them in a dictionary.
+
+        Key: traceID
+        '''
+        starttime = datetime.now()
+        cut = self.getCut()
+
+        picks = {}
+        for (npts, delta, sampling_rate), (traceIDs, data) in self._getTraceGroups().items():
+            for traceID in traceIDs:
+                self.setDynPickwindow(traceID)
+            hoscf = calcHOScfArray(data, delta, cut, self.getTmovwind(), self.getOrder())
+            aiccf = calcAIC(hoscf)
+            timeArray = np.arange(0, hoscf.shape[1] * delta, delta) + cut[0]
+            pickwindows = np.array([self.getPickwindow(traceID) for traceID in traceIDs], dtype=float)
+
+            aiccftimes, hoscftimes = self._thresholdArray(hoscf, aiccf, timeArray, self.getAICwindow(),
+                                                          pickwindows, self.getFolm())
+            setHosAic = {'hos': hoscftimes,
+                         'aic': np.where(aiccftimes < pickwindows[:, 0], 0, aiccftimes)}
+
+            for index, traceID in enumerate(traceIDs):
+                self.timeArray[traceID] = timeArray
+                self.aic_picks[traceID] = aiccftimes[index]
+                self.hos_picks[traceID] = hoscftimes[index]
+                picks[traceID] = setHosAic[self.getMethod()][index]
+                self.setPick(traceID, picks[traceID], revised=False)
+
+        tdur = (datetime.now() - starttime) / max(len(picks), 1)
+        for traceID in picks:
+            self.pickduration[traceID] = tdur
+
+        return picks
+
+    def _getTraceGroups(self):
+        '''
+        Returns a dictionary containing the traceIDs and the data (2-D array, one trace per row)
+        of all traces with the same sampling and number of samples.
+
+        Key: (npts, delta, sampling_rate)
+        '''
+        groups = {}
+        for traceID, trace in self._getTraces4Picking().items():
+            key = (trace.stats.npts, trace.stats.delta, trace.stats.sampling_rate)
+            groups.setdefault(key, []).append((traceID, trace))
+
+        for key, traces in groups.items():
+            traceIDs = [traceID for traceID, trace in traces]
+            data = np.vstack([trace.data for traceID, trace in traces])
+            groups[key] = (traceIDs, data)
+        return groups
+
+    def _getTraces4Picking(self):
+        '''
+        Returns a dictionary containing the trace for each traceID of the shot.
+        Ambigious or empty traceIDs are skipped (pick set to None) as in getSingleStream.
+        '''
+        channels = self._getLoadedTraceIndex()
+        traces = {}
+        for traceID in self.getTraceIDlist():
+            if len(channels.get(traceID, [])) == 1:
+                traces[traceID] = channels[traceID][0]
+            else:
+                self.setPick(traceID, None)
+                warnings.warn('ambigious or empty traceID: %s' % traceID)
+        return traces
+
+    def filterSNR(self):
+        '''
+        Calculates the SNR for all traces of the shot at once (as setSNR does for a single trace)
+        and removes all picks that are not positive or have a SNR below the SNR threshold.
+        '''
+        tgap = self.getTgap()
+        tsignal = self.getTsignal()
+        table = self._getPickTable()
+        for (npts, delta, sampling_rate), (traceIDs, data) in self._getTraceGroups().items():
+            rows = table.addRows(self._getTableKey(), traceIDs)
+            picks = np.where(table.getColumn('pickflag')[rows], table.getColumn('mpp')[rows], np.nan)
+            snr, snrdb, noiselevel = getSNRArray(data, delta, (picks - tgap, tgap, tsignal), picks,
+                                                 sampling_rate=sampling_rate)
+            table.getColumn('snr')[rows] = snr
+            table.getColumn('snrdb')[rows] = snrdb
+            table.getColumn('noiselevel')[rows] = noiselevel
+            table.getColumn('snrset')[rows] = ~np.isnan(noiselevel)
+
+            with np.errstate(invalid='ignore'):
+                remove = ~(picks > 0) | (snr < table.getColumn('snrthreshold')[rows])
+            remove = rows[remove & table.getColumn('picked')[rows]]
+            table.getColumn('pickflag')[remove] = False
+            table.getColumn('revised')[remove] = False
+
+    def setEarllatepicks(self, nfac=1.5):
+        '''
+        Sets earliest and latest possible picks and symmetric pick errors for all traces of the
+        shot at once (as setEarllatepick does for a single trace).
+        '''
+        tgap = self.getTgap()
+        tsignal = self.getTsignal()
+        table = self._getPickTable()
+        for (npts, delta, sampling_rate), (traceIDs, data) in self._getTraceGroups().items():
+            rows = table.addRows(self._getTableKey(), traceIDs)
+            picks = table.getColumn('mpp')[rows]
+            epp, lpp, spe = earllatepickerArray(data, delta, nfac, (picks - tgap, tgap, tsignal), picks,
+                                                sampling_rate=sampling_rate)
+            # unset epp and lpp if SNR > 1 (else earllatepicker cant set values)
+            with np.errstate(invalid='ignore'):
+                lowSNR = ~(table.getColumn('snr')[rows] > 1)
+            for array in (epp, lpp, spe):
+                array[lowSNR] = np.nan
+            table.getColumn('epp')[rows] = epp
+            table.getColumn('lpp')[rows] = lpp
+            table.getColumn('spe')[rows] = spe
+
     def setEarllatepick(self, traceID, nfac=1.5):
         tgap = self.getTgap()
         tsignal = self.getTsignal()
@@ -428,17 +754,18 @@ class SeismicShot(object):
 
         # unset epp and lpp if SNR > 1 (else earllatepicker cant set values)
         if not self.getSNR(traceID)[0] > 1:
-            self.picks[traceID]['epp'] = np.nan
-            self.picks[traceID]['lpp'] = np.nan
-            self.picks[traceID]['spe'] = np.nan
+            self._setTableValue(traceID, 'epp', np.nan)
+            self._setTableValue(traceID, 'lpp', np.nan)
+            self._setTableValue(traceID, 'spe', np.nan)
             return
 
-        (self.picks[traceID]['epp'],
-         self.picks[traceID]['lpp'],
-         self.picks[traceID]['spe']) = earllatepicker(self.getSingleStream(traceID),
-                                                      nfac, (tnoise, tgap, tsignal),
-                                                      self.getPickIncludeRemoved(traceID),
-                                                      stealth_mode=True)
+        epp, lpp, spe = earllatepicker(self.getSingleStream(traceID),
+                                       nfac, (tnoise, tgap, tsignal),
+                                       self.getPickIncludeRemoved(traceID),
+                                       stealth_mode=True)
+        self._setTableValue(traceID, 'epp', epp)
+        self._setTableValue(traceID, 'lpp', lpp)
+        self._setTableValue(traceID, 'spe', spe)
 
     def threshold(self, hoscf, aiccf, windowsize, pickwindow, folm):
         '''
@@ -495,6 +822,54 @@ class SeismicShot(object):
 
         return aiccftime, hoscftime
 
+    def _thresholdArray(self, hoscf, aiccf, timeArray, windowsize, pickwindows, folm):
+        '''
+        Threshold picker as in SeismicShot.threshold for 2-D arrays (ntraces x nsamples)
+        of characteristic functions. Returns arrays of AIC and HOS pick times.
+
+        :param: hoscf, aiccf, Higher Order Statistics and Akaike Characteristic Functions
+        :type: `~numpy.ndarray`
+
+        :param: timeArray, time axis of the characteristic functions
+        :type: `~numpy.ndarray`
+
+        :param: windowsize, window around the returned HOS picktime, to search for the AIC minumum
+        :type: 'tuple'
+
+        :param: pickwindows [seconds], pickwindow for each trace
+        :type: `~numpy.ndarray` (ntraces x 2)
+
+        :param: folm, fraction of local maximum
+        :type: 'real'
+        '''
+        ntraces, nsamples = hoscf.shape
+        index = np.arange(nsamples)
+
+        leftb = (pickwindows[:, 0] / self.getCut()[1] * nsamples).astype(int)
+        rightb = (pickwindows[:, 1] / self.getCut()[1] * nsamples).astype(int)
+
+        inwindow = (index >= leftb[:, None]) & (index < rightb[:, None])
+        if not inwindow.any(axis=1).all():
+            raise ValueError('Threshold Picker: empty pickwindow for shot %s.' % self.getShotnumber())
+        cfmax = np.where(inwindow, hoscf, -np.inf).max(axis=1)
+        cfmin = np.where(inwindow, hoscf, np.inf).min(axis=1)
+        threshold = folm * (cfmax - cfmin) + cfmin  # combination of local maximum and threshold
+
+        # first sample right of the left border of the pickwindow reaching the threshold
+        exceeds = (index >= leftb[:, None]) & ~(hoscf < threshold[:, None])
+        if not exceeds.any(axis=1).all():
+            raise ValueError('Threshold Picker: threshold not reached for shot %s.' % self.getShotnumber())
+        m = exceeds.argmax(axis=1)
+        hoscftimes = timeArray[m]
+
+        lb = np.maximum(0, m - windowsize[0])  # if window exceeds t = 0
+        inaicwindow = (index >= lb[:, None]) & (index < (m + windowsize[1])[:, None])
+        n = np.where(inaicwindow, aiccf, np.inf).argmin(axis=1)
+        m = np.where(inaicwindow.any(axis=1), n, lb)
+        aiccftimes = timeArray[m]
+
+        return aiccftimes, hoscftimes
+
     def getDistance(self, traceID):
         '''
         Returns the distance of the receiver with the ID == traceID to the source location (shot location).
@@ -548,9 +923,7 @@ class SeismicShot(object):
         '''
 
         traceID_list = []
-        for trace in self.stream:
-            # traceID = int(trace.stats.seg2['CHANNEL_NUMBER'])
-            traceID = int(trace.stats.channel)
+        for traceID in self.getStreamTraceIDs():
             if distance != 0:
                 if self.getDistance(traceID) == distance:
                     traceID_list.append(traceID)
@@ -577,7 +950,7 @@ class SeismicShot(object):
                 continue
             traceID, mpp, epp, lpp = line.split()
             traceID = int(traceID)
-            if traceID in self.picks.keys():
+            if self._getTableValue(traceID, 'picked'):
                 self.manualpicks[traceID] = {'mpp': float(mpp),
                                              'epp': float(epp),
                                              'lpp': float(lpp)}
@@ -587,9 +960,8 @@ class SeismicShot(object):
                 self.setManualPickFlag(traceID, True)
 
     def setPick(self, traceID, pick, revised=False):
-        if not traceID in self.picks.keys():
-            self.picks[traceID] = {}
-        self.picks[traceID]['mpp'] = pick
+        self._setTableValue(traceID, 'picked', True)
+        self._setTableValue(traceID, 'mpp', pick)
         if pick is None:
             self.removePick(traceID)
         self.setPickFlag(traceID, True)
@@ -607,23 +979,23 @@ class SeismicShot(object):
 
     def setPickFlag(self, traceID, flag):
         'Set flag = False if pick is invalid, True if valid.'
-        try:
-            self.picks[traceID]['pickflag'] = flag
-        except:
+        if self._getTableValue(traceID, 'picked'):
+            self._setTableValue(traceID, 'pickflag', flag)
+        else:
             print('Warning. TraceID %s not found for shot %s' % (traceID, self.getShotnumber()))
 
     def setRevised(self, traceID, flag):
         'Set flag = True if pick is manually revised. Else flag = False.'
-        try:
-            self.picks[traceID]['revised'] = flag
-        except:
+        if self._getTableValue(traceID, 'picked'):
+            self._setTableValue(traceID, 'revised', flag)
+        else:
             print('Warning. TraceID %s not found for shot %s' % (traceID, self.getShotnumber()))
 
     def getPickFlag(self, traceID):
-        return self.picks[traceID]['pickflag']
+        return bool(self._getTableValue(traceID, 'pickflag'))
 
     def getRevised(self, traceID):
-        return self.picks[traceID]['revised']
+        return bool(self._getTableValue(traceID, 'revised'))
 
     def setManualPickFlag(self, traceID, flag):
         'Set flag = False if pick is invalid, else flag = True'
@@ -633,7 +1005,26 @@ class SeismicShot(object):
         return self.manualpicks[traceID]['pickflag']
 
     def setPickwindow(self, traceID, pickwindow):
-        self.pwindow[traceID] = pickwindow
+        self._setTableValue(traceID, 'pwleft', pickwindow[0])
+        self._setTableValue(traceID, 'pwright', pickwindow[1])
+
+    def setInitialPickwindow(self):
+        '''
+        Sets the pickwindow of all traces and the cut window of the shot to the length of the traces.
+        '''
+        length_differs = False
+        for index, traceID in enumerate(self.getTraceIDlist()):
+            stats = self.getHeaders().traces[index].stats
+            if index == 0:
+                pickwindow_0 = (0, (stats.endtime - stats.starttime))
+            pickwindow = (0, (stats.endtime - stats.starttime))
+            if not pickwindow == pickwindow_0:
+                length_differs = True
+                print('Warning: individual trace length differs for shot %s' % self.getShotnumber())
+            self.setPickwindow(traceID, pickwindow)
+        if length_differs:
+            print('Warning: Can not set a consistent CUT-window for all traces of shot %s' % self.getShotnumber())
+        self.setCut(pickwindow)
 
     def setSNR(self, traceID):  ########## FORCED HOS PICK ##########
         '''
@@ -648,10 +1039,19 @@ class SeismicShot(object):
         tsignal = self.getTsignal()
         tnoise = self.getPick(traceID) - tgap
 
-        self.snr[traceID] = getSNR(self.getSingleStream(traceID), (tnoise, tgap, tsignal), self.getPick(traceID))
+        self._setSNRvalues(traceID, getSNR(self.getSingleStream(traceID), (tnoise, tgap, tsignal),
+                                           self.getPick(traceID)))
+
+    def _setSNRvalues(self, traceID, snr):
+        if snr is None:
+            self._setTableValue(traceID, 'snrset', False)
+            return
+        self._setTableValue(traceID, 'snrset', True)
+        for name, value in zip(['snr', 'snrdb', 'noiselevel'], snr):
+            self._setTableValue(traceID, name, value)
 
     def setSNRthreshold(self, traceID, snrthreshold):
-        self.snrthreshold[traceID] = snrthreshold
+        self._setTableValue(traceID, 'snrthreshold', snrthreshold)
 
     def getDistArray4ttcPlot(self):  ########## nur fuer 2D benoetigt ##########
         '''
@@ -659,7 +1059,7 @@ class SeismicShot(object):
         '''
         distancearray = []
 
-        for traceID in self.picks.keys():
+        for traceID in self.getPickTraceIDs():
             if self.getRecLoc(traceID)[0] > self.getSrcLoc()[0]:
                 distancearray.append(self.getDistance(traceID))
             elif self.getRecLoc(traceID)[0] <= self.getSrcLoc()[0]:
@@ -675,7 +1075,7 @@ class SeismicShot(object):
         plt.interactive('True')
         picks = []
 
-        for traceID in self.picks.keys():
+        for traceID in self.getPickTraceIDs():
             picks.append(self.getPick(traceID))
 
         if ax is None:
@@ -701,7 +1101,7 @@ class SeismicShot(object):
         plt.interactive('True')
         manualpicktimesarray = []
 
-        for traceID in self.picks.keys():
+        for traceID in self.getPickTraceIDs():
             if not traceID in self.manualpicks.keys() or not self.getManualPickFlag(traceID):
                 manualpicktimesarray.append(None)
             else:
@@ -979,7 +1379,7 @@ class SeismicShot(object):
         x = []
         y = []
         z = []
-        for traceID in self.picks.keys():
+        for traceID in self.getPickTraceIDs():
             if self.getPickFlag(traceID):
                 x.append(self.getRecLoc(traceID)[0])
                 y.append(self.getRecLoc(traceID)[1])
@@ -1065,7 +1465,7 @@ class SeismicShot(object):
 
         self.translateIDs = []
 
-        for index, traceID in enumerate(self.picks.keys()):
+        for index, traceID in enumerate(self.getPickTraceIDs()):
             if not traceID == 0 and not self.getPick(traceID) == 0:
                 xall.append(self.getRecLoc(traceID)[0])
                 yall.append(self.getRecLoc(traceID)[1])
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+#   Copyright 2017 Marcel Paffrath (Ruhr-Universitaet Bochum, Germany)
+#
+#   This file is part of ActiveSeismoPick3D
+#----------------------------------------------------------------------------
+'''
+Incremental storage of a Survey. The survey is split into
+
+- the survey file: the Survey object without waveform data and without picks.
+  The shots only keep their trace headers, the waveforms are read again from
+  the data files (or the waveform cache) on demand after loading.
+- the pick directory (survey file + '.picks'): one columnar .npz file per shot
+  containing all columns of the PickTable rows of the shot.
+
+On saving, files are only written if their content changed since the survey was
+last saved to (or loaded from) the same survey file.
+'''
+
+import copy
+import hashlib
+import os
+import numpy as np
+
+from obspy import Stream
+from obspy import Trace
+
+from asp3d.core.picktable import PickTable
+from asp3d.core.waveformcache import WaveformCache
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+STORE_VERSION = 1
+
+
+def getPickDirectory(filename):
+    return filename + '.picks'
+
+
+def isSurveyStore(survey):
+    '''
+    Returns True if survey was loaded from a survey file written by saveSurveyStore
+    (the picks still have to be read using loadSurveyStore).
+    '''
+    return getattr(survey, '_storeVersion', None) is not None
+
+
+def _writeFile(filename, content):
+    # write to a temporary file first, so that an interrupted save does not destroy the old file
+    tmpfile = filename + '.tmp'
+    with open(tmpfile, 'wb') as outfile:
+        outfile.write(content)
+    if os.path.isfile(filename):
+        os.remove(filename)
+    os.rename(tmpfile, filename)
+
+
+def _copyShot(shot):
+    '''
+    Returns a shallow copy of shot without waveform data and without picks.
+    '''
+    shotcopy = copy.copy(shot)
+    shotcopy._headers = Stream([Trace(header=trace.stats) for trace in shot.getHeaders()])
+    shotcopy._stream = None
+    shotcopy._traceIndex = None
+    shotcopy._picktable = None
+    shotcopy._waveformCache = None
+    return shotcopy
+
+
+def _copySurvey(survey):
+    '''
+    Returns a shallow copy of survey containing copies of the shots without waveform data and
+    without picks.
+    '''
+    surveycopy = copy.copy(survey)
+    surveycopy.__dict__.pop('_storeState', None)
+    surveycopy.data = dict((shotnumber, _copyShot(shot)) for shotnumber, shot in survey.data.items())
+    surveycopy.picktable = None
+    surveycopy._storeVersion = STORE_VERSION
+    return surveycopy
+
+
+def _getShotRows(table):
+    '''
+    Returns a dictionary containing the PickTable rows for every shot. Key: shotnumber
+    '''
+    shotnumbers = table.getShotnumbers()
+    order = np.argsort(shotnumbers, kind='mergesort')
+    ushots, starts = np.unique(shotnumbers[order], return_index=True)
+    return dict((int(shotnumber), rows) for shotnumber, rows in zip(ushots, np.split(order, starts[1:])))
+
+
+def _shotDigest(table, rows):
+    md5 = hashlib.md5()
+    md5.update(np.ascontiguousarray(table.getTraceIDs()[rows]).tobytes())
+    for name in PickTable.floatColumns + PickTable.boolColumns:
+        md5.update(np.ascontiguousarray(table.getColumn(name)[rows]).tobytes())
+    return md5.hexdigest()
+
+
+def saveSurveyStore(survey, filename):
+    '''
+    Saves survey to filename (survey without waveform data and picks) and the picks to the pick
+    directory. Only the files of shots whose picks changed since the last save are written.
+
+    :param: survey
+    :type: `~asp3d.core.activeSeismoPick.Survey`
+
+    :param: filename, survey file
+    :type: string
+
+    Returns the number of written pick files.
+    '''
+    filename = os.path.abspath(filename)
+    pickdir = getPickDirectory(filename)
+    state = getattr(survey, '_storeState', None)
+    if state is None or state['filename'] != filename or not os.path.isdir(pickdir):
+        state = {'filename': filename, 'survey': None, 'shots': {}}
+
+    content = pickle.dumps(_copySurvey(survey), -1)
+    digest = hashlib.md5(content).hexdigest()
+    if digest != state['survey'] or not os.path.isfile(filename):
+        _writeFile(filename, content)
+        state['survey'] = digest
+
+    if not os.path.isdir(pickdir):
+        os.makedirs(pickdir)
+    table = survey.getPickTable()
+    shotrows = _getShotRows(table)
+    written = 0
+    for shotnumber in survey.data.keys():
+        rows = shotrows.get(shotnumber, np.zeros(0, dtype=int))
+        digest = _shotDigest(table, rows)
+        if state['shots'].get(shotnumber) == digest:
+            continue
+        columns = table.getValues(rows)
+        columns['traceIDs'] = table.getTraceIDs()[rows]
+        picksfile = os.path.join(pickdir, '%s.npz' % shotnumber)
+        np.savez(picksfile + '.tmp', **columns)
+        if os.path.isfile(picksfile):
+            os.remove(picksfile)
+        os.rename(picksfile + '.tmp.npz', picksfile)
+        state['shots'][shotnumber] = digest
+        written += 1
+
+    # remove picks of shots that are not part of the survey anymore
+    for shotnumber in list(state['shots'].keys()):
+        if shotnumber not in survey.data:
+            picksfile = os.path.join(pickdir, '%s.npz' % shotnumber)
+            if os.path.isfile(picksfile):
+                os.remove(picksfile)
+            del state['shots'][shotnumber]
+
+    survey._storeState = state
+    return written
+
+
+def loadSurveyStore(survey, filename, maxMemory=None):
+    '''
+    Reads the picks of a survey loaded from the survey file filename. The shots of the survey
+    are lazy (see SeismicShot(lazy=True)), their waveform data is read on first access.
+
+    :param: survey, Survey unpickled from filename
+    :type: `~asp3d.core.activeSeismoPick.Survey`
+
+    :param: filename, survey file
+    :type: string
+
+    :param: maxMemory, memory budget for the waveform data [MB], None for no limit
+    :type: float
+    '''
+    filename = os.path.abspath(filename)
+    pickdir = getPickDirectory(filename)
+    del survey._storeVersion
+
+    if survey.getWaveformCache() is None:
+        survey._waveformCache = WaveformCache(maxMemory)
+    elif maxMemory is not None:
+        survey.getWaveformCache().setMaxMemory(maxMemory)
+
+    state = {'filename': filename, 'survey': None, 'shots': {}}
+    with open(filename, 'rb') as infile:
+        state['survey'] = hashlib.md5(infile.read()).hexdigest()
+
+    survey.picktable = table = PickTable()
+    for shotnumber, shot in survey.data.items():
+        shot._waveformCache = survey.getWaveformCache()
+        picksfile = os.path.join(pickdir, '%s.npz' % shotnumber)
+        if os.path.isfile(picksfile):
+            with np.load(picksfile) as columns:
+                rows = table.addRows(shotnumber, columns['traceIDs'])
+                table.setValues(rows, dict((name, columns[name]) for name in
+                                           PickTable.floatColumns + PickTable.boolColumns))
+            state['shots'][shotnumber] = _shotDigest(table, rows)
+        else:
+            print('Could not find picks of shot %s in %s' % (shotnumber, pickdir))
+        table.addRows(shotnumber, shot.getTraceIDlist())
+        shot._picktable = table
+
+    survey._storeState = state
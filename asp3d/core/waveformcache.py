@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+#   Copyright 2017 Marcel Paffrath (Ruhr-Universitaet Bochum, Germany)
+#
+#   This file is part of ActiveSeismoPick3D
+#----------------------------------------------------------------------------
+
+from collections import OrderedDict
+
+
+class WaveformCache(object):
+    '''
+    Keeps track of the waveform data of lazy shots (SeismicShot(lazy=True)) that is
+    loaded into memory. If the loaded data exceeds maxMemory, the data of the least
+    recently used shots is released. It is read again from file on the next access.
+    '''
+
+    def __init__(self, maxMemory=None):
+        '''
+        :param: maxMemory, memory budget for the waveform data [MB], None for no limit
+        :type: float
+        '''
+        self.setMaxMemory(maxMemory)
+        self._shots = OrderedDict()
+
+    def __getstate__(self):
+        # waveform data of lazy shots is not saved, so nothing is loaded after unpickling
+        state = self.__dict__.copy()
+        state['_shots'] = OrderedDict()
+        return state
+
+    def setMaxMemory(self, maxMemory):
+        self.maxMemory = maxMemory
+
+    def getMaxMemory(self):
+        return self.maxMemory
+
+    def getMemory(self):
+        '''
+        Returns the memory currently used by the loaded waveform data [MB].
+        '''
+        return sum(self._shots.values()) / 1024. ** 2
+
+    def getLoadedShots(self):
+        return list(self._shots.keys())
+
+    def add(self, shot, nbytes):
+        '''
+        Registers the loaded data (nbytes) of a shot and releases the data of the least
+        recently used shots if the memory budget is exceeded.
+        '''
+        self._shots.pop(shot, None)
+        self._shots[shot] = nbytes
+        self._evict()
+
+    def touch(self, shot):
+        '''
+        Marks a shot as most recently used.
+        '''
+        if shot in self._shots:
+            self._shots[shot] = self._shots.pop(shot)
+
+    def remove(self, shot):
+        self._shots.pop(shot, None)
+
+    def _evict(self):
+        if self.maxMemory is None:
+            return
+        while len(self._shots) > 1 and self.getMemory() > self.maxMemory:
+            shot = next(iter(self._shots))
+            shot.releaseData()
@@ -12,7 +12,7 @@ from PySide import QtCore, QtGui
 class Ui_generate_survey_minimal(object):
     def setupUi(self, generate_survey_minimal):
         generate_survey_minimal.setObjectName("generate_survey_minimal")
-        generate_survey_minimal.resize(382, 139)
+        generate_survey_minimal.resize(382, 199)
         icon = QtGui.QIcon()
         icon.addPixmap(QtGui.QPixmap("../asp3d_icon.png"), QtGui.QIcon.Normal, QtGui.QIcon.Off)
         generate_survey_minimal.setWindowIcon(icon)
@@ -48,6 +48,39 @@ class Ui_generate_survey_minimal(object):
         self.horizontalLayout.addWidget(self.fend)
         self.verticalLayout.addLayout(self.horizontalLayout)
         self.verticalLayout_2.addLayout(self.verticalLayout)
+        self.horizontalLayout_lazy = QtGui.QHBoxLayout()
+        self.horizontalLayout_lazy.setObjectName("horizontalLayout_lazy")
+        self.checkBox_lazy = QtGui.QCheckBox(generate_survey_minimal)
+        self.checkBox_lazy.setChecked(True)
+        self.checkBox_lazy.setObjectName("checkBox_lazy")
+        self.horizontalLayout_lazy.addWidget(self.checkBox_lazy)
+        spacerItem = QtGui.QSpacerItem(40, 20, QtGui.QSizePolicy.Expanding, QtGui.QSizePolicy.Minimum)
+        self.horizontalLayout_lazy.addItem(spacerItem)
+        self.label_maxMemory = QtGui.QLabel(generate_survey_minimal)
+        self.label_maxMemory.setObjectName("label_maxMemory")
+        self.horizontalLayout_lazy.addWidget(self.label_maxMemory)
+        self.spinBox_maxMemory = QtGui.QSpinBox(generate_survey_minimal)
+        self.spinBox_maxMemory.setAlignment(QtCore.Qt.AlignRight|QtCore.Qt.AlignTrailing|QtCore.Qt.AlignVCenter)
+        self.spinBox_maxMemory.setMaximum(1000000)
+        self.spinBox_maxMemory.setSingleStep(100)
+        self.spinBox_maxMemory.setProperty("value", 2000)
+        self.spinBox_maxMemory.setObjectName("spinBox_maxMemory")
+        self.horizontalLayout_lazy.addWidget(self.spinBox_maxMemory)
+        self.verticalLayout_2.addLayout(self.horizontalLayout_lazy)
+        self.horizontalLayout_cores = QtGui.QHBoxLayout()
+        self.horizontalLayout_cores.setObjectName("horizontalLayout_cores")
+        self.label_ncores = QtGui.QLabel(generate_survey_minimal)
+        self.label_ncores.setObjectName("label_ncores")
+        self.horizontalLayout_cores.addWidget(self.label_ncores)
+        spacerItem1 = QtGui.QSpacerItem(40, 20, QtGui.QSizePolicy.Expanding, QtGui.QSizePolicy.Minimum)
+        self.horizontalLayout_cores.addItem(spacerItem1)
+        self.ncores = QtGui.QSpinBox(generate_survey_minimal)
+        self.ncores.setAlignment(QtCore.Qt.AlignRight|QtCore.Qt.AlignTrailing|QtCore.Qt.AlignVCenter)
+        self.ncores.setMinimum(1)
+        self.ncores.setMaximum(10000)
+        self.ncores.setObjectName("ncores")
+        self.horizontalLayout_cores.addWidget(self.ncores)
+        self.verticalLayout_2.addLayout(self.horizontalLayout_cores)
         self.buttonBox = QtGui.QDialogButtonBox(generate_survey_minimal)
         self.buttonBox.setOrientation(QtCore.Qt.Horizontal)
         self.buttonBox.setStandardButtons(QtGui.QDialogButtonBox.Cancel|QtGui.QDialogButtonBox.Ok)
@@ -91,4 +124,11 @@ class Ui_generate_survey_minimal(object):
 "<p style=\" margin-top:0px; margin-bottom:0px; margin-left:0px; margin-right:0px; -qt-block-indent:0; text-indent:0px;\">100_pickle.dat</p></body></html>", None, QtGui.QApplication.UnicodeUTF8))
         self.label_obs_2.setText(QtGui.QApplication.translate("generate_survey_minimal", "*Shotnumber*", None, QtGui.QApplication.UnicodeUTF8))
         self.fend.setText(QtGui.QApplication.translate("generate_survey_minimal", ".dat", None, QtGui.QApplication.UnicodeUTF8))
+        self.checkBox_lazy.setToolTip(QtGui.QApplication.translate("generate_survey_minimal", "Only read the trace headers when generating the survey. Waveforms are read when they are needed and the least recently used ones are released again once the memory budget is exceeded.", None, QtGui.QApplication.UnicodeUTF8))
+        self.checkBox_lazy.setText(QtGui.QApplication.translate("generate_survey_minimal", "Lazy loading", None, QtGui.QApplication.UnicodeUTF8))
+        self.label_maxMemory.setText(QtGui.QApplication.translate("generate_survey_minimal", "Memory budget [MB]", None, QtGui.QApplication.UnicodeUTF8))
+        self.spinBox_maxMemory.setToolTip(QtGui.QApplication.translate("generate_survey_minimal", "Upper limit for the waveforms kept in memory (0: unlimited)", None, QtGui.QApplication.UnicodeUTF8))
+        self.spinBox_maxMemory.setSpecialValueText(QtGui.QApplication.translate("generate_survey_minimal", "unlimited", None, QtGui.QApplication.UnicodeUTF8))
+        self.label_ncores.setText(QtGui.QApplication.translate("generate_survey_minimal", "Number of processes", None, QtGui.QApplication.UnicodeUTF8))
+        self.ncores.setToolTip(QtGui.QApplication.translate("generate_survey_minimal", "Number of processes used to read the shots", None, QtGui.QApplication.UnicodeUTF8))
 
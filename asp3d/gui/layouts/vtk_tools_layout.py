@@ -156,6 +156,20 @@ class Ui_vtk_tools(object):
         self.verticalLayout_2.addLayout(self.verticalLayout_5)
         self.verticalLayout.addLayout(self.verticalLayout_2)
         self.verticalLayout_9.addLayout(self.verticalLayout)
+        self.horizontalLayout_7 = QtGui.QHBoxLayout()
+        self.horizontalLayout_7.setObjectName("horizontalLayout_7")
+        self.label_vtkformat = QtGui.QLabel(vtk_tools)
+        self.label_vtkformat.setObjectName("label_vtkformat")
+        self.horizontalLayout_7.addWidget(self.label_vtkformat)
+        spacerItem1 = QtGui.QSpacerItem(40, 20, QtGui.QSizePolicy.Expanding, QtGui.QSizePolicy.Minimum)
+        self.horizontalLayout_7.addItem(spacerItem1)
+        self.comboBox_vtkformat = QtGui.QComboBox(vtk_tools)
+        self.comboBox_vtkformat.setObjectName("comboBox_vtkformat")
+        self.comboBox_vtkformat.addItem("")
+        self.comboBox_vtkformat.addItem("")
+        self.comboBox_vtkformat.addItem("")
+        self.horizontalLayout_7.addWidget(self.comboBox_vtkformat)
+        self.verticalLayout_9.addLayout(self.horizontalLayout_7)
         self.buttonBox = QtGui.QDialogButtonBox(vtk_tools)
         self.buttonBox.setOrientation(QtCore.Qt.Horizontal)
         self.buttonBox.setStandardButtons(QtGui.QDialogButtonBox.Ok)
@@ -212,4 +226,9 @@ class Ui_vtk_tools(object):
         self.label_2.setText(QtGui.QApplication.translate("vtk_tools", "Specify output directory:", None, QtGui.QApplication.UnicodeUTF8))
         self.pushButton_raysout.setText(QtGui.QApplication.translate("vtk_tools", "Browse", None, QtGui.QApplication.UnicodeUTF8))
         self.start_rays.setText(QtGui.QApplication.translate("vtk_tools", "Start", None, QtGui.QApplication.UnicodeUTF8))
+        self.label_vtkformat.setToolTip(QtGui.QApplication.translate("vtk_tools", "Legacy ASCII files can be read by every VTK reader. Binary and XML files are much smaller and faster to write and to load in Paraview. XML files get the extension .vti (velocity grid) or .vtp (rays).", None, QtGui.QApplication.UnicodeUTF8))
+        self.label_vtkformat.setText(QtGui.QApplication.translate("vtk_tools", "VTK file format [?]", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboBox_vtkformat.setItemText(0, QtGui.QApplication.translate("vtk_tools", "Legacy ASCII", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboBox_vtkformat.setItemText(1, QtGui.QApplication.translate("vtk_tools", "Legacy binary", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboBox_vtkformat.setItemText(2, QtGui.QApplication.translate("vtk_tools", "XML (binary)", None, QtGui.QApplication.UnicodeUTF8))
 
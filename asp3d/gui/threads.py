@@ -17,6 +17,13 @@ def setProgressBarBusy(progressBar=None):
         progressBar.setRange(0, 0)
 
 
+def setProgressBarValue(progressBar, value, maximum):
+    if progressBar:
+        progressBar.setVisible(True)
+        progressBar.setRange(0, maximum)
+        progressBar.setValue(value)
+
+
 def hideProgressBar(progressBar=None):
     if progressBar:
         progressBar.setVisible(False)
@@ -48,24 +55,39 @@ class Gen_SeisArray_Thread(QtCore.QThread):
 
 
 class Gen_Survey_from_SA_Thread(QtCore.QThread):
-    def __init__(self, parent, Survey, obsdir, seisArray, fstart, fend, progressBar):
+    progress = QtCore.Signal(int, int)
+
+    def __init__(self, parent, Survey, obsdir, seisArray, fstart, fend, progressBar, lazy=False, maxMemory=None,
+                 cachedir=None, cores=1):
         QtCore.QThread.__init__(self, parent)
         self.Survey = Survey
         self.obsdir = obsdir
         self.seisArray = seisArray
         self.fstart = fstart
         self.fend = fend
+        self.lazy = lazy
+        self.maxMemory = maxMemory
+        self.cachedir = cachedir
+        self.cores = cores
         self.success = None
+        self.progressBar = progressBar
+        # emitted by the Survey for every loaded shot
+        self.progress.connect(self.updateProgress)
         setProgressBarBusy(progressBar)
 
     def __del__(self):
         self.wait()
 
+    def updateProgress(self, processed, total):
+        setProgressBarValue(self.progressBar, processed, total)
+
     def run(self):
         try:
             self.survey = self.Survey(self.obsdir, seisArray=self.seisArray,
                                       useDefaultParas=False, fstart=self.fstart,
-                                      fend=self.fend)
+                                      fend=self.fend, lazy=self.lazy, maxMemory=self.maxMemory,
+                                      cachedir=self.cachedir, cores=self.cores,
+                                      progressCallback=self.progress.emit)
             self.success = True
         except Exception as e:
             self.success = False
@@ -76,7 +98,10 @@ class Gen_Survey_from_SA_Thread(QtCore.QThread):
 
 
 class Gen_Survey_from_SR_Thread(QtCore.QThread):
-    def __init__(self, parent, Survey, recfile, srcfile, obsdir, fstart, fend, progressBar):
+    progress = QtCore.Signal(int, int)
+
+    def __init__(self, parent, Survey, recfile, srcfile, obsdir, fstart, fend, progressBar, lazy=False,
+                 maxMemory=None, cachedir=None, cores=1):
         QtCore.QThread.__init__(self, parent)
         self.Survey = Survey
         self.recfile = recfile
@@ -84,17 +109,30 @@ class Gen_Survey_from_SR_Thread(QtCore.QThread):
         self.obsdir = obsdir
         self.fstart = fstart
         self.fend = fend
+        self.lazy = lazy
+        self.maxMemory = maxMemory
+        self.cachedir = cachedir
+        self.cores = cores
         self.success = None
+        self.progressBar = progressBar
+        # emitted by the Survey for every loaded shot
+        self.progress.connect(self.updateProgress)
         setProgressBarBusy(progressBar)
 
     def __del__(self):
         self.wait()
 
+    def updateProgress(self, processed, total):
+        setProgressBarValue(self.progressBar, processed, total)
+
     def run(self):
         try:
             self.survey = self.Survey(self.obsdir, self.srcfile, self.recfile,
                                       useDefaultParas=False,
-                                      fstart=self.fstart, fend=self.fend)
+                                      fstart=self.fstart, fend=self.fend,
+                                      lazy=self.lazy, maxMemory=self.maxMemory,
+                                      cachedir=self.cachedir, cores=self.cores,
+                                      progressCallback=self.progress.emit)
             self.success = True
         except Exception as e:
             self.success = False
@@ -122,7 +160,7 @@ class Multipicker_Thread(QtCore.QThread):
     def run(self):
         try:
             pool = multiprocessing.Pool(self.ncores)
-            result = pool.map_async(self.func, self.shotlist, callback=self.emitDone)
+            result = pool.map_async(self.func, self.shotlist, chunksize=1, callback=self.emitDone)
             pool.close()
             self.success = True
             return result        
@@ -28,7 +28,7 @@ from asp3d.gui.layouts.postprocessing_layout import Ui_postprocessing
 from asp3d.gui.layouts.repicking_layout import Ui_repicking
 from asp3d.gui.layouts.vtk_tools_layout import Ui_vtk_tools
 from asp3d.gui.utils import *
-from asp3d.util import fmtomoUtils, surveyUtils
+from asp3d.util import fmtomoUtils, surveyUtils, vtkIO
 from asp3d.gui.threads import Gen_SeisArray_Thread, Gen_Survey_from_SA_Thread, Gen_Survey_from_SR_Thread, FMTOMO_Thread, hideProgressBar
 
 matplotlib.use('Qt4Agg')
@@ -132,6 +132,9 @@ class Gen_Survey_from_SA_window(object):
         self.obsdir = None
         self.fstart = 'shot'
         self.fend = '.dat'
+        self.lazy = True
+        self.maxMemory = None
+        self.ncores = 1
         self.init_dialog()
         self.start_dialog()
 
@@ -139,6 +142,8 @@ class Gen_Survey_from_SA_window(object):
         qdialog = QtGui.QDialog(self.mainwindow)
         ui = Ui_generate_survey_minimal()
         ui.setupUi(qdialog)
+        ui.ncores.setMaximum(getMaxCPU())
+        ui.ncores.setValue(getMaxCPU())
         self.ui = ui
         self.qdialog = qdialog
         self.connectButtons()
@@ -147,7 +152,8 @@ class Gen_Survey_from_SA_window(object):
         if self.qdialog.exec_():
             self.refresh_selection()
             self.gsa_thread = Gen_Survey_from_SA_Thread(self.mainwindow, Survey, self.obsdir, self.seisarray,
-                                                        self.fstart, self.fend, self.mainUI.progressBar)
+                                                        self.fstart, self.fend, self.mainUI.progressBar,
+                                                        lazy=self.lazy, maxMemory=self.maxMemory, cores=self.ncores)
             self.gsa_thread.start()
             self.executed = True
             self.gsa_thread.connect(self.gsa_thread, QtCore.SIGNAL("finished()"), self._finalizeSurvey)
@@ -162,12 +168,16 @@ class Gen_Survey_from_SA_window(object):
         self.obsdir = self.ui.lineEdit_obs.text()
         self.fstart = self.ui.fstart.text()
         self.fend = self.ui.fend.text()
+        self.lazy = self.ui.checkBox_lazy.isChecked()
+        self.maxMemory = self.ui.spinBox_maxMemory.value() or None
+        self.ncores = self.ui.ncores.value()
 
     def get_survey(self):
         return self.survey
 
     def connectButtons(self):
         QtCore.QObject.connect(self.ui.pushButton_obs, QtCore.SIGNAL("clicked()"), self.chooseObsdir)
+        QtCore.QObject.connect(self.ui.checkBox_lazy, QtCore.SIGNAL("toggled(bool)"), self.ui.spinBox_maxMemory.setEnabled)
 
     def chooseObsdir(self):
         text=browseDir(self.mainwindow, 'Choose directory containing waveform data.')
@@ -196,6 +206,9 @@ class Gen_Survey_from_SR_window(object):
         self.recfile = None
         self.fstart = 'shot'
         self.fend = '.dat'
+        self.lazy = True
+        self.maxMemory = None
+        self.ncores = 1
         self.init_dialog()
         self.start_dialog()
 
@@ -203,6 +216,8 @@ class Gen_Survey_from_SR_window(object):
         qdialog = QtGui.QDialog(self.mainwindow)
         ui = Ui_generate_survey()
         ui.setupUi(qdialog)
+        ui.ncores.setMaximum(getMaxCPU())
+        ui.ncores.setValue(getMaxCPU())
         self.ui = ui
         self.qdialog = qdialog
         self.connectButtons()
@@ -219,7 +234,8 @@ class Gen_Survey_from_SR_window(object):
             except:
                 self.survey = None
             self.gsr_thread = Gen_Survey_from_SR_Thread(self.mainwindow, Survey, self.recfile, self.srcfile,
-                                                        self.obsdir, self.fstart, self.fend, self.mainUI.progressBar)
+                                                        self.obsdir, self.fstart, self.fend, self.mainUI.progressBar,
+                                                        lazy=self.lazy, maxMemory=self.maxMemory, cores=self.ncores)
             self.gsr_thread.start()
             self.executed = True
             self.gsr_thread.connect(self.gsr_thread, QtCore.SIGNAL("finished()"), self._finalizeSurvey)
@@ -233,6 +249,9 @@ class Gen_Survey_from_SR_window(object):
         self.recfile = self.ui.lineEdit_rec.text()
         self.fstart = self.ui.fstart.text()
         self.fend = self.ui.fend.text()
+        self.lazy = self.ui.checkBox_lazy.isChecked()
+        self.maxMemory = self.ui.spinBox_maxMemory.value() or None
+        self.ncores = self.ui.ncores.value()
 
     def check_selection(self):
         if self.obsdir == '' or self.srcfile == '' or self.recfile == '':
@@ -244,6 +263,7 @@ class Gen_Survey_from_SR_window(object):
 
     def connectButtons(self):
         QtCore.QObject.connect(self.ui.pushButton_obs, QtCore.SIGNAL("clicked()"), self.chooseObsdir)
+        QtCore.QObject.connect(self.ui.checkBox_lazy, QtCore.SIGNAL("toggled(bool)"), self.ui.spinBox_maxMemory.setEnabled)
         QtCore.QObject.connect(self.ui.pushButton_src, QtCore.SIGNAL("clicked()"), self.chooseSourcefile)
         QtCore.QObject.connect(self.ui.pushButton_rec, QtCore.SIGNAL("clicked()"), self.chooseRecfile)
 
@@ -979,26 +999,34 @@ class Call_VTK_window(object):
             self.ui.lineEdit_raysout.setText(text)
         self.checkRaysStartButton()
 
+    def getVTKFormat(self):
+        return vtkIO.VTK_FORMATS[self.ui.comboBox_vtkformat.currentIndex()]
+
     def startvgvtk(self):
         ui = self.ui
         if ui.lineEdit_vgout.text() == '':
             return
         outfilename=ui.lineEdit_vgout.text()
-        if outfilename.split('.')[-1] != 'vtk':
+        if outfilename.split('.')[-1] not in ['vtk', 'vti']:
             outfilename+='.vtk'
         if ui.radioButton_abs.isChecked():
-            fmtomoUtils.vgrids2VTK(inputfile=ui.lineEdit_vg.text(),
-                                   outputfile=outfilename,
-                                   absOrRel='abs')
+            outfilename = fmtomoUtils.vgrids2VTK(inputfile=ui.lineEdit_vg.text(),
+                                                 outputfile=outfilename,
+                                                 absOrRel='abs',
+                                                 vtkformat=self.getVTKFormat())
         elif ui.radioButton_rel.isChecked():
-            fmtomoUtils.vgrids2VTK(inputfile=ui.lineEdit_vg.text(),
-                                   outputfile=outfilename,
-                                   absOrRel='rel',
-                                   inputfileref=ui.lineEdit_vgref.text())
+            outfilename = fmtomoUtils.vgrids2VTK(inputfile=ui.lineEdit_vg.text(),
+                                                 outputfile=outfilename,
+                                                 absOrRel='rel',
+                                                 inputfileref=ui.lineEdit_vgref.text(),
+                                                 vtkformat=self.getVTKFormat())
+        if outfilename:
+            ui.lineEdit_vgout.setText(outfilename)
 
     def startraysvtk(self):
         ui = self.ui
-        fmtomoUtils.rays2VTK(ui.lineEdit_rays.text(), ui.lineEdit_raysout.text())
+        fmtomoUtils.rays2VTK(ui.lineEdit_rays.text(), ui.lineEdit_raysout.text(),
+                             vtkformat=self.getVTKFormat())
 
     def newFileVTK(self):
         text=saveFile(self.mainwindow, 'Choose output vtk filename')
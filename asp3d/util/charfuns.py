@@ -231,21 +231,7 @@ class AICcf(CharacteristicFunction):
         nn = np.isnan(xnp)
         if len(nn) > 1:
             xnp[nn] = 0
-        datlen = len(xnp)
-        k = np.arange(1, datlen)
-        cf = np.zeros(datlen)
-        cumsumcf = np.cumsum(np.power(xnp, 2))
-        i = np.where(cumsumcf == 0)
-        cumsumcf[i] = np.finfo(np.float64).eps
-        cf[k] = ((k - 1) * np.log(cumsumcf[k] / k) + (datlen - k + 1) *
-                 np.log((cumsumcf[datlen - 1] - cumsumcf[k - 1]) / (datlen - k + 1)))
-        cf[0] = cf[1]
-        inf = np.isinf(cf)
-        ff = np.where(inf == True)
-        if len(ff) >= 1:
-            cf[ff] = 0
-
-        self.cf = cf - np.mean(cf)
+        self.cf = calcAIC(xnp)
         self.xcf = x
 
 
@@ -263,41 +249,131 @@ class HOScf(CharacteristicFunction):
         nn = np.isnan(xnp)
         if len(nn) > 1:
             xnp[nn] = 0
-        if self.getOrder() == 3:  # this is skewness
-            # if self._getStealthMode() is False:
-            #    print 'Calculating skewness ...'
-            y = np.power(xnp, 3)
-            y1 = np.power(xnp, 2)
-        elif self.getOrder() == 4:  # this is kurtosis
-            # if self._getStealthMode() is False:
-            #    print 'Calculating kurtosis ...'
-            y = np.power(xnp, 4)
-            y1 = np.power(xnp, 2)
-
-        # Initialisation
         # t2: long term moving window
         ilta = int(round(self.getTime2() / self.getIncrement()))
-        lta = y[0]
-        lta1 = y1[0]
-        # moving windows
-        LTA = np.zeros(len(xnp))
-        for j in range(0, len(xnp)):
-            if j < 4:
-                LTA[j] = 0
-            elif j <= ilta:
-                lta = (y[j] + lta * (j - 1)) / j
-                lta1 = (y1[j] + lta1 * (j - 1)) / j
-            else:
-                lta = (y[j] - y[j - ilta]) / ilta + lta
-                lta1 = (y1[j] - y1[j - ilta]) / ilta + lta1
-            # define LTA
-            if self.getOrder() == 3:
-                LTA[j] = lta / np.power(lta1, 1.5)
-            elif self.getOrder() == 4:
-                LTA[j] = lta / np.power(lta1, 2)
-
-        nn = np.isnan(LTA)
-        if len(nn) > 1:
-            LTA[nn] = 0
-        self.cf = LTA
+        self.cf = calcHOS(xnp, ilta, self.getOrder())
         self.xcf = x
+
+
+def _recursiveLTA(y, ilta):
+    '''
+    Evaluates the recursive long term average used by HOScf along the last
+    axis of y without looping over the samples. The first four samples keep
+    the initial value y[0], the window grows until ilta samples are reached
+    and is moved with constant length afterwards.
+
+    :param: y, time series (or 2-D array of time series, one per row)
+    :type: `~numpy.ndarray`
+
+    :param: ilta, length of the moving window [samples]
+    :type: int
+    '''
+    nsamples = y.shape[-1]
+    lta = np.empty(y.shape)
+    lta[..., :4] = y[..., :1]
+    if nsamples <= 4:
+        return lta
+
+    csum = np.cumsum(y, axis=-1)
+    # growing window, 4 <= j <= ilta: j * lta[j] = 3 * y[0] + sum(y[4:j + 1])
+    jend = min(ilta, nsamples - 1)
+    if jend >= 4:
+        j = np.arange(4, jend + 1)
+        lta[..., 4:jend + 1] = (3 * y[..., :1] + csum[..., 4:jend + 1] - csum[..., 3:4]) / j
+
+    # moving window, j > ilta: lta[j] = lta[j0] + (window sum at j - window sum at j0) / ilta
+    j0 = max(ilta, 3)
+    if j0 + 1 < nsamples:
+        j = np.arange(j0, nsamples)
+        wsum = csum[..., j] - csum[..., j - ilta]
+        lta[..., j0 + 1:] = lta[..., j0:j0 + 1] + (wsum[..., 1:] - wsum[..., :1]) / ilta
+    return lta
+
+
+def calcHOS(data, ilta, order):
+    '''
+    Calculates the skewness (order 3) or kurtosis (order 4) characteristic function
+    as defined in HOScf for a single trace or for a 2-D array (ntraces x nsamples)
+    at once. Returns an array of the same shape as data.
+
+    :param: data, time series (or 2-D array of time series, one per row)
+    :type: `~numpy.ndarray`
+
+    :param: ilta, length of the moving window [samples]
+    :type: int
+
+    :param: order, 3 (skewness) or 4 (kurtosis)
+    :type: int
+    '''
+    xnp = np.array(data, dtype=np.float64)
+    xnp[np.isnan(xnp)] = 0
+    if order == 3:
+        exponent = 1.5
+    elif order == 4:
+        exponent = 2
+    else:
+        raise ValueError('order must be 3 (skewness) or 4 (kurtosis), got %s' % order)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        lta = _recursiveLTA(np.power(xnp, order), ilta)
+        lta1 = _recursiveLTA(np.power(xnp, 2), ilta)
+        LTA = lta / np.power(lta1, exponent)
+
+    LTA[np.isnan(LTA)] = 0
+    return LTA
+
+
+def calcAIC(data):
+    '''
+    Calculates the Akaike Information Criterion as defined in AICcf for a single
+    time series or for a 2-D array (ntraces x nsamples) at once.
+    Returns an array of the same shape as data.
+
+    :param: data, time series (or 2-D array of time series, one per row)
+    :type: `~numpy.ndarray`
+    '''
+    xnp = np.array(data, dtype=np.float64)
+    xnp[np.isnan(xnp)] = 0
+    datlen = xnp.shape[-1]
+    k = np.arange(1, datlen)
+    cf = np.zeros(xnp.shape)
+    cumsumcf = np.cumsum(np.power(xnp, 2), axis=-1)
+    cumsumcf[cumsumcf == 0] = np.finfo(np.float64).eps
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cf[..., 1:] = ((k - 1) * np.log(cumsumcf[..., 1:] / k) + (datlen - k + 1) *
+                       np.log((cumsumcf[..., -1:] - cumsumcf[..., :-1]) / (datlen - k + 1)))
+    cf[..., 0] = cf[..., 1]
+    cf[np.isinf(cf)] = 0
+
+    return cf - np.mean(cf, axis=-1, keepdims=True)
+
+
+def calcHOScfArray(data, dt, cut, t2, order):
+    '''
+    Batched version of HOScf for a whole shot. Cuts all traces of the 2-D array
+    data (ntraces x nsamples) to the window cut and returns the characteristic
+    functions of all traces as 2-D array.
+
+    :param: data, all traces of a shot with equal number of samples
+    :type: `~numpy.ndarray`
+
+    :param: dt, sampling interval [s]
+    :type: float
+
+    :param: cut, cut out a part of the traces (t_start, t_end) [s]
+    :type: tuple
+
+    :param: t2, size of the moving window [s]
+    :type: float
+
+    :param: order, order of the characteristic function
+    :type: int
+    '''
+    data = np.atleast_2d(data)
+    if cut[0] == 0 and cut[1] == 0:
+        start, stop = 0, data.shape[-1]
+    else:
+        start = int(cut[0] / dt)
+        stop = int(cut[1] / dt)
+    ilta = int(round(t2 / dt))
+    return calcHOS(data[:, start:stop], ilta, order)
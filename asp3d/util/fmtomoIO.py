@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+#   Copyright 2017 Marcel Paffrath (Ruhr-Universitaet Bochum, Germany)
+#
+#   This file is part of ActiveSeismoPick3D
+#----------------------------------------------------------------------------
+'''
+Writers for the FMTOMO input files vgrids.in, interfaces.in, propgrid.in, receivers.in and
+sources.in, readers for vgrids.in, receivers.in and sources.in and a reader for the FMTOMO
+output file rays.dat.
+
+The writers take NumPy arrays and format all values of a file in one operation, the readers
+parse the header line by line and all values following the header in one call.
+Angles are written and returned as found in the files (vgrids.in, interfaces.in: radians,
+propgrid.in, receivers.in, sources.in: degree).
+'''
+
+import numpy as np
+
+# format of all floating point values in the FMTOMO files
+FLOAT_FORMAT = '%18.12g'
+INT_FORMAT = '%10d'
+
+
+def _writeArray(outfile, fmt, array):
+    '''
+    Writes all rows of a 2D array to outfile. fmt is the format of one row (including the newline).
+    '''
+    array = np.asarray(array, dtype=float)
+    if array.ndim == 1:
+        array = array[:, np.newaxis]
+    outfile.write((fmt * len(array)) % tuple(array.ravel().tolist()))
+
+
+def _writeHeaderLine(outfile, fmt, values):
+    outfile.write(' '.join([fmt] * len(values)) % tuple(values) + '\n')
+
+
+def _readHeaderLine(infile, dtype=float):
+    return tuple(dtype(value) for value in infile.readline().split())
+
+
+def _readValues(infile, filename, nvalues=None):
+    '''
+    Reads all remaining values of infile into a 1D array.
+    '''
+    values = np.fromstring(infile.read(), sep=' ')
+    if nvalues is not None and len(values) != nvalues:
+        err_msg = 'Expected %d values in file %s, found %d' % (nvalues, filename, len(values))
+        raise ValueError(err_msg)
+    return values
+
+
+def writeVgrid(filename, number, delta, start, velocity, decm=0.3):
+    '''
+    Writes a velocity grid file (vgrids.in).
+
+    :param: number, number of grid points (nR, nTheta, nPhi)
+    :type: tuple
+
+    :param: delta, grid spacing (dR [km], dTheta [rad], dPhi [rad])
+    :type: tuple
+
+    :param: start, origin of the grid (R [km], Theta [rad], Phi [rad])
+    :type: tuple
+
+    :param: velocity, velocities ordered R (outer loop), Theta, Phi (inner loop)
+    :type: `~numpy.ndarray`
+
+    :param: decm, diagonal elements of the covariance matrix (grid3dg's default value is 0.3)
+    :type: float or `~numpy.ndarray`
+    '''
+    velocity = np.asarray(velocity, dtype=float).ravel()
+    if not len(velocity) == np.prod(number):
+        err_msg = 'Number of velocities (%d) does not match the grid dimensions %s' % (len(velocity), number)
+        raise ValueError(err_msg)
+    decm = np.broadcast_to(np.asarray(decm, dtype=float).ravel(), velocity.shape)
+    with open(filename, 'w') as outfile:
+        _writeHeaderLine(outfile, INT_FORMAT, (1, 1))
+        _writeHeaderLine(outfile, INT_FORMAT, number)
+        _writeHeaderLine(outfile, FLOAT_FORMAT, delta)
+        _writeHeaderLine(outfile, FLOAT_FORMAT, start)
+        _writeArray(outfile, '%s %s\n' % (FLOAT_FORMAT, FLOAT_FORMAT), np.column_stack((velocity, decm)))
+
+
+class VelocityGrid(object):
+    '''
+    Velocity grid of a vgrids.in file. Velocities (and covariances) are stored as arrays
+    of the shape (nR, nTheta, nPhi).
+    '''
+
+    def __init__(self, shape, spacing, origin, velocity, covariance=None):
+        '''
+        :param: shape, number of grid points (nR, nTheta, nPhi)
+        :type: tuple
+
+        :param: spacing, grid spacing (dR [km], dTheta [rad], dPhi [rad])
+        :type: tuple
+
+        :param: origin, origin of the grid (R [km], Theta [rad], Phi [rad])
+        :type: tuple
+
+        :param: velocity, velocities ordered R (outer loop), Theta, Phi (inner loop)
+        :type: `~numpy.ndarray`
+
+        :param: covariance, diagonal elements of the covariance matrix (same order as velocity)
+        :type: `~numpy.ndarray`
+        '''
+        self.shape = tuple(shape)
+        self.spacing = tuple(spacing)
+        self.origin = tuple(origin)
+        self.velocity = np.asarray(velocity).reshape(self.shape)
+        self.covariance = None if covariance is None else np.asarray(covariance).reshape(self.shape)
+
+    def getNumberOfPoints(self):
+        return int(np.prod(self.shape))
+
+    def getAxes(self):
+        '''
+        Returns the coordinates of the grid points along the axes R [km], Theta [rad] and Phi [rad].
+        '''
+        return tuple(start + delta * np.arange(number)
+                     for number, delta, start in zip(self.shape, self.spacing, self.origin))
+
+    def write(self, filename, decm=None):
+        '''
+        Writes the grid to a vgrids.in file. If decm is None the covariances of the grid
+        (or grid3dg's default value of 0.3) are written.
+        '''
+        if decm is None:
+            decm = 0.3 if self.covariance is None else self.covariance
+        writeVgrid(filename, self.shape, self.spacing, self.origin, self.velocity, decm)
+
+
+def readVgrid(filename):
+    '''
+    Reads a velocity grid file (vgrids.in) containing one grid and returns a VelocityGrid.
+    The file is read once, the values are parsed directly from the file into one array
+    (velocity and covariance are views on this array).
+    '''
+    with open(filename, 'rb') as infile:
+        infile.readline()
+        number = _readHeaderLine(infile, int)
+        delta = _readHeaderLine(infile)
+        start = _readHeaderLine(infile)
+        values = np.fromfile(infile, sep=' ')
+
+    npoints = int(np.prod(number))
+    if len(values) == 2 * npoints:
+        values = values.reshape(npoints, 2)
+        return VelocityGrid(number, delta, start, values[:, 0], values[:, 1])
+    if len(values) == npoints:
+        return VelocityGrid(number, delta, start, values)
+    err_msg = 'Expected %d grid points in file %s, found %d values' % (npoints, filename, len(values))
+    raise ValueError(err_msg)
+
+
+def writeInterfaces(filename, number, delta, start, interfaces):
+    '''
+    Writes an interface file (interfaces.in).
+
+    :param: number, number of grid points (nTheta, nPhi)
+    :type: tuple
+
+    :param: delta, grid spacing (dTheta [rad], dPhi [rad])
+    :type: tuple
+
+    :param: start, origin of the grid (Theta [rad], Phi [rad])
+    :type: tuple
+
+    :param: interfaces, radius [km] of every interface (top to bottom), ordered Theta (outer loop), Phi (inner loop)
+    :type: list of `~numpy.ndarray`
+    '''
+    with open(filename, 'w') as outfile:
+        _writeHeaderLine(outfile, INT_FORMAT, (len(interfaces),))
+        _writeHeaderLine(outfile, INT_FORMAT, number)
+        _writeHeaderLine(outfile, FLOAT_FORMAT, delta)
+        _writeHeaderLine(outfile, FLOAT_FORMAT, start)
+        for index, interface in enumerate(interfaces):
+            if index > 0:
+                outfile.write('\n')
+            _writeArray(outfile, FLOAT_FORMAT + '\n', np.ravel(interface))
+
+
+def writePropgrid(filename, number, delta, start, refinement=(5, 5)):
+    '''
+    Writes a propagation grid file (propgrid.in).
+
+    :param: number, number of grid points (nR, nTheta, nPhi)
+    :type: tuple
+
+    :param: delta, grid spacing (dR [km], dTheta [degree], dPhi [degree])
+    :type: tuple
+
+    :param: start, origin of the grid (top R [km], Theta [degree], Phi [degree])
+    :type: tuple
+
+    :param: refinement, (refinement factor, number of local cells for refinement)
+    :type: tuple
+    '''
+    with open(filename, 'w') as outfile:
+        _writeHeaderLine(outfile, INT_FORMAT, number)
+        _writeHeaderLine(outfile, FLOAT_FORMAT, delta)
+        _writeHeaderLine(outfile, FLOAT_FORMAT, start)
+        _writeHeaderLine(outfile, INT_FORMAT, refinement)
+
+
+def writeReceivers(filename, receivers):
+    '''
+    Writes a receiver file (receivers.in) with one path per receiver.
+
+    :param: receivers, dictionary with the keys 'coords' (array (N, 3): depth [km], latitude [degree],
+    longitude [degree]), 'paths' (number of paths), 'source' (sourceID) and 'path' (path number).
+    Scalars are used for all receivers.
+    :type: dict
+    '''
+    coords = np.asarray(receivers['coords'], dtype=float).reshape(-1, 3)
+    columns = [coords] + [np.broadcast_to(receivers[key], (len(coords),))[:, np.newaxis]
+                          for key in ('paths', 'source', 'path')]
+    with open(filename, 'w') as outfile:
+        outfile.write('%s\n' % len(coords))
+        _writeArray(outfile, '%s %s %s\n%s\n%s\n%s\n' % ((FLOAT_FORMAT,) * 3 + (INT_FORMAT,) * 3),
+                    np.hstack(columns))
+
+
+def readReceivers(filename):
+    '''
+    Reads a receiver file (receivers.in) with one path per receiver.
+
+    Returns a dictionary containing arrays for the keys 'coords', 'paths', 'source' and 'path' (see writeReceivers).
+    '''
+    with open(filename, 'r') as infile:
+        nrec = int(infile.readline())
+        values = _readValues(infile, filename, nrec * 6).reshape(nrec, 6)
+    receivers = {'coords': values[:, :3],
+                 'paths': values[:, 3].astype(int),
+                 'source': values[:, 4].astype(int),
+                 'path': values[:, 5].astype(int)}
+    if not (receivers['paths'] == 1).all():
+        raise ValueError('Reading of more than one path per receiver is not supported (%s).' % filename)
+    return receivers
+
+
+def writeSources(filename, sources):
+    '''
+    Writes a (local) source file (sources.in) with one path per source.
+
+    :param: sources, dictionary with the keys 'coords' (array (N, 3): depth [km], latitude [degree],
+    longitude [degree]), 'teleflag', 'numpaths', 'steps', 'interactions' (array (N, 2)) and 'veltype'. Scalars
+    (or a single pair of interactions) are used for all sources.
+    :type: dict
+    '''
+    coords = np.asarray(sources['coords'], dtype=float).reshape(-1, 3)
+    nsrc = len(coords)
+
+    def column(key):
+        return np.broadcast_to(sources[key], (nsrc,))[:, np.newaxis]
+
+    values = np.hstack((column('teleflag'), coords, column('numpaths'), column('steps'),
+                        np.broadcast_to(sources['interactions'], (nsrc, 2)), column('veltype')))
+    with open(filename, 'w') as outfile:
+        outfile.write('%s\n' % nsrc)
+        _writeArray(outfile, '%s\n%s %s %s\n%s\n%s\n%s %s\n%s\n' % ((INT_FORMAT,) + (FLOAT_FORMAT,) * 3
+                                                                   + (INT_FORMAT,) * 5), values)
+
+
+def readSources(filename):
+    '''
+    Reads a (local) source file (sources.in) with one path per source.
+
+    Returns a dictionary containing arrays for the keys 'coords', 'teleflag', 'numpaths', 'steps',
+    'interactions' and 'veltype' (see writeSources).
+    '''
+    with open(filename, 'r') as infile:
+        nsrc = int(infile.readline())
+        values = _readValues(infile, filename, nsrc * 9).reshape(nsrc, 9)
+    sources = {'teleflag': values[:, 0].astype(int),
+               'coords': values[:, 1:4],
+               'numpaths': values[:, 4].astype(int),
+               'steps': values[:, 5].astype(int),
+               'interactions': values[:, 6:8].astype(int),
+               'veltype': values[:, 8].astype(int)}
+    if (sources['teleflag'] != 0).any():
+        raise ValueError('Reading of teleseismic sources is not supported (%s).' % filename)
+    if (sources['numpaths'] != 1).any():
+        raise ValueError('Reading of more than one path per source is not supported (%s).' % filename)
+    return sources
+
+
+def iterRays(filename):
+    '''
+    Reads the rays of an FMTOMO output file (rays.dat) one ray at a time.
+
+    Yields (raynumber, shotnumber, points) for every ray. points is an array (N, 3) of radius [km],
+    latitude [rad] and longitude [rad] or None if the ray is invalid.
+    '''
+    with open(filename, 'r') as infile:
+        while True:
+            firstline = infile.readline()
+            if firstline == '':
+                break  # break at EOF
+            fl_list = firstline.split()
+            if not fl_list:
+                continue
+            raynumber = int(fl_list[0])
+            shotnumber = int(fl_list[1])
+            if int(fl_list[4]) == 0:  # is zero if the ray is invalid
+                yield raynumber, shotnumber, None
+                continue
+            nRayPoints = int(infile.readline().split()[0])
+            points = np.fromstring(''.join([infile.readline() for _ in range(nRayPoints)]), sep=' ')
+            if not len(points) == 3 * nRayPoints:
+                err_msg = 'Expected %d points for ray number %d in file %s, found %d' % (nRayPoints, raynumber,
+                                                                                       filename, len(points) // 3)
+                raise ValueError(err_msg)
+            yield raynumber, shotnumber, points.reshape(nRayPoints, 3)
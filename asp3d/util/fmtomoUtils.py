@@ -6,21 +6,36 @@
 #   This file is part of ActiveSeismoPick3D
 #----------------------------------------------------------------------------
 
+import abc
 import datetime
+import errno
+import heapq
+import io
 import numpy as np
 import os
+import shutil
 import subprocess
 import sys
+import time
+from itertools import islice
+
+from asp3d.util import fmtomoIO, vtkIO
 
 
 class Tomo3d(object):
-    def __init__(self, fmtomodir, simuldir='fmtomo_simulation', citer=0, overwrite=False, buildObs=True):
+    def __init__(self, fmtomodir, simuldir='fmtomo_simulation', citer=0, overwrite=False, buildObs=True,
+                 balance='traces'):
         '''
         Class build from FMTOMO script tomo3d. Can be used to run several instances of FMM code in parallel.
 
         :param: citer, current iteration (default = 0: start new model)
         :type: integer
 
+        :param: balance, distribution of the sources on the processes:
+        'equal' (same number of sources per process), 'traces' (weighted by the number of traces per source)
+        or 'runtime' (weighted by the runtimes of the previous forward calculation, first run: 'traces')
+        :type: string
+
         :param: fmtomodir, directory containing a clean FMTOMO installation (v. 1.0)
         :type: string (path)
 
@@ -35,10 +50,14 @@ class Tomo3d(object):
         self.defParas()
         self.copyRef()
         self.citer = citer  # current iteration
-        self.sources = self.readSrcFile()
-        self.traces = self.readTraces()
+        self.sources = fmtomoIO.readSources(self.getPath(self.csl))
+        self.traces = fmtomoIO.readReceivers(self.getPath(self.rec))
+        self.buildTraceIndex()
         self.directories = []
         self.overwrite = overwrite
+        self.balance = balance
+        self.srcRuntimes = None
+        self.srcIDsPerChunk = {}
 
     def defParas(self):
         self.defFMMParas()
@@ -59,14 +78,14 @@ class Tomo3d(object):
                       'tomo3d.in']
 
         for name in tomo_files:
-            filename = os.path.join(directory, name)
-            linkname = os.path.join(self.cwd, name)
-            os.system('ln -s %s %s' % (filename, linkname))
+            filename = os.path.join(os.path.abspath(directory), name)
+            linkname = self.getPath(name)
+            if not os.path.lexists(linkname):
+                os.symlink(filename, linkname)
 
     def buildObsdata(self):
-        p = subprocess.Popen(os.path.join(self.cwd, 'obsdata'), shell=True)
-        p.wait()
-        os.system('mv sources.in sourcesref.in')
+        subprocess.call([self.getPath('obsdata')], cwd=self.cwd)
+        os.rename(self.getPath('sources.in'), self.getPath('sourcesref.in'))
 
     def defFMMParas(self):
         '''
@@ -94,7 +113,7 @@ class Tomo3d(object):
         # Name of file containing output velocity information
         self.ttim = 'arrivals.dat'
         self.mode = 'mode_set.in'
-        # Name of temporary folders created for each process
+        # Name of temporary folders created for each chunk of sources
         self.folder = '.proc_'
 
     def defInvParas(self):
@@ -122,27 +141,33 @@ class Tomo3d(object):
         '''
         Copies reference grids to used grids (e.g. sourcesref.in to sources.in)
         '''
-        os.system('cp %s %s' % (self.ivg, self.cvg))
-        os.system('cp %s %s' % (self.iig, self.cig))
-        os.system('cp %s %s' % (self.isl, self.csl))
+        shutil.copyfile(self.getPath(self.ivg), self.getPath(self.cvg))
+        shutil.copyfile(self.getPath(self.iig), self.getPath(self.cig))
+        shutil.copyfile(self.getPath(self.isl), self.getPath(self.csl))
 
     def setCWD(self, directory=None):
         '''
-        Set working directory containing all necessary files.
+        Set working directory containing all necessary files. All files are accessed and all FMTOMO
+        programs are called in this directory, the working directory of the python process is not changed.
 
-        Default: pwd
+        Default: self.simuldir
         '''
         if directory == None:
             directory = self.simuldir
 
-        os.chdir(directory)
-        self.cwd = directory
+        self.cwd = os.path.abspath(directory)
         print('Working directory is: %s' % self.cwd)
 
+    def getPath(self, filename):
+        '''
+        Returns the path of a file in the working directory.
+        '''
+        return os.path.join(self.cwd, filename)
+
     def runFrech(self):
-        os.system(self.frechgen)
+        subprocess.call([self.frechgen], cwd=self.cwd)
 
-    def runTOMO3D(self, nproc, iterations):
+    def runTOMO3D(self, nproc, iterations, nchunks=None):
         '''
         Starts up the FMTOMO code for the set number of iterations on nproc parallel processes.
         
@@ -151,13 +176,25 @@ class Tomo3d(object):
 
         :param: iterations, number of iterations
         :type: integer
+
+        :param: nchunks, number of chunks the sources are split into (default: 4 * nproc, at most one
+        chunk per source). The chunks are calculated by nproc processes, starting the next chunk as
+        soon as one is finished.
+        :type: integer
         '''
         self.nproc = nproc
         self.iter = iterations  # number of iterations
+        nsrc = self.getNsrc()
+        if nchunks is None:
+            nchunks = 4 * nproc
+        if nchunks > nsrc:
+            print('Number of chunks reduced to the number of sources (%d).' % nsrc)
+            nchunks = nsrc
+        self.nchunks = nchunks
 
         starttime = datetime.datetime.now()
-        print('Starting TOMO3D on %s parallel processes for %s iteration(s).'
-              % (self.nproc, self.iter))
+        print('Starting TOMO3D on %s parallel processes (%s chunks) for %s iteration(s).'
+              % (self.nproc, self.nchunks, self.iter))
         if self.citer == 0:
             self.makeInvIterDir()
             self.startForward(self.cInvIterDir)
@@ -179,17 +216,53 @@ class Tomo3d(object):
         print('runTOMO3D: Finished %s iterations after %s.' % (self.iter, tdelta))
         print('runTOMO3D: See %s for output' % (self.cwd))
 
-    def runFmm(self, directory, logfile, processes):
+    def runFmm(self, directory, logfile):
+        '''
+        Calls an instance of the FMM code in the process directory and returns the process.
+        '''
+        with open(logfile, 'w') as fout:
+            return subprocess.Popen([self.fmm], stdout=fout, cwd=directory)
+
+    def getFmmLogfile(self, logdir, chunkID):
         '''
-        Calls an instance of the FMM code in the process directory.
-        Requires a list of all active processes and returns an updated list.
+        Returns the path of the log file of the FMM code for a certain chunk.
         '''
-        os.chdir(directory)
-        fout = open(logfile, 'w')
-        processes.append(subprocess.Popen(self.fmm, stdout=fout))
-        fout.close()
-        os.chdir(self.cwd)
-        return processes
+        return os.path.join(logdir, 'fm3dlog_' + str(chunkID) + '.out')
+
+    def runQueue(self, logdir):
+        '''
+        Calculates all chunks on self.nproc parallel processes. The chunks are started in order of
+        decreasing weight, the next chunk as soon as a process finished.
+        Returns the runtimes of all chunks in seconds (dictionary, key: chunkID).
+        Raises a RuntimeError (after stopping all other processes) if the FMM code fails for a chunk.
+        '''
+        weights = self.getSrcWeights()
+        loads = dict((chunkID, weights[np.array(self.srcIDs4Kernel(chunkID)) - 1].sum())
+                     for chunkID in self.getChunkIDs())
+        queue = sorted(self.getChunkIDs(), key=lambda chunkID: -loads[chunkID])
+        running = {}
+        runtimes = {}
+
+        while queue or running:
+            while queue and len(running) < self.nproc:
+                chunkID = queue.pop(0)
+                process = self.runFmm(self.getProcDir(chunkID), self.getFmmLogfile(logdir, chunkID))
+                running[chunkID] = (process, time.time())
+
+            finished = [chunkID for chunkID, (process, _) in running.items() if process.poll() is not None]
+            for chunkID in finished:
+                process, launchtime = running.pop(chunkID)
+                runtimes[chunkID] = time.time() - launchtime
+                if process.returncode != 0:
+                    for other, _ in running.values():
+                        other.kill()
+                        other.wait()
+                    raise RuntimeError('FMM code returned %s for chunk %s, see %s.'
+                                       % (process.returncode, chunkID, self.getFmmLogfile(logdir, chunkID)))
+            if not finished:
+                time.sleep(0.1)
+
+        return runtimes
 
     def startForward(self, logdir):
         '''
@@ -204,22 +277,18 @@ class Tomo3d(object):
             self.makeDirectories()
 
         starttime = datetime.datetime.now()
-        processes = []
-
-        for procID in range(1, self.nproc + 1):
-            directory = self.getProcDir(procID)
-            logfn = 'fm3dlog_' + str(procID) + '.out'
-            log_out = os.path.join(logdir, logfn)
+        if self.balance == 'runtime' or len(self.srcIDsPerChunk) != self.nchunks:
+            self.partitionSources()
 
-            self.writeSrcFile(procID)
-            self.writeTracesFile(procID)
-            os.system('cp {cvg} {cig} {mode} {pg} {frechin} {dest}'
-                      .format(cvg=self.cvg, cig=self.cig, frechin=self.frech,
-                              mode=self.mode, pg=self.pg, dest=directory))
-            processes = self.runFmm(directory, log_out, processes)
+        for chunkID in self.getChunkIDs():
+            directory = self.getProcDir(chunkID)
+            self.writeSrcFile(chunkID)
+            self.writeTracesFile(chunkID)
+            # the input files are not changed during the forward calculation
+            for filename in [self.cvg, self.cig, self.mode, self.pg, self.frech]:
+                self.linkFile(self.getPath(filename), os.path.join(directory, filename))
 
-        for p in processes:
-            p.wait()
+        self.updateSrcRuntimes(self.runQueue(logdir))
 
         self.mergeOutput(self.cInvIterDir)
         self.clearDirectories()
@@ -236,17 +305,15 @@ class Tomo3d(object):
         Simply calls the inversion program.
         '''
         print('Calling %s...' % self.inv)
-        os.system(self.inv)
+        subprocess.call([self.inv], cwd=self.cwd)
 
     def calcRes(self):
         '''
         Calls residual calculation program.
         '''
         resout = os.path.join(self.cwd, self.resout)
-        if self.citer == 0:
-            os.system('%s > %s' % (self.resid, resout))
-        else:
-            os.system('%s >> %s' % (self.resid, resout))
+        with open(resout, 'w' if self.citer == 0 else 'a') as fout:
+            subprocess.call([self.resid], stdout=fout, cwd=self.cwd)
 
         with open(resout, 'r') as infile:
             residuals = infile.readlines()
@@ -261,12 +328,12 @@ class Tomo3d(object):
         invfile.close()
 
     def makeDir(self, directory):
-        err = os.system('mkdir %s' % directory)
-        if err is 0:
+        try:
+            os.mkdir(directory)
             self.directories.append(directory)
             return
-        if err is 256:
-            if self.overwrite == True:
+        except OSError as e:
+            if e.errno == errno.EEXIST and self.overwrite == True:
                 print('Overwriting existing files.')
                 self.clearDir(directory)
                 self.directories.append(directory)
@@ -275,10 +342,10 @@ class Tomo3d(object):
 
     def makeDirectories(self):
         '''
-        Makes temporary directories for all processes.
+        Makes temporary directories for all chunks.
         '''
-        for procID in range(1, self.nproc + 1):
-            directory = self.getProcDir(procID)
+        for chunkID in self.getChunkIDs():
+            directory = self.getProcDir(chunkID)
             self.makeDir(directory)
 
     def makeInvIterDir(self):
@@ -286,12 +353,13 @@ class Tomo3d(object):
         Makes directories for each iteration step for the output.
         '''
         invIterDir = self.cwd + '/it_%s' % (self.citer)
-        err = os.system('mkdir %s' % invIterDir)
-        if err is 256:
+        try:
+            os.mkdir(invIterDir)
+        except OSError as e:
+            if not e.errno == errno.EEXIST:
+                raise RuntimeError('Could not create directory: %s' % invIterDir)
             if self.overwrite:
                 self.clearDir(invIterDir)
-        elif err is not 0:
-            raise RuntimeError('Could not create directory: %s' % invIterDir)
         self.cInvIterDir = invIterDir
 
     def clearDir(self, directory):
@@ -322,32 +390,37 @@ class Tomo3d(object):
             self.rmDir(directory)
         self.directories = []
 
-    def getProcDir(self, procID):
+    def getProcDir(self, chunkID):
+        '''
+        Returns the temporary directory for a certain chunk
+        with chunkID = chunk number.
+        '''
+        return os.path.join(self.cwd, self.folder) + str(chunkID)
+
+    def buildTraceIndex(self):
         '''
-        Returns the temporary directory for a certain process
-        with procID = process number.
+        Builds the index self.traceIDs4Src (key: sourceID, value: list of the trace IDs of the source
+        in ascending order) from self.sources and self.traces.
         '''
-        return os.path.join(self.cwd, self.folder) + str(procID)
+        traceIDs4Src = dict((sourceID, []) for sourceID in range(1, self.getNsrc() + 1))
+        for index, sourceID in enumerate(self.traces['source'].tolist()):
+            traceIDs4Src.setdefault(sourceID, []).append(index + 1)
+        self.traceIDs4Src = traceIDs4Src
 
     def getTraceIDs4Sources(self, sourceIDs):
         '''
-        Returns corresponding trace IDs for a set of given source IDs.
+        Returns corresponding trace IDs for a set of given source IDs in ascending order.
         '''
         traceIDs = []
-        for traceID in self.traces.keys():
-            if self.traces[traceID]['source'] in sourceIDs:
-                traceIDs.append(traceID)
-        return traceIDs
+        for sourceID in sourceIDs:
+            traceIDs.extend(self.getTraceIDs4Source(sourceID))
+        return sorted(traceIDs)
 
     def getTraceIDs4Source(self, sourceID):
         '''
         Returns corresponding trace IDs for a source ID.
         '''
-        traceIDs = []
-        for traceID in self.traces.keys():
-            if self.traces[traceID]['source'] == sourceID:
-                traceIDs.append(traceID)
-        return traceIDs
+        return self.traceIDs4Src.get(sourceID, [])
 
     def copyArrivals(self, target=None):
         '''
@@ -355,278 +428,212 @@ class Tomo3d(object):
         Default target is self.mtrav (model travel times).
         '''
         if target == None:
-            target = os.path.join(self.cwd, self.mtrav)
-        os.system('cp %s %s' % (os.path.join(
-            self.cInvIterDir, self.ttim), target))
+            target = self.mtrav
+        shutil.copyfile(os.path.join(self.cInvIterDir, self.ttim), self.getPath(target))
 
     def saveVgrid(self):
         '''
         Saves the current velocity grid for the current iteration step.
         '''
+        # copied (not linked) as the inversion rewrites the current velocity grid
         vgpath = os.path.join(self.cwd, self.cvg)
-        os.system('cp %s %s' % (vgpath, self.cInvIterDir))
-
-    def calcSrcPerKernel(self):
-        '''
-        (Equally) distributes all sources depending on the number of processes (kernels).
-        Returns two integer values.
-        First: minimum number of sources for each process
-        Second: remaining sources (always less than number of processes)
-        '''
-        nsrc = self.readNsrc()
-        if self.nproc > nsrc:
-            print('Warning: Number of spawned processes higher than number of sources')
-        return nsrc / self.nproc, nsrc % self.nproc
-
-    def srcIDs4Kernel(self, procID):
-        '''
-        Calculates and returns all source IDs for a given process ID.
-        '''
-        proc = procID - 1
-        nsrc = self.readNsrc()
-        srcPK, remain = self.calcSrcPerKernel()
-        if procID > self.nproc:
-            sys.exit('STOP: Kernel ID exceeds available number.')
-        if proc < remain:
-            start = (srcPK + 1) * (proc) + 1
-            return range(start, start + srcPK + 1)
-        elif proc == remain:
-            start = (srcPK + 1) * (proc) + 1
-            return range(start, start + srcPK)
-        elif proc > remain:
-            start = (srcPK + 1) * remain + srcPK * (proc - remain) + 1
-            return range(start, start + srcPK)
-
-    def readNsrc(self):
-        srcfile = open(self.csl, 'r')
-        nsrc = int(srcfile.readline())
-        srcfile.close()
-        return nsrc
-
-    def readNtraces(self):
-        '''
-        Reads the total number of traces from self.rec header.
-        '''
-        recfile = open(self.rec, 'r')
-        nrec = int(recfile.readline())
-        recfile.close()
-        return nrec
-
-    def readSrcFile(self):
-        '''
-        Reads the whole sourcefile and returns structured information in a dictionary.
-        '''
-        nsrc = self.readNsrc()
-        srcfile = open(self.csl, 'r')
-
-        sources = {}
-
-        temp = srcfile.readline()
-        for index in range(nsrc):
-            teleflag = int(srcfile.readline())
-            coords = srcfile.readline().split()
-            numpaths = int(srcfile.readline())
-            steps = int(srcfile.readline())
-            interactions = srcfile.readline().split()
-            veltype = int(srcfile.readline())
-            if teleflag is not 0:
-                sys.exit('Script not yet usable for teleseismic.')
-            if numpaths is not 1:
-                sys.exit('Script not yet usable for more than one path per source.')
-
-            sources[index + 1] = {'teleflag': teleflag,
-                                  'coords': coords,
-                                  'numpaths': numpaths,
-                                  'steps': steps,
-                                  'interactions': interactions,
-                                  'veltype': veltype
-                                  }
-
-        return sources
-
-    def readTraces(self):
-        '''
-        Reads the receiver input file and returns the information
-        in a structured dictionary.
-        '''
-        recfile = open(self.rec, 'r')
-        ntraces = self.readNtraces()
-
-        traces = {}
-
-        temp = recfile.readline()
-        for index in range(ntraces):
-            coords = recfile.readline().split()
-            paths = int(recfile.readline())
-            source = int(recfile.readline())
-            path = int(recfile.readline())
-
-            traces[index + 1] = {'coords': coords,
-                                 'paths': paths,
-                                 'source': source,
-                                 'path': path
-                                 }
-
-        return traces
-
-    def readArrivals(self, procID):
-        '''
-        Reads the arrival times from a temporary process directory,
-        changes local to global sourceIDs and traceIDs and returns
-        a list of arrival times.
-        '''
-        directory = self.getProcDir(procID)
-        arrfile = open(os.path.join(directory, self.ttim), 'r')
-        sourceIDs = self.srcIDs4Kernel(procID)
-
-        arrivals = []
-        for sourceID in sourceIDs:
-            traceIDs = self.getTraceIDs4Source(sourceID)
-            for traceID in traceIDs:
-                line = arrfile.readline().split()
-                if line != []:
-                    # recID and srcID for the individual processor will not be needed
-                    recID_proc, srcID_proc, ray, normal, arrtime, diff, head = line
-                    arrivals.append([traceID, sourceID, ray, normal, arrtime, diff, head])
+        shutil.copy(vgpath, self.cInvIterDir)
 
-        return arrivals
+    def linkFile(self, filename, linkname):
+        '''
+        Creates a hard link linkname to filename (a copy if linking is not possible, e.g. on different
+        file systems). An existing file linkname is replaced.
+        '''
+        if os.path.lexists(linkname):
+            os.remove(linkname)
+        try:
+            os.link(filename, linkname)
+        except OSError:
+            shutil.copyfile(filename, linkname)
 
-    def readRays(self, procID):
+    def symlinkFile(self, filename, linkname):
         '''
-        Reads rays output from a temporary process directory and returns
-        the information in a structured dictionary.
+        Creates a symbolic link linkname to filename. An existing file linkname is replaced.
         '''
-        directory = self.getProcDir(procID)
-        raysfile = open(directory + '/rays.dat', 'r')
-        sourceIDs = self.srcIDs4Kernel(procID)
+        if os.path.lexists(linkname):
+            os.remove(linkname)
+        os.symlink(filename, linkname)
 
-        rays = {}
-        for sourceID in sourceIDs:
-            traceIDs = self.getTraceIDs4Source(sourceID)
-            for traceID in traceIDs:
-                line1 = raysfile.readline().split()
-                if line1 != []:
-                    # recID and srcID for the individual processor will not be needed
-                    recID_proc, srcID_proc, ray, normal, nsec = line1
-                    raysecs = {}
-
-                    for sec in range(int(nsec)):
-                        line2 = raysfile.readline().split()
-                        npoints, region, diff, head = line2
-                        raypoints = []
-
-                        for j in range(int(npoints)):
-                            raypoints.append(raysfile.readline())
-
-                        raysecs[sec] = {'npoints': npoints,
-                                        'region': region,
-                                        'diff': diff,
-                                        'head': head,
-                                        'raypoints': raypoints
-                                        }
-
-                    rays[traceID] = {'sourceID': sourceID,
-                                     'raypath': ray,
-                                     'normal': normal,
-                                     'nsec': nsec,
-                                     'raysections': raysecs
-                                     }
-        return rays
-
-    def writeSrcFile(self, procID):
-        '''
-        Writes a source input file for a process with ID = procID.
-        '''
-        directory = self.getProcDir(procID)
-        srcfile = open(os.path.join(directory, self.csl), 'w')
-        sourceIDs = self.srcIDs4Kernel(procID)
-
-        srcfile.write('%s\n' % len(sourceIDs))
-        for sourceID in sourceIDs:
-            source = self.sources[sourceID]
-            coords = source['coords']
-            interactions = source['interactions']
-            srcfile.write('%s\n' % source['teleflag'])
-            srcfile.write('%s %s %s\n' % (float(coords[0]), float(coords[1]), float(coords[2])))
-            srcfile.write('%s\n' % source['numpaths'])
-            srcfile.write('%s\n' % source['steps'])
-            srcfile.write('%s %s\n' % (int(interactions[0]), int(interactions[1])))
-            srcfile.write('%s\n' % source['veltype'])
-
-    def writeTracesFile(self, procID):
-        '''
-        Writes a receiver input file for a process with ID = procID.
-        '''
-        directory = self.getProcDir(procID)
-        recfile = open('%s/receivers.in' % directory, 'w')
-        sourceIDs = self.srcIDs4Kernel(procID)
-        traceIDs = self.getTraceIDs4Sources(sourceIDs)
-
-        recfile.write('%s\n' % len(traceIDs))
-        for traceID in traceIDs:
-            trace = self.traces[traceID]
-            coords = trace['coords']
-            source = int(trace['source']) - sourceIDs[0] + 1
-            recfile.write('%s %s %s\n' % (float(coords[0]), float(coords[1]), float(coords[2])))
-            recfile.write('%s\n' % trace['paths'])
-            recfile.write('%s\n' % source)
-            recfile.write('%s\n' % trace['path'])
+    def getChunkIDs(self):
+        return range(1, self.nchunks + 1)
+
+    def getSrcWeights(self, balance=None):
+        '''
+        Returns the estimated computational cost of every source (array ordered by source ID) used to
+        distribute the sources on the processes.
+
+        :param: balance, see Tomo3d (default: self.balance)
+        :type: string
+        '''
+        if balance is None:
+            balance = self.balance
+        nsrc = self.getNsrc()
+        if balance == 'runtime' and self.srcRuntimes is not None:
+            return self.srcRuntimes
+        if balance in ['traces', 'runtime']:
+            # the fast marching of each source is weighted as much as one trace
+            return np.array([len(self.getTraceIDs4Source(sourceID)) for sourceID in range(1, nsrc + 1)]) + 1.
+        if balance == 'equal':
+            return np.ones(nsrc)
+        raise ValueError('Unknown balance option %s' % balance)
+
+    def partitionSources(self):
+        '''
+        Distributes all sources on the chunks calculated by the FMM code (see self.runQueue).
+
+        Sources are assigned in order of decreasing weight (self.getSrcWeights) to the chunk with the
+        lowest total weight so far (longest processing time first). For balance = 'equal' the sources are
+        split into contiguous blocks.
+        '''
+        nsrc = self.getNsrc()
+        weights = self.getSrcWeights()
+
+        srcIDsPerChunk = dict((chunkID, []) for chunkID in self.getChunkIDs())
+        if self.balance == 'equal':
+            for index, sourceIDs in enumerate(np.array_split(np.arange(1, nsrc + 1), self.nchunks)):
+                srcIDsPerChunk[index + 1] = sourceIDs.tolist()
+        else:
+            loads = [(0., chunkID) for chunkID in self.getChunkIDs()]
+            for index in np.argsort(-weights, kind='mergesort'):
+                load, chunkID = heapq.heappop(loads)
+                srcIDsPerChunk[chunkID].append(int(index) + 1)
+                heapq.heappush(loads, (load + weights[index], chunkID))
+
+        # the sources of each chunk are kept in ascending order
+        self.srcIDsPerChunk = dict((chunkID, sorted(sourceIDs)) for chunkID, sourceIDs in srcIDsPerChunk.items())
+        loads = [weights[np.array(sourceIDs, dtype=int) - 1].sum() for sourceIDs in self.srcIDsPerChunk.values()]
+        print('Distributed %d sources on %d chunks (balance: %s, max./mean weight: %.2f).'
+              % (nsrc, self.nchunks, self.balance, max(loads) / np.mean(loads)))
+
+    def updateSrcRuntimes(self, runtimes):
+        '''
+        Estimates the runtime of every source from the runtimes of the chunks by splitting the runtime
+        of each chunk on its sources proportional to their number of traces.
+
+        :param: runtimes, runtime of each chunk in seconds (key: chunkID)
+        :type: dict
+        '''
+        weights = self.getSrcWeights('traces')
+        srcRuntimes = np.zeros(self.getNsrc())
+        for chunkID, runtime in runtimes.items():
+            indices = np.array(self.srcIDs4Kernel(chunkID), dtype=int) - 1
+            if len(indices) > 0:
+                srcRuntimes[indices] = runtime * weights[indices] / weights[indices].sum()
+        self.srcRuntimes = srcRuntimes
+
+    def srcIDs4Kernel(self, chunkID):
+        '''
+        Returns all source IDs for a given chunk ID (see self.partitionSources).
+        '''
+        if chunkID > self.nchunks:
+            sys.exit('STOP: Chunk ID exceeds available number.')
+        if len(self.srcIDsPerChunk) != self.nchunks:
+            self.partitionSources()
+        return self.srcIDsPerChunk[chunkID]
+
+    def getNsrc(self):
+        return len(self.sources['coords'])
+
+    def writeSrcFile(self, chunkID):
+        '''
+        Writes a source input file for a chunk with ID = chunkID.
+        '''
+        indices = np.array(self.srcIDs4Kernel(chunkID), dtype=int) - 1
+        sources = dict((key, values[indices]) for key, values in self.sources.items())
+        fmtomoIO.writeSources(os.path.join(self.getProcDir(chunkID), self.csl), sources)
+
+    def writeTracesFile(self, chunkID):
+        '''
+        Writes a receiver input file for a chunk with ID = chunkID. The traces refer to the local
+        source IDs of the chunk (position in its source input file, see self.writeSrcFile).
+        '''
+        sourceIDs = self.srcIDs4Kernel(chunkID)
+        indices = np.array(self.getTraceIDs4Sources(sourceIDs), dtype=int) - 1
+        localSrcIDs = np.zeros(self.getNsrc() + 1, dtype=int)
+        localSrcIDs[sourceIDs] = np.arange(1, len(sourceIDs) + 1)
+        traces = dict((key, values[indices]) for key, values in self.traces.items())
+        traces['source'] = localSrcIDs[traces['source']]
+        fmtomoIO.writeReceivers(os.path.join(self.getProcDir(chunkID), self.rec), traces)
+
+    def iterRecords(self, chunkID, filename, readBody):
+        '''
+        Reads an FMM output file of a chunk record by record (in the order of the chunk's receivers.in,
+        see self.writeTracesFile). The local receiver and source IDs at the beginning of each record
+        header are replaced by the global trace and source IDs, all other data are copied unchanged.
+        Yields (traceID, record) with record being the bytes of the record.
+        Raises a ValueError if the file ends before the records of all traces of the chunk are read.
+
+        :param: readBody, function returning the bytes of the body of a record, called with the file
+        and the remaining fields of the record header
+        :type: function
+        '''
+        traceIDs = self.getTraceIDs4Sources(self.srcIDs4Kernel(chunkID))
+        filepath = os.path.join(self.getProcDir(chunkID), filename)
+        with io.open(filepath, 'rb') as infile:
+            for index, traceID in enumerate(traceIDs):
+                fields = infile.readline().split(None, 2)
+                if len(fields) < 3:
+                    raise ValueError('%s ends after %d of %d records of chunk %s.'
+                                     % (filepath, index, len(traceIDs), chunkID))
+                header = ('%6s %6s ' % (traceID, self.traces['source'][traceID - 1])).encode('ascii') + fields[2]
+                yield traceID, header + readBody(infile, fields[2].split())
+
+    def mergeRecords(self, filename, outfilename, readBody=None):
+        '''
+        Merges an FMM output file of all chunks (ordered by traceID) to outfilename (see self.iterRecords).
+        As the records of every chunk are ordered by traceID, only one record per chunk is kept in memory.
+        '''
+        if readBody is None:
+            readBody = lambda infile, fields: b''
+        records = [self.iterRecords(chunkID, filename, readBody) for chunkID in self.getChunkIDs()]
+        with io.open(outfilename, 'wb') as outfile:
+            for traceID, record in heapq.merge(*records):
+                outfile.write(record)
 
     def mergeArrivals(self, directory):
         '''
-        Merges the arrival times for all processes to self.cInvIterDir.
+        Merges the arrival times for all chunks (ordered by traceID) to self.cInvIterDir.
         '''
         arrfn = os.path.join(directory, self.ttim)
-        arrivalsOut = open(arrfn, 'w')
         print('Merging %s...' % self.ttim)
-        for procID in range(1, self.nproc + 1):
-            arrivals = self.readArrivals(procID)
-            for line in arrivals:
-                arrivalsOut.write('%6s %6s %6s %6s %15s %5s %5s\n' % tuple(line))
+        self.mergeRecords(self.ttim, arrfn)
 
-        os.system('ln -fs %s %s' % (arrfn, os.path.join(self.cwd, self.ttim)))
+        self.symlinkFile(arrfn, self.getPath(self.ttim))
 
     def mergeRays(self, directory):
         '''
-        Merges the ray paths for all processes to self.cInvIterDir.
+        Merges the ray paths for all chunks (ordered by traceID) to self.cInvIterDir.
         '''
+        def readRaySections(infile, fields):
+            # fields: ray, normal, number of ray sections
+            sections = []
+            for sec in range(int(fields[2])):
+                line = infile.readline()
+                sections.append(line)
+                sections.extend(islice(infile, int(line.split()[0])))
+            return b''.join(sections)
+
         print('Merging rays.dat...')
-        with open(directory + '/rays.dat', 'w') as outfile:
-            for procID in range(1, self.nproc + 1):
-                rays = self.readRays(procID)
-                for traceID in rays:
-                    ray = rays[traceID]
-                    outfile.write('%6s %6s %6s %6s %6s\n' % (traceID,
-                                                             ray['sourceID'],
-                                                             ray['raypath'],
-                                                             ray['normal'],
-                                                             ray['nsec']))
-                    for sec in range(int(ray['nsec'])):
-                        raysec = ray['raysections'][sec]
-                        outfile.write('%6s %6s %6s %6s\n' % (raysec['npoints'],
-                                                             raysec['region'],
-                                                             raysec['diff'],
-                                                             raysec['head']))
-                        outfile.writelines(raysec['raypoints'])
+        self.mergeRecords('rays.dat', os.path.join(directory, 'rays.dat'), readRaySections)
 
     def mergeFrechet(self, directory):
         '''
-        Merges the frechet derivatives for all processes to self.cInvIterDir.
+        Merges the frechet derivatives for all chunks (ordered by traceID) to self.cInvIterDir.
         '''
+        def readDerivatives(infile, fields):
+            # fields: ray, normal, number of partial derivatives
+            return b''.join(islice(infile, int(fields[2])))
+
         frechfnout = os.path.join(directory, self.frechout)
         print('Merging %s...' % self.frechout)
-        with open(frechfnout, 'w') as outfile:
-            for procID in range(1, self.nproc + 1):
-                filename = os.path.join(self.getProcDir(procID), self.frechout)
-                with open(filename) as infile:
-                    for sourceID in self.srcIDs4Kernel(procID):
-                        for traceID in self.getTraceIDs4Source(sourceID):
-                            recID_proc, srcID_proc, ray, normal, NPDEV = infile.readline().split()
-                            outfile.write('%6s %6s %6s %6s %6s\n' % (traceID, sourceID, ray, normal, NPDEV))
-                            for index in range(int(NPDEV)):
-                                outfile.write(infile.readline())
-
-        os.system('ln -fs %s %s' % (frechfnout, os.path.join(self.cwd, self.frechout)))
+        self.mergeRecords(self.frechout, frechfnout, readDerivatives)
+
+        self.symlinkFile(frechfnout, self.getPath(self.frechout))
 
     def mergeOutput(self, directory):
         '''
@@ -637,18 +644,24 @@ class Tomo3d(object):
         self.mergeRays(directory)
 
     def unlink(self, filepath):
-        return os.system('unlink %s' % filepath)
+        if os.path.lexists(filepath):
+            os.unlink(filepath)
 
     def _printLine(self):
         print('----------------------------------------')
 
 
-def vgrids2VTK(inputfile='vgrids.in', outputfile='vgrids.vtk', absOrRel='abs', inputfileref='vgridsref.in'):
+def vgrids2VTK(inputfile='vgrids.in', outputfile='vgrids.vtk', absOrRel='abs', inputfileref='vgridsref.in',
+               vtkformat='ascii'):
     '''
     Generate a vtk-file readable by e.g. paraview from FMTOMO output vgrids.in
+
+    :param: vtkformat, 'ascii', 'binary' (legacy VTK) or 'xml' (VTK XML, written to a .vti file)
+    :type: str
+
+    Returns the name of the written file.
     '''
     R = 6371.  # earth radius
-    outfile = open(outputfile, 'w')
 
     number, delta, start, vel = _readVgrid(inputfile)
 
@@ -656,8 +669,6 @@ def vgrids2VTK(inputfile='vgrids.in', outputfile='vgrids.vtk', absOrRel='abs', i
     dR, dTheta, dPhi = delta
     sR, sTheta, sPhi = start
 
-    thetaGrid, phiGrid, rGrid = _generateGrids(number, delta, start)
-
     nPoints = nR * nTheta * nPhi
 
     nX = nPhi
@@ -672,218 +683,131 @@ def vgrids2VTK(inputfile='vgrids.in', outputfile='vgrids.vtk', absOrRel='abs', i
     dY = _getDistance(dTheta)
     dZ = dR
 
-    # write header
-    print("Writing header for VTK file...")
-    outfile.write('# vtk DataFile Version 3.1\n')
-    outfile.write('Velocity on FMTOMO vgrids.in points\n')
-    outfile.write('ASCII\n')
-    outfile.write('DATASET STRUCTURED_POINTS\n')
-
-    outfile.write('DIMENSIONS %d %d %d\n' % (nX, nY, nZ))
-    outfile.write('ORIGIN %f %f %f\n' % (sX, sY, sZ))
-    outfile.write('SPACING %f %f %f\n' % (dX, dY, dZ))
-
-    outfile.write('POINT_DATA %15d\n' % (nPoints))
-    if absOrRel == 'abs':
-        outfile.write('SCALARS velocity float %d\n' % (1))
-    if absOrRel == 'relDepth':
-        outfile.write('SCALARS velocity2depthMean float %d\n' % (1))
-    elif absOrRel == 'rel':
-        outfile.write('SCALARS velChangePercent float %d\n' % (1))
-    outfile.write('LOOKUP_TABLE default\n')
-
-    pointsPerR = nTheta * nPhi
-
-    # write velocity
     if absOrRel == 'abs':
         print("Writing velocity values to VTK file...")
-        for velocity in vel:
-            outfile.write('%10f\n' % velocity)
+        name = 'velocity'
+        values = vel
     elif absOrRel == 'relDepth':
         print("Writing velocity values to VTK file relative to mean of each depth...")
-        index = 0
-        count = 0
-        veldepth = []
-        for velocity in vel:
-            count += 1
-            veldepth.append(velocity)
-            if count % pointsPerR == 0:
-                velmean = np.mean(veldepth)
-                # print velmean, count, count/pointsPerR
-                for vel in veldepth:
-                    outfile.write('%10f\n' % float(vel - velmean))
-                veldepth = []
+        name = 'velocity2depthMean'
+        veldepth = vel.reshape(nR, -1)
+        values = veldepth - np.mean(veldepth, axis=1)[:, np.newaxis]
     elif absOrRel == 'rel':
         nref, dref, sref, velref = _readVgrid(inputfileref)
         nR_ref, nTheta_ref, nPhi_ref = nref
         if not len(velref) == len(vel):
             print('ERROR: Number of gridpoints mismatch for %s and %s' % (inputfile, inputfileref))
             return
-        # velrel = [((vel - velref) / velref * 100) for vel, velref in zip(vel, velref)]
-        velrel = []
-        for velocities in zip(vel, velref):
-            v, vref = velocities
-            if not vref == 0:
-                velrel.append((v - vref) / vref * 100)
-            else:
-                velrel.append(0)
-
         if not nR_ref == nR and nTheta_ref == nTheta and nPhi_ref == nPhi:
             print('ERROR: Dimension mismatch of grids %s and %s' % (inputfile, inputfileref))
             return
         print("Writing velocity values to VTK file...")
-        for velocity in velrel:
-            outfile.write('%10f\n' % velocity)
-        print('Pertubations: min: %s %%, max: %s %%' % (min(velrel), max(velrel)))
-
-    outfile.close()
+        name = 'velChangePercent'
+        values = np.zeros(len(vel))
+        nonzero = velref != 0
+        values[nonzero] = (vel[nonzero] - velref[nonzero]) / velref[nonzero] * 100
+        print('Pertubations: min: %s %%, max: %s %%' % (min(values), max(values)))
+    else:
+        print('ERROR: Unknown option absOrRel = %s' % absOrRel)
+        return
+
+    outputfile = vtkIO.writeStructuredPoints(outputfile, 'Velocity on FMTOMO vgrids.in points',
+                                             (nX, nY, nZ), (sX, sY, sZ), (dX, dY, dZ), values, name, vtkformat)
     print("Wrote velocity grid for %d points to file: %s" % (nPoints, outputfile))
-    return
+    return outputfile
 
 
-def rays2VTK(fnin, fdirout='./vtk_files/', nthPoint=50):
+def rays2VTK(fnin, fdirout='./vtk_files/', nthPoint=50, vtkformat='ascii', tolerance=None, singleFile=False):
     '''
     Writes VTK file(s) for FMTOMO rays from rays.dat
 
     :param: nthPoint, plot every nth point of the ray
     :type: integer
+
+    :param: vtkformat, 'ascii', 'binary' (legacy VTK) or 'xml' (VTK XML, written to .vtp files)
+    :type: str
+
+    :param: tolerance, plot one point per tolerance [km] along the ray instead of every nth point
+    :type: float
+
+    :param: singleFile, write all rays to one file (rays.vtk) with the shot and ray numbers as point data
+    instead of one file per shot
+    :type: bool
     '''
-    infile = open(fnin, 'r')
-    R = 6371
+    R = 6371.
     rays = {}
-    raynumber = 0
-    nPoints = 0
 
     ### NOTE: rays.dat seems to be in km and radians
-    while True:
-        raynumber += 1
-        firstline = infile.readline()
-        if firstline == '':
-            break  # break at EOF
-        fl_list = firstline.split()
-        raynumber = int(fl_list[0])
-        shotnumber = int(fl_list[1])
-        rayValid = int(fl_list[4])  # is zero if the ray is invalid
-        if rayValid == 0:
+    for raynumber, shotnumber, points in fmtomoIO.iterRays(fnin):
+        if points is None:
             print('Invalid ray number %d for shot number %d' % (raynumber, shotnumber))
             continue
-        nRayPoints = int(infile.readline().split()[0])
-        if not shotnumber in rays.keys():
-            rays[shotnumber] = {}
-        rays[shotnumber][raynumber] = []
-        for index in range(nRayPoints):
-            if index % nthPoint is 0 or index == (nRayPoints - 1):
-                rad, lat, lon = infile.readline().split()
-                rays[shotnumber][raynumber].append(
-                    [_getDistance(np.rad2deg(float(lon))), _getDistance(np.rad2deg(float(lat))), float(rad) - R])
-            else:
-                dummy = infile.readline()
-
-    infile.close()
+        xyz = np.column_stack((_getDistance(np.rad2deg(points[:, 2])),
+                               _getDistance(np.rad2deg(points[:, 1])),
+                               points[:, 0] - R))
+        rays.setdefault(shotnumber, []).append((raynumber, _decimateRay(xyz, nthPoint, tolerance)))
+
+    if singleFile:
+        fnameout = os.path.join(fdirout, 'rays.vtk')
+        allrays = [(shotnumber, raynumber, ray) for shotnumber in rays.keys() for raynumber, ray in rays[shotnumber]]
+        lines = [len(ray) for _, _, ray in allrays]
+        pointData = [('shotnumbers', np.repeat([shotnumber for shotnumber, _, _ in allrays], lines)),
+                     ('raynumbers', np.repeat([raynumber for _, raynumber, _ in allrays], lines))]
+        fnameout = vtkIO.writePolyData(fnameout, 'FMTOMO rays', _concatenateRays([ray for _, _, ray in allrays]),
+                                       lines=lines, pointData=pointData, vtkformat=vtkformat)
+        print("Wrote %d rays of %d shots to file %s" % (len(allrays), len(rays), fnameout))
+        return
 
     for shotnumber in rays.keys():
         fnameout = os.path.join(fdirout, 'rays%03d.vtk' % (shotnumber))
-        outfile = open(fnameout, 'w')
-
-        nPoints = 0
-        for raynumber in rays[shotnumber]:
-            for ray in rays[shotnumber][raynumber]:
-                nPoints += 1
-
-        # write header
-        # print("Writing header for VTK file...")
-        print("Writing shot %d to file %s" % (shotnumber, fnameout))
-        outfile.write('# vtk DataFile Version 3.1\n')
-        outfile.write('FMTOMO rays\n')
-        outfile.write('ASCII\n')
-        outfile.write('DATASET POLYDATA\n')
-        outfile.write('POINTS %15d float\n' % (nPoints))
-
-        # write coordinates
-        # print("Writing coordinates to VTK file...")
-        for raynumber in rays[shotnumber].keys():
-            for raypoint in rays[shotnumber][raynumber]:
-                outfile.write('%10f %10f %10f \n' % (raypoint[0], raypoint[1], raypoint[2]))
-
-        outfile.write('LINES %15d %15d\n' % (len(rays[shotnumber]), len(rays[shotnumber]) + nPoints))
-
-        # write indices
-        # print("Writing indices to VTK file...")
-        count = 0
-        for raynumber in rays[shotnumber].keys():
-            outfile.write('%d ' % (len(rays[shotnumber][raynumber])))
-            for index in range(len(rays[shotnumber][raynumber])):
-                outfile.write('%d ' % (count))
-                count += 1
-            outfile.write('\n')
-
-
-def _readVgrid(filename):
-    def readNumberOfPoints(filename):
-        fin = open(filename, 'r')
-        vglines = fin.readlines()
+        raypoints = [ray for _, ray in rays[shotnumber]]
+        fnameout = vtkIO.writePolyData(fnameout, 'FMTOMO rays', _concatenateRays(raypoints),
+                                       lines=[len(ray) for ray in raypoints], vtkformat=vtkformat)
+        print("Wrote shot %d to file %s" % (shotnumber, fnameout))
 
-        nR = int(vglines[1].split()[0])
-        nTheta = int(vglines[1].split()[1])
-        nPhi = int(vglines[1].split()[2])
 
-        print('readNumberOf Points: Awaiting %d grid points in %s'
-              % (nR * nTheta * nPhi, filename))
-        fin.close()
-        return nR, nTheta, nPhi
-
-    def readDelta(filename):
-        fin = open(filename, 'r')
-        vglines = fin.readlines()
-
-        dR = float(vglines[2].split()[0])
-        dTheta = float(vglines[2].split()[1])
-        dPhi = float(vglines[2].split()[2])
-
-        fin.close()
-        return dR, dTheta, dPhi
-
-    def readStartpoints(filename):
-        fin = open(filename, 'r')
-        vglines = fin.readlines()
+def _decimateRay(points, nthPoint=50, tolerance=None):
+    '''
+    Returns the points of a ray that are plotted. The first and the last point are always kept.
 
-        sR = float(vglines[3].split()[0])
-        sTheta = float(vglines[3].split()[1])
-        sPhi = float(vglines[3].split()[2])
+    :param: points, (x, y, z) of all points of the ray [km]
+    :type: `~numpy.ndarray` (N, 3)
 
-        fin.close()
-        return sR, sTheta, sPhi
+    :param: tolerance, keep the first point after every tolerance [km] along the ray (replaces nthPoint)
+    :type: float
+    '''
+    if len(points) == 0:
+        return points
+    if tolerance is None:
+        keep = np.arange(len(points)) % nthPoint == 0
+    else:
+        length = np.concatenate(([0.], np.cumsum(np.sqrt((np.diff(points, axis=0) ** 2).sum(axis=1)))))
+        section = np.floor(length / tolerance)
+        keep = np.concatenate(([True], section[1:] != section[:-1]))
+    keep[-1] = True
+    return points[keep]
 
-    def readVelocity(filename):
-        '''
-        Reads in velocity from vgrids file and returns a list containing all values in the same order
-        '''
-        vel = []
-        count = 0
-        fin = open(filename, 'r')
-        vglines = fin.readlines()
 
-        for line in vglines:
-            count += 1
-            if count > 4:
-                vel.append(float(line.split()[0]))
+def _concatenateRays(raypoints):
+    if not raypoints:
+        return np.zeros((0, 3))
+    return np.concatenate(raypoints)
 
-        print("Read %d points out of file: %s" % (count - 4, filename))
-        return vel
 
+def _readVgrid(filename):
     # Theta, Phi in radians, R in km
-    nR, nTheta, nPhi = readNumberOfPoints(filename)
-    dR, dThetaRad, dPhiRad = readDelta(filename)
-    sR, sThetaRad, sPhiRad = readStartpoints(filename)
-    vel = readVelocity(filename)
+    grid = fmtomoIO.readVgrid(filename)
+    print("Read %d points out of file: %s" % (grid.getNumberOfPoints(), filename))
 
+    dR, dThetaRad, dPhiRad = grid.spacing
+    sR, sThetaRad, sPhiRad = grid.origin
     dTheta, dPhi = np.rad2deg((dThetaRad, dPhiRad))
     sTheta, sPhi = np.rad2deg((sThetaRad, sPhiRad))
 
-    number = (nR, nTheta, nPhi)
+    number = grid.shape
     delta = (dR, dTheta, dPhi)
     start = (sR, sTheta, sPhi)
-    return number, delta, start, vel
+    return number, delta, start, grid.velocity.ravel()
 
 
 def _generateGrids(number, delta, start):
@@ -902,118 +826,238 @@ def _generateGrids(number, delta, start):
     return (thetaGrid, phiGrid, rGrid)
 
 
-def addCheckerboard(spacing=10., pertubation=0.1, inputfile='vgrids.in',
-                    outputfile='vgrids_cb.in', ampmethod='linear', rect=(None, None)):
+# abstract base class compatible with Python 2 and 3
+_ABC = abc.ABCMeta('_ABC', (object,), {})
+
+
+class Anomaly(_ABC):
     '''
-    Add a checkerboard to an existing vgrids.in velocity model.
+    Abstract base class for velocity anomalies that can be added to a velocity grid using addAnomalies.
+    Subclasses implement apply.
+    '''
+
+    @abc.abstractmethod
+    def apply(self, velocity, number, delta, start):
+        '''
+        Adds the anomaly to velocity (changed in place).
+
+        :param: velocity, velocities of the grid
+        :type: `~numpy.ndarray` (nR, nTheta, nPhi)
+
+        :param: number, delta, start, grid dimensions as returned by _readVgrid (angles in degree)
+        :type: tuple
+        '''
+
+    def _getGrids(self, number, delta, start):
+        '''
+        Returns the coordinates of the grid points (r, theta, phi) broadcastable to the grid shape.
+        '''
+        thetaGrid, phiGrid, rGrid = _generateGrids(number, delta, start)
+        return rGrid[:, None, None], thetaGrid[None, :, None], phiGrid[None, None, :]
+
+
+class Checkerboard(Anomaly):
+    '''
+    Checkerboard pattern with a relative pertubation of the velocity.
 
     :param: spacing, size of the tiles
     type: float
 
     :param: pertubation, pertubation (default: 0.1 = 10%)
     type: float
+
+    :param: ampmethod, 'linear' (amplitude increasing from 0 at the border to 1 in the middle of a tile)
+    or 'rect' (amplitude 1 inside the range rect of a tile, else 0)
+    type: str
     '''
 
-    def correctSpacing(spacing, delta, disttype=None):
+    def __init__(self, spacing=10., pertubation=0.1, ampmethod='linear', rect=(None, None)):
+        self.spacing = spacing
+        self.pertubation = pertubation
+        self.ampmethod = ampmethod
+        self.rect = rect
+
+    def _correctSpacing(self, spacing, delta, disttype=None):
         if spacing > delta:
             spacing_corr = round(spacing / delta) * delta
         elif spacing < delta:
             spacing_corr = delta
+        else:
+            spacing_corr = spacing
         print('The spacing of the checkerboard of %s (%s) was corrected to '
               'a value of %s to fit the grid spacing of %s.' % (spacing, disttype, spacing_corr, delta))
         return spacing_corr
 
-    def linearAmp(InCell):
+    def _ampFunc(self, InCell):
         decimal = InCell - np.floor(InCell)
-        return (-abs(decimal - 0.5) + 0.5) * 2
+        if self.ampmethod == 'linear':
+            return (-abs(decimal - 0.5) + 0.5) * 2
+        if self.ampmethod == 'rect' and self.rect is not None:
+            r1, r2 = self.rect
+            return np.where((r1 <= decimal) & (decimal <= r2), 1, 0)
+        raise ValueError('Could not amplify checkerboard pattern using method %s' % self.ampmethod)
+
+    def apply(self, velocity, number, delta, start):
+        dR, dTheta, dPhi = delta
+        sR, sTheta, sPhi = start
+        rGrid, thetaGrid, phiGrid = self._getGrids(number, delta, start)
+
+        spacR = self._correctSpacing(self.spacing, dR, '[meter], R')
+        spacTheta = self._correctSpacing(_getAngle(self.spacing), dTheta, '[degree], Theta')
+        spacPhi = self._correctSpacing(_getAngle(self.spacing), dPhi, '[degree], Phi')
+
+        # It is checked whether the positive distance from the border of the model for a point on the grid
+        # divided by the spacing is even or odd and then pertubated.
+        # The position is also shifted by half of the delta so that the position is directly on the point and
+        # not on the border between two points.
+        # "InCell" points e.g. rInCell are floats with their integer number corresponding to the cell number and
+        # their decimal place (0 - 1) corresponding to the position inside the cell.
+        rInCell = (rGrid - sR - dR / 2) / spacR
+        thetaInCell = (thetaGrid - sTheta - dTheta / 2) / spacTheta
+        phiInCell = (phiGrid - sPhi - dPhi / 2) / spacPhi
+
+        ampFactor = (self._ampFunc(rInCell) + self._ampFunc(thetaInCell) + self._ampFunc(phiInCell)) / 3
+        evenOdd = [np.where(np.floor(InCell) % 2, 1, -1) for InCell in (rInCell, thetaInCell, phiInCell)]
+        evenOdd = evenOdd[0] * evenOdd[1] * evenOdd[2] * ampFactor
+        velocity += evenOdd * self.pertubation * velocity
+
+
+class Box(Anomaly):
+    '''
+    Box with a constant velocity (or a relative pertubation of the velocity, if pertubation is set).
+    Borders set to None are not limited.
 
-    def rectAmp(InCell, rect):
-        decimal = InCell - np.floor(InCell)
-        r1, r2 = rect
-        if r1 <= decimal <= r2:
-            return 1
-        else:
-            return 0
+    :param: x, borders of the box (xleft, xright) [km]
+    type: tuple
+
+    :param: y, borders of the box (yleft, yright) [km]
+    type: tuple
+
+    :param: z, borders of the box (bot, top) [km]
+    type: tuple
+
+    :param: boxvelocity, default: 1.0 km/s
+    type: float
+
+    :param: pertubation, e.g. 0.1 = 10%
+    type: float
+    '''
+
+    def __init__(self, x=(None, None), y=(None, None), z=(None, None), boxvelocity=1.0, pertubation=None):
+        self.x = x
+        self.y = y
+        self.z = z
+        self.boxvelocity = boxvelocity
+        self.pertubation = pertubation
+
+    def apply(self, velocity, number, delta, start):
+        R = 6371.
+        rGrid, thetaGrid, phiGrid = self._getGrids(number, delta, start)
+
+        def limits(borders, transform):
+            lower, upper = borders
+            return (-np.inf if lower is None else transform(lower),
+                    np.inf if upper is None else transform(upper))
+
+        theta1, theta2 = limits(self.y, _getAngle)
+        phi1, phi2 = limits(self.x, _getAngle)
+        r1, r2 = limits(self.z, lambda z: R + z)
+
+        print('Adding box to grid with theta = (%s, %s), phi = (%s, %s), '
+              'r = (%s, %s), velocity = %s [km/s], pertubation = %s'
+              % (theta1, theta2, phi1, phi2, r1, r2, self.boxvelocity, self.pertubation))
+
+        inside = ((r1 <= rGrid) & (rGrid <= r2)) & ((theta1 <= thetaGrid) & (thetaGrid <= theta2)) & (
+            (phi1 <= phiGrid) & (phiGrid <= phi2))
+        _setAnomaly(velocity, np.broadcast_to(inside, velocity.shape), self.boxvelocity, self.pertubation)
+
+
+class Sphere(Anomaly):
+    '''
+    Sphere with a relative pertubation of the velocity (or a constant velocity, if spherevelocity is set).
+
+    :param: center, (x, y, z) [km], z relative to the surface as for Box
+    type: tuple
+
+    :param: radius, [km]
+    type: float
+
+    :param: pertubation, default: 0.1 = 10%
+    type: float
+
+    :param: spherevelocity, constant velocity inside the sphere [km/s]
+    type: float
+    '''
+
+    def __init__(self, center, radius, pertubation=0.1, spherevelocity=None):
+        self.center = center
+        self.radius = radius
+        self.pertubation = pertubation
+        self.spherevelocity = spherevelocity
+
+    def apply(self, velocity, number, delta, start):
+        R = 6371.
+        rGrid, thetaGrid, phiGrid = self._getGrids(number, delta, start)
+        x, y, z = self.center
 
-    def ampFunc(InCell, method='linear', rect=None):
-        if method == 'linear':
-            return linearAmp(InCell)
-        if method == 'rect' and rect is not None:
-            return rectAmp(InCell, rect)
+        print('Adding sphere to grid with center = (%s, %s, %s), radius = %s, velocity = %s [km/s], '
+              'pertubation = %s' % (x, y, z, self.radius, self.spherevelocity, self.pertubation))
+
+        distance2 = (_getDistance(phiGrid) - x) ** 2 + (_getDistance(thetaGrid) - y) ** 2 + (rGrid - R - z) ** 2
+        inside = distance2 <= self.radius ** 2
+        if self.spherevelocity is not None:
+            _setAnomaly(velocity, inside, self.spherevelocity, None)
         else:
-            print('ampFunc: Could not amplify cb pattern')
+            _setAnomaly(velocity, inside, None, self.pertubation)
+
 
+def _setAnomaly(velocity, inside, anomalyvelocity, pertubation):
+    if pertubation is not None:
+        velocity[inside] += pertubation * velocity[inside]
+    else:
+        velocity[inside] = anomalyvelocity
+
+
+def addAnomalies(anomalies, inputfile='vgrids.in', outputfile='vgrids_anomalies.in'):
+    '''
+    Add several anomalies (e.g. for resolution tests) to an existing vgrids.in velocity model.
+    The input file is read once, the anomalies are added one after another in the given order
+    and the result is written to outputfile.
+
+    :param: anomalies, e.g. [Checkerboard(spacing=10.), Box(x=(0, 5), y=(0, 5), z=(-10, -5), pertubation=0.2),
+    Sphere((10, 10, -5), 3.)]
+    type: list of `~Anomaly`
+    '''
     decm = 0.3  # diagonal elements of the covariance matrix (grid3dg's default value is 0.3)
-    outfile = open(outputfile, 'w')
 
     number, delta, start, vel = _readVgrid(inputfile)
+    velocity = vel.reshape(number)
+
+    for anomaly in anomalies:
+        anomaly.apply(velocity, number, delta, start)
 
-    nR, nTheta, nPhi = number
     dR, dTheta, dPhi = delta
     sR, sTheta, sPhi = start
+    # velocity grid file in RADIANS
+    fmtomoIO.writeVgrid(outputfile, number, (dR, np.deg2rad(dTheta), np.deg2rad(dPhi)),
+                        (sR, np.deg2rad(sTheta), np.deg2rad(sPhi)), velocity, decm)
+    return velocity
 
-    thetaGrid, phiGrid, rGrid = _generateGrids(number, delta, start)
 
-    nPoints = nR * nTheta * nPhi
+def addCheckerboard(spacing=10., pertubation=0.1, inputfile='vgrids.in',
+                    outputfile='vgrids_cb.in', ampmethod='linear', rect=(None, None)):
+    '''
+    Add a checkerboard to an existing vgrids.in velocity model.
 
-    # write header for velocity grid file (in RADIANS)
-    outfile.write('%10s %10s \n' % (1, 1))
-    outfile.write('%10s %10s %10s\n' % (nR, nTheta, nPhi))
-    outfile.write('%10s %10s %10s\n' % (dR, np.deg2rad(dTheta), np.deg2rad(dPhi)))
-    outfile.write('%10s %10s %10s\n' % (sR, np.deg2rad(sTheta), np.deg2rad(sPhi)))
-
-    spacR = correctSpacing(spacing, dR, '[meter], R')
-    spacTheta = correctSpacing(_getAngle(spacing), dTheta, '[degree], Theta')
-    spacPhi = correctSpacing(_getAngle(spacing), dPhi, '[degree], Phi')
-
-    count = 0
-    evenOdd = 1
-    even = 0
-    odd = 0
-
-    # In the following loop it is checked whether the positive distance from the border of the model
-    # for a point on the grid divided by the spacing is even or odd and then pertubated.
-    # The position is also shifted by half of the delta so that the position is directly on the point and
-    # not on the border between two points.
-    # "InCell" points e.g. rInCell are floats with their integer number corresponding to the cell number and
-    # their decimal place (0 - 1) corresponding to the position inside the cell.
-    # The amplification factor ampFactor comes from a linear relationship and ranges between 0 (cell border)
-    # and 1 (cell middle)
-    for radius in rGrid:
-        rInCell = (radius - sR - dR / 2) / spacR
-        ampR = ampFunc(rInCell, ampmethod, rect)
-        if np.floor(rInCell) % 2:
-            evenOddR = 1
-        else:
-            evenOddR = -1
-        for theta in thetaGrid:
-            thetaInCell = (theta - sTheta - dTheta / 2) / spacTheta
-            ampTheta = ampFunc(thetaInCell, ampmethod, rect)
-            if np.floor(thetaInCell) % 2:
-                evenOddT = 1
-            else:
-                evenOddT = -1
-            for phi in phiGrid:
-                phiInCell = (phi - sPhi - dPhi / 2) / spacPhi
-                ampPhi = ampFunc(phiInCell, ampmethod, rect)
-                if np.floor(phiInCell) % 2:
-                    evenOddP = 1
-                else:
-                    evenOddP = -1
-                velocity = vel[count]
-                ampFactor = (ampR + ampTheta + ampPhi) / 3
-                evenOdd = evenOddR * evenOddT * evenOddP * ampFactor
-                velocity += evenOdd * pertubation * velocity
-
-                outfile.write('%10s %10s\n' % (velocity, decm))
-                count += 1
-
-                progress = float(count) / float(nPoints) * 100
-                _update_progress(progress)
+    :param: spacing, size of the tiles
+    type: float
 
+    :param: pertubation, pertubation (default: 0.1 = 10%)
+    type: float
+    '''
+    addAnomalies([Checkerboard(spacing, pertubation, ampmethod, rect)], inputfile, outputfile)
     print('Added checkerboard to the grid in file %s with a spacing of %s and a pertubation of %s %%. '
           'Outputfile: %s.' % (inputfile, spacing, pertubation * 100, outputfile))
-    outfile.close()
 
 
 def addBox(x=(None, None), y=(None, None), z=(None, None),
@@ -1034,66 +1078,9 @@ def addBox(x=(None, None), y=(None, None), z=(None, None),
     :param: boxvelocity, default: 1.0 km/s
     type: float
     '''
-    R = 6371.
-    decm = 0.3  # diagonal elements of the covariance matrix (grid3dg's default value is 0.3)
-    outfile = open(outputfile, 'w')
-
-    theta1 = _getAngle(y[0])
-    theta2 = _getAngle(y[1])
-    phi1 = _getAngle(x[0])
-    phi2 = _getAngle(x[1])
-    r1 = R + z[0]
-    r2 = R + z[1]
-
-    print('Adding box to grid with theta = (%s, %s), phi = (%s, %s), '
-          'r = (%s, %s), velocity = %s [km/s]'
-          % (theta1, theta2, phi1, phi2, r1, r2, boxvelocity))
-
-    number, delta, start, vel = _readVgrid(inputfile)
-
-    nR, nTheta, nPhi = number
-    dR, dTheta, dPhi = delta
-    sR, sTheta, sPhi = start
-
-    thetaGrid, phiGrid, rGrid = _generateGrids(number, delta, start)
-
-    nPoints = nR * nTheta * nPhi
-
-    # write header for velocity grid file (in RADIANS)
-    outfile.write('%10s %10s \n' % (1, 1))
-    outfile.write('%10s %10s %10s\n' % (nR, nTheta, nPhi))
-    outfile.write('%10s %10s %10s\n' % (dR, np.deg2rad(dTheta), np.deg2rad(dPhi)))
-    outfile.write('%10s %10s %10s\n' % (sR, np.deg2rad(sTheta), np.deg2rad(sPhi)))
-
-    count = 0
-    for radius in rGrid:
-        if r1 <= radius <= r2:
-            rFlag = 1
-        else:
-            rFlag = 0
-        for theta in thetaGrid:
-            if theta1 <= theta <= theta2:
-                thetaFlag = 1
-            else:
-                thetaFlag = 0
-            for phi in phiGrid:
-                if phi1 <= phi <= phi2:
-                    phiFlag = 1
-                else:
-                    phiFlag = 0
-                velocity = vel[count]
-                if rFlag * thetaFlag * phiFlag is not 0:
-                    velocity = boxvelocity
-
-                outfile.write('%10s %10s\n' % (velocity, decm))
-                count += 1
-
-                progress = float(count) / float(nPoints) * 100
-                _update_progress(progress)
-
+    addAnomalies([Box(x, y, z, boxvelocity)], inputfile, outputfile)
     print('Added box to the grid in file %s. '
           'Outputfile: %s.' % (inputfile, outputfile))
-    outfile.close()
 
 
 def _update_progress(progress):
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+#   Copyright 2017 Marcel Paffrath (Ruhr-Universitaet Bochum, Germany)
+#
+#   This file is part of ActiveSeismoPick3D
+#----------------------------------------------------------------------------
+'''
+On-disk cache for the waveform data of the shots of a survey. For every data file
+the samples of all traces are stored in one binary .npy file (memory-mapped on
+reading, so no data is copied) and the trace headers in a small header file.
+The cache is valid as long as modification time and size of the data file do not change.
+'''
+
+import hashlib
+import os
+import numpy as np
+
+from obspy import Stream
+from obspy import Trace
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+CACHE_VERSION = 1
+
+
+def _cacheFilenames(obsfile, cachedir):
+    '''
+    Returns the filenames of header and data file in cachedir for obsfile.
+    '''
+    abspath = os.path.abspath(obsfile)
+    key = '%s_%s' % (os.path.basename(abspath), hashlib.md5(abspath.encode('utf-8')).hexdigest()[:10])
+    return os.path.join(cachedir, key + '.hdr'), os.path.join(cachedir, key + '.npy')
+
+
+def _fileSignature(obsfile):
+    fstat = os.stat(obsfile)
+    return fstat.st_mtime, fstat.st_size
+
+
+def readStreamCache(obsfile, cachedir, headonly=False):
+    '''
+    Returns the Stream of obsfile from the cache in cachedir. Returns None if there is
+    no valid cache for obsfile.
+
+    :param: obsfile, data file the cache was written for
+    :type: string
+
+    :param: cachedir, directory of the cache
+    :type: string
+
+    :param: headonly, only read the headers (traces without data)
+    :type: bool
+    '''
+    hdrfile, datafile = _cacheFilenames(obsfile, cachedir)
+    if not os.path.isfile(hdrfile) or not os.path.isfile(datafile):
+        return
+
+    try:
+        with open(hdrfile, 'rb') as infile:
+            header = pickle.load(infile)
+    except Exception as e:
+        print('Could not read cache file %s: %s' % (hdrfile, e))
+        return
+    if (header.get('version') != CACHE_VERSION or
+            header.get('signature') != _fileSignature(obsfile)):
+        return
+
+    if headonly:
+        return Stream([Trace(header=stats) for stats in header['stats']])
+
+    # copy on write, changes of the data are not written to the cache
+    data = np.load(datafile, mmap_mode='c')
+    traces = []
+    for stats, offset in zip(header['stats'], header['offsets']):
+        traces.append(Trace(data=np.asarray(data[offset:offset + stats.npts]), header=stats))
+    return Stream(traces)
+
+
+def writeStreamCache(stream, obsfile, cachedir):
+    '''
+    Writes the Stream read from obsfile to the cache in cachedir.
+
+    :param: stream
+    :type: `~obspy.core.stream.Stream`
+
+    :param: obsfile, data file the stream was read from
+    :type: string
+
+    :param: cachedir, directory of the cache
+    :type: string
+    '''
+    hdrfile, datafile = _cacheFilenames(obsfile, cachedir)
+    try:
+        if not os.path.isdir(cachedir):
+            os.makedirs(cachedir)
+        stats = []
+        offsets = []
+        offset = 0
+        for trace in stream:
+            stats.append(trace.stats.copy())
+            offsets.append(offset)
+            offset += trace.stats.npts
+        if os.path.isfile(hdrfile):
+            os.remove(hdrfile)
+        if len(stream) > 0:
+            data = np.concatenate([trace.data for trace in stream])
+        else:
+            data = np.zeros(0, dtype=np.float32)
+        np.save(datafile, data)
+        # the header file is written last, it marks the cache as complete
+        with open(hdrfile, 'wb') as outfile:
+            pickle.dump({'version': CACHE_VERSION,
+                         'signature': _fileSignature(obsfile),
+                         'stats': stats,
+                         'offsets': offsets}, outfile, 2)
+    except (IOError, OSError) as e:
+        print('Could not write cache for file %s: %s' % (obsfile, e))
@@ -20,14 +20,14 @@ def _pickle_method(m):
         return getattr, (m.im_self, m.im_func.func_name)
 
     
-def worker(func, input, cores='max', async=False):
+def worker(func, input, cores='max', asynchronous=False):
     import multiprocessing
 
     if cores == 'max':
         cores = multiprocessing.cpu_count()
 
     pool = multiprocessing.Pool(cores)
-    if async == True:
+    if asynchronous == True:
         result = pool.map_async(func, input)
     else:
         result = pool.map(func, input)
@@ -35,6 +35,81 @@ def worker(func, input, cores='max', async=False):
     return result
 
 
+def iworker(func, input, cores='max', chunksize=1):
+    '''
+    Generator version of worker. Results are yielded as soon as they are finished
+    (in arbitrary order) so that they can be processed while the pool is still working.
+
+    :param: chunksize, number of tasks sent to a process at once
+    :type: int
+    '''
+    import multiprocessing
+
+    if cores == 'max':
+        cores = multiprocessing.cpu_count()
+
+    pool = multiprocessing.Pool(cores)
+    try:
+        for result in pool.imap_unordered(func, input, chunksize):
+            yield result
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+
+def iworkerPrefetch(func, input, prefetch, cores='max', threads=None, batchsize=None):
+    '''
+    Version of iworker for I/O bound tasks. For every item of input, prefetch(item) is called by a pool
+    of threads (e.g. reading a file, so that the latency of the file system is hidden), then
+    func((item, prefetch(item))) is called by a pool of processes. Results are yielded in arbitrary order.
+
+    The items are processed in batches, the next batch is prefetched while the current one is processed.
+
+    :param: threads, number of threads used for prefetching, default: 2 * cores
+    :type: int
+
+    :param: batchsize, number of items per batch, default: 2 * cores
+    :type: int
+    '''
+    import multiprocessing
+    from multiprocessing.pool import ThreadPool
+
+    if cores == 'max':
+        cores = multiprocessing.cpu_count()
+    if threads is None:
+        threads = 2 * cores
+    if batchsize is None:
+        batchsize = 2 * cores
+
+    input = list(input)
+    batches = [input[index:index + batchsize] for index in range(0, len(input), batchsize)]
+    if len(batches) == 0:
+        return
+
+    threadpool = ThreadPool(threads)
+    pool = multiprocessing.Pool(cores)
+    try:
+        pending = threadpool.map_async(prefetch, batches[0])
+        for index, batch in enumerate(batches):
+            prefetched = pending.get()
+            if index + 1 < len(batches):
+                pending = threadpool.map_async(prefetch, batches[index + 1])
+            for result in pool.imap_unordered(func, zip(batch, prefetched)):
+                yield result
+        threadpool.close()
+        pool.close()
+    except:
+        threadpool.terminate()
+        pool.terminate()
+        raise
+    finally:
+        threadpool.join()
+        pool.join()
+
+
 def full_range(stream):
     '''
     takes a stream object and returns the latest end and the earliest start
@@ -309,6 +384,173 @@ def getsignalwin(t, t1, tsignal):
     return isignal
 
 
+def getnoisewinIndices(t, t1, tnoise, tgap):
+    '''
+    Index version of getnoisewin for arrays of onset times. Returns the first index and the
+    index after the last sample of the noise window for each t1 (empty if start >= stop).
+
+    :param: t, array of time stamps (increasing)
+    :type:  numpy array
+
+    :param: t1, times from which relativ to them noise windows are extracted
+    :type: numpy array
+
+    :param: tnoise, length of time window [s] for noise part extraction
+    :type: float or numpy array
+
+    :param: tgap, safety gap between t1 (onset) and noise window
+    :type: float or numpy array
+    '''
+    start = np.searchsorted(t, np.maximum(t1 - tnoise - tgap, 0), side='left')
+    stop = np.searchsorted(t, np.maximum(t1 - tgap, 0), side='right')
+    return start, stop
+
+
+def getsignalwinIndices(t, t1, tsignal):
+    '''
+    Index version of getsignalwin for arrays of onset times. Returns the first index and the
+    index after the last sample of the signal window for each t1 (empty if start >= stop).
+
+    :param: t, array of time stamps (increasing)
+    :type:  numpy array
+
+    :param: t1, times from which relativ to them signal windows are extracted
+    :type: numpy array
+
+    :param: tsignal, length of time window [s] for signal level calculation
+    :type: float or numpy array
+    '''
+    start = np.searchsorted(t, t1, side='left')
+    stop = np.searchsorted(t, np.minimum(t1 + tsignal, len(t)), side='right')
+    return start, stop
+
+
+def _windowMask(start, stop, nsamples):
+    '''
+    Returns a boolean array (ntraces x nsamples) which is True inside [start, stop) of each trace.
+    '''
+    index = np.arange(nsamples)
+    return (index >= start[:, None]) & (index < np.minimum(stop, nsamples)[:, None])
+
+
+def _timeArray(npts, delta, sampling_rate=None):
+    if sampling_rate is None:
+        sampling_rate = 1. / delta
+    return np.arange(0, npts / sampling_rate, delta)
+
+
+def getSNRArray(data, delta, TSNR, t1, sampling_rate=None):
+    '''
+    Batched version of getSNR for all traces of a 2-D array (ntraces x nsamples) with the same
+    sampling. Noise and signal windows are calculated as index ranges for each trace.
+    Returns arrays of SNR, SNR [dB] and noiselevel. All three are NaN for traces with an empty
+    noise or signal window (getSNR returns None in that case).
+
+    :param: data, time series (one trace per row)
+    :type:  `~numpy.ndarray`
+
+    :param: delta, sampling interval [s]
+    :type: float
+
+    :param: TSNR, length of time windows [s] around t1 (onset) used to determine SNR
+    :type: tuple (T_noise, T_gap, T_signal), each can be a float or an array (one value per trace)
+
+    :param: t1, initial times (onsets) from which noise and signal windows are calculated
+    :type: `~numpy.ndarray`
+    '''
+    x = np.atleast_2d(np.asarray(data, dtype=np.float64))
+    ntraces, nsamples = x.shape
+    t1 = np.broadcast_to(np.asarray(t1, dtype=np.float64), (ntraces,))
+    t = _timeArray(nsamples, delta, sampling_rate)
+
+    noisemask = _windowMask(*getnoisewinIndices(t, t1, TSNR[0], TSNR[1]), nsamples=nsamples)
+    signalmask = _windowMask(*getsignalwinIndices(t, t1, TSNR[2]), nsamples=nsamples)
+    nnoise = noisemask.sum(axis=1)
+    valid = (nnoise > 0) & signalmask.any(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # demean over entire waveform
+        x = x - (np.where(noisemask, x, 0).sum(axis=1) / nnoise)[:, None]
+        noiselevel = np.where(noisemask, np.abs(x), -np.inf).max(axis=1)
+        signallevel = np.where(signalmask, np.abs(x), -np.inf).max(axis=1)
+        SNR = np.where(noiselevel == 0, np.nan, signallevel / noiselevel)
+        SNRdB = 10 * np.log10(SNR)
+
+    for array in (SNR, SNRdB, noiselevel):
+        array[~valid] = np.nan
+    return SNR, SNRdB, noiselevel
+
+
+def earllatepickerArray(data, delta, nfac, TSNR, Pick1, sampling_rate=None):
+    '''
+    Batched version of earllatepicker for all traces of a 2-D array (ntraces x nsamples) with the
+    same sampling. Returns arrays of earliest and latest possible picks and symmetric pick errors.
+    Values are NaN where earllatepicker returns None or NaN.
+
+    :param: data, time series (one trace per row)
+    :type:  `~numpy.ndarray`
+
+    :param: delta, sampling interval [s]
+    :type: float
+
+    :param: nfac (noise factor), nfac times noise level to calculate latest possible pick
+    :type: int
+
+    :param: TSNR, length of time windows around pick used to determine SNR [s]
+    :type: tuple (T_noise, T_gap, T_signal), each can be a float or an array (one value per trace)
+
+    :param: Pick1, initial (most likely) onset times
+    :type: `~numpy.ndarray`
+    '''
+    x = np.atleast_2d(np.asarray(data, dtype=np.float64))
+    ntraces, nsamples = x.shape
+    Pick1 = np.broadcast_to(np.asarray(Pick1, dtype=np.float64), (ntraces,))
+    t = _timeArray(nsamples, delta, sampling_rate)
+
+    noisemask = _windowMask(*getnoisewinIndices(t, Pick1, TSNR[0], TSNR[1]), nsamples=nsamples)
+    sstart, sstop = getsignalwinIndices(t, Pick1, TSNR[2])
+    sstop = np.maximum(np.minimum(sstop, min(len(t), nsamples)), sstart)
+    signalmask = _windowMask(sstart, sstop, nsamples)
+    nnoise = noisemask.sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # remove mean and calculate noise level
+        x = x - (np.where(noisemask, x, 0).sum(axis=1) / nnoise)[:, None]
+        nlevel = np.sqrt(np.where(noisemask, x ** 2, 0).sum(axis=1) / nnoise) * nfac
+        # latest possible pick: first sample in signal window exceeding the noise level
+        exceeds = signalmask & ((x > nlevel[:, None]) | (x < -nlevel[:, None]))
+        found = exceeds.any(axis=1)
+        LPick = np.where(found, t[np.argmax(exceeds, axis=1)], np.nan)
+
+        # earliest possible pick: half period in front of Pick1, the mean half period is
+        # determined from the zero crossings in the (demeaned) signal window
+        nsignal = signalmask.sum(axis=1)
+        y = x - (np.where(signalmask, x, 0).sum(axis=1) / nsignal)[:, None]
+        pos = y > 0
+        crossings = (pos[:, :-1] != pos[:, 1:]) & signalmask[:, :-1] & signalmask[:, 1:]
+        ncross = crossings.sum(axis=1)
+        first = np.argmax(crossings, axis=1)
+        last = crossings.shape[1] - 1 - np.argmax(crossings[:, ::-1], axis=1)
+        T0 = (last - first) / (ncross - 1.) * delta
+        EPick = np.where(ncross > 1, Pick1 - T0, np.nan)
+
+    # less than two zero crossings: double the signal window as done in earllatepicker
+    for index in np.flatnonzero(found & np.isnan(EPick)):
+        pis = np.arange(sstart[index], sstop[index])
+        while np.isnan(EPick[index]):
+            if pis[-1] + 1 + len(pis) >= nsamples:
+                break
+            pis = np.arange(pis[0], pis[-1] + 1 + len(pis))
+            zc = crossings_nonzero_all(x[index, pis] - x[index, pis].mean())
+            if len(zc) > 1:
+                EPick[index] = Pick1[index] - np.mean(np.diff(zc)) * delta
+
+    LPick[~found] = np.nan
+    EPick[~found] = np.nan
+    PickError = symmetrize_error(Pick1 - EPick, LPick - Pick1)
+    return EPick, LPick, PickError
+
+
 def symmetrize_error(dte, dtl):
     """
     takes earliest and latest possible pick and returns the symmetrized pick
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+#   Copyright 2017 Marcel Paffrath (Ruhr-Universitaet Bochum, Germany)
+#
+#   This file is part of ActiveSeismoPick3D
+#----------------------------------------------------------------------------
+'''
+Writers for VTK files (e.g. for paraview) from NumPy arrays. Supported formats (vtkformat):
+
+- 'ascii': legacy VTK file, ASCII
+- 'binary': legacy VTK file, binary (big endian)
+- 'xml': VTK XML file (.vti for structured points, .vtp for poly data) with raw appended data
+
+All data arrays are written with one write call each.
+'''
+
+import os
+import numpy as np
+
+VTK_FORMATS = ('ascii', 'binary', 'xml')
+
+_LEGACY_TYPES = {'float32': 'float', 'float64': 'double', 'int32': 'int', 'int64': 'long'}
+_XML_TYPES = {'float32': 'Float32', 'float64': 'Float64', 'int32': 'Int32', 'int64': 'Int64'}
+_XML_EXTENSIONS = {'ImageData': '.vti', 'PolyData': '.vtp'}
+
+
+def _checkFormat(vtkformat):
+    if not vtkformat in VTK_FORMATS:
+        raise ValueError('Unknown VTK format %s, use one of %s' % (vtkformat, VTK_FORMATS))
+
+
+def getFilename(filename, vtkformat, dataset='PolyData'):
+    '''
+    Returns the name of the file written for filename. VTK XML files get the extension of their
+    dataset ('ImageData': .vti, 'PolyData': .vtp).
+    '''
+    _checkFormat(vtkformat)
+    if vtkformat == 'xml':
+        return os.path.splitext(filename)[0] + _XML_EXTENSIONS[dataset]
+    return filename
+
+
+def _getDtype(values):
+    '''
+    Returns the type used for values in binary files (int32 for integer values, else float32).
+    '''
+    return np.dtype(np.int32) if np.issubdtype(values.dtype, np.integer) else np.dtype(np.float32)
+
+
+def _legacyHeader(title, vtkformat, dataset):
+    return '# vtk DataFile Version 3.1\n%s\n%s\nDATASET %s\n' % (title, vtkformat.upper(), dataset)
+
+
+def _legacyArray(array, vtkformat, fmt):
+    '''
+    Returns the data of array for a legacy VTK file (fmt: ASCII format of one row including the newline).
+    '''
+    if vtkformat == 'ascii':
+        rows = len(array) if array.ndim > 1 else array.size
+        return ((fmt * rows) % tuple(array.ravel().tolist())).encode('ascii')
+    return array.astype(_getDtype(array).newbyteorder('>')).tobytes() + b'\n'
+
+
+def _legacyPointData(pointData, vtkformat):
+    content = []
+    for name, values in pointData:
+        values = np.asarray(values).ravel()
+        dtype = _getDtype(values)
+        content.append(('SCALARS %s %s %d\n' % (name, _LEGACY_TYPES[dtype.name], 1)).encode('ascii'))
+        content.append(b'LOOKUP_TABLE default\n')
+        fmt = '%10d\n' if dtype.kind == 'i' else '%10f\n'
+        content.append(_legacyArray(values, vtkformat, fmt))
+    return content
+
+
+def _writeXML(filename, dataset, datasetAttributes, pieces):
+    '''
+    Writes a VTK XML file with raw appended data.
+
+    :param: pieces, list of (tag, attributes, children) with children being either a list of pieces or
+    a list of (attributes, array) for DataArrays
+    :type: list
+    '''
+    blocks = []
+
+    def element(tag, attributes, children, indent):
+        attrs = ''.join(' %s="%s"' % item for item in attributes)
+        lines = ['%s<%s%s>' % (indent, tag, attrs)]
+        for child in children:
+            if len(child) == 2:
+                childattributes, array = child
+                array = np.asarray(array)
+                array = array.astype(_getDtype(array).newbyteorder('<'))
+                offset = sum(8 + block.nbytes for block in blocks)
+                blocks.append(array)
+                attrs = ''.join(' %s="%s"' % item for item in
+                                [('type', _XML_TYPES[array.dtype.name])] + childattributes
+                                + [('format', 'appended'), ('offset', offset)])
+                lines.append('%s  <DataArray%s/>' % (indent, attrs))
+            else:
+                lines.extend(element(child[0], child[1], child[2], indent + '  '))
+        lines.append('%s</%s>' % (indent, tag))
+        return lines
+
+    lines = ['<?xml version="1.0"?>',
+             '<VTKFile type="%s" version="1.0" byte_order="LittleEndian" header_type="UInt64">' % dataset]
+    lines.extend(element(dataset, datasetAttributes, pieces, '  '))
+    lines.append('  <AppendedData encoding="raw">')
+
+    with open(filename, 'wb') as outfile:
+        outfile.write(('\n'.join(lines) + '\n   _').encode('ascii'))
+        for block in blocks:
+            outfile.write(np.array([block.nbytes], dtype='<u8').tobytes())
+            outfile.write(block.tobytes())
+        outfile.write(b'\n  </AppendedData>\n</VTKFile>\n')
+
+
+def writeStructuredPoints(filename, title, dimensions, origin, spacing, scalars, name, vtkformat='ascii'):
+    '''
+    Writes scalar point data on a regular grid (legacy STRUCTURED_POINTS, XML ImageData).
+    Returns the name of the written file.
+
+    :param: dimensions, number of points (nX, nY, nZ)
+    :type: tuple
+
+    :param: scalars, values ordered Z (outer loop), Y, X (inner loop)
+    :type: `~numpy.ndarray`
+    '''
+    filename = getFilename(filename, vtkformat, 'ImageData')
+    scalars = np.asarray(scalars, dtype=float).ravel()
+    if vtkformat == 'xml':
+        extent = ' '.join('0 %d' % (number - 1) for number in dimensions)
+        pointData = ('PointData', [('Scalars', name)], [([('Name', name)], scalars)])
+        piece = ('Piece', [('Extent', extent)], [pointData])
+        _writeXML(filename, 'ImageData', [('WholeExtent', extent),
+                                          ('Origin', ' '.join(repr(float(value)) for value in origin)),
+                                          ('Spacing', ' '.join(repr(float(value)) for value in spacing))], [piece])
+        return filename
+
+    with open(filename, 'wb') as outfile:
+        header = _legacyHeader(title, vtkformat, 'STRUCTURED_POINTS')
+        header += 'DIMENSIONS %d %d %d\n' % tuple(dimensions)
+        header += 'ORIGIN %f %f %f\n' % tuple(origin)
+        header += 'SPACING %f %f %f\n' % tuple(spacing)
+        header += 'POINT_DATA %15d\n' % len(scalars)
+        outfile.write(header.encode('ascii'))
+        outfile.write(b''.join(_legacyPointData([(name, scalars)], vtkformat)))
+    return filename
+
+
+def writePolyData(filename, title, points, vertices=False, lines=None, pointData=(), vtkformat='ascii'):
+    '''
+    Writes points as poly data (legacy POLYDATA, XML PolyData). Returns the name of the written file.
+
+    :param: points, (x, y, z) of all points
+    :type: `~numpy.ndarray` (N, 3)
+
+    :param: vertices, add one vertex for every point
+    :type: bool
+
+    :param: lines, number of points of every line (lines consist of consecutive points)
+    :type: list
+
+    :param: pointData, [(name, values), ...], integer values are written as int, all others as float
+    :type: list
+    '''
+    filename = getFilename(filename, vtkformat, 'PolyData')
+    points = np.asarray(points, dtype=float).reshape(-1, 3)
+    pointData = [(name, np.asarray(values).ravel()) for name, values in pointData]
+    nPoints = len(points)
+    cells = []
+    if vertices:
+        cells.append(('VERTICES', 'Verts', np.ones(nPoints, dtype=np.int32)))
+    if lines is not None:
+        cells.append(('LINES', 'Lines', np.asarray(lines, dtype=np.int32)))
+
+    if vtkformat == 'xml':
+        children = []
+        if pointData:
+            children.append(('PointData', [('Scalars', pointData[0][0])],
+                             [([('Name', name)], values) for name, values in pointData]))
+        children.append(('Points', [], [([('NumberOfComponents', 3)], points)]))
+        numbers = [('NumberOfPoints', nPoints)]
+        for _, tag, counts in cells:
+            connectivity = np.arange(counts.sum(), dtype=np.int32)
+            children.append((tag, [], [([('Name', 'connectivity')], connectivity),
+                                       ([('Name', 'offsets')], np.cumsum(counts, dtype=np.int32))]))
+            numbers.append(('NumberOf%s' % tag, len(counts)))
+        piece = ('Piece', numbers, children)
+        _writeXML(filename, 'PolyData', [], [piece])
+        return filename
+
+    with open(filename, 'wb') as outfile:
+        header = _legacyHeader(title, vtkformat, 'POLYDATA')
+        header += 'POINTS %15d float\n' % nPoints
+        content = [header.encode('ascii'), _legacyArray(points, vtkformat, '%10f %10f %10f \n')]
+        for keyword, _, counts in cells:
+            content.append(('%s %15d %15d\n' % (keyword, len(counts), len(counts) + counts.sum())).encode('ascii'))
+            content.append(_legacyCells(counts, keyword, vtkformat))
+        if pointData:
+            content.append(('POINT_DATA %15d\n' % nPoints).encode('ascii'))
+            content.extend(_legacyPointData(pointData, vtkformat))
+        outfile.write(b''.join(content))
+    return filename
+
+
+def _legacyCells(counts, keyword, vtkformat):
+    '''
+    Returns the cells (number of points followed by the point indices) for a legacy VTK file.
+    '''
+    ends = np.cumsum(counts)
+    if vtkformat == 'ascii':
+        if keyword == 'VERTICES':
+            cells = np.column_stack((counts, ends - counts))
+            return (('%10d %10d\n' * len(cells)) % tuple(cells.ravel().tolist())).encode('ascii')
+        return ''.join(['%d ' % count + '%d ' * count % tuple(range(end - count, end)) + '\n'
+                        for count, end in zip(counts.tolist(), ends.tolist())]).encode('ascii')
+    cells = np.insert(np.arange(ends[-1] if len(ends) else 0, dtype=np.int32), ends - counts, counts)
+    return _legacyArray(cells, vtkformat, None)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+'''
+Regression tests for the vectorized HOS characteristic function (calcHOS)
+against the former per-sample loop of HOScf.calcCF.
+'''
+
+import numpy as np
+import pytest
+
+from asp3d.util.charfuns import calcHOS
+
+
+def _calcHOSLoop(data, ilta, order):
+    '''
+    Former loop implementation of HOScf.calcCF for a single trace.
+    '''
+    xnp = np.array(data, dtype=np.float64)
+    xnp[np.isnan(xnp)] = 0
+    y = np.power(xnp, order)
+    y1 = np.power(xnp, 2)
+    lta = y[0]
+    lta1 = y1[0]
+    LTA = np.zeros(len(xnp))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for j in range(0, len(xnp)):
+            if j < 4:
+                LTA[j] = 0
+            elif j <= ilta:
+                lta = (y[j] + lta * (j - 1)) / j
+                lta1 = (y1[j] + lta1 * (j - 1)) / j
+            else:
+                lta = (y[j] - y[j - ilta]) / ilta + lta
+                lta1 = (y1[j] - y1[j - ilta]) / ilta + lta1
+            if order == 3:
+                LTA[j] = lta / np.power(lta1, 1.5)
+            elif order == 4:
+                LTA[j] = lta / np.power(lta1, 2)
+    LTA[np.isnan(LTA)] = 0
+    return LTA
+
+
+@pytest.mark.parametrize('order', [3, 4])
+@pytest.mark.parametrize('ilta', [2, 4, 25, 300, 2000])
+def test_calcHOS_single_trace(order, ilta):
+    data = np.random.RandomState(ilta + order).randn(1000)
+    np.testing.assert_allclose(calcHOS(data, ilta, order), _calcHOSLoop(data, ilta, order),
+                               rtol=1e-7, atol=1e-10)
+
+
+@pytest.mark.parametrize('order', [3, 4])
+def test_calcHOS_array(order):
+    data = np.random.RandomState(order).randn(12, 800)
+    data[3, 100] = np.nan
+    data[5] = 0.
+    expected = np.array([_calcHOSLoop(trace, 50, order) for trace in data])
+    np.testing.assert_allclose(calcHOS(data, 50, order), expected, rtol=1e-7, atol=1e-10)
+
+
+def test_calcHOS_invalid_order():
+    with pytest.raises(ValueError):
+        calcHOS(np.zeros(10), 5, 2)
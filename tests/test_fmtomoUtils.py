@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+'''
+Tests of the parallel forward calculation of Tomo3d (chunk queue and merge of the chunk outputs)
+using stub FMTOMO executables.
+'''
+
+import os
+import stat
+import sys
+
+import numpy as np
+import pytest
+
+from asp3d.util.fmtomoUtils import Tomo3d
+
+NSRC = 23
+NTRACES = 359
+
+# Stub of the FMM code: the travel time of each trace is sourcecoord * 10000 + receivercoord, so the
+# merged outputs show if the records were assigned to the right global trace and source IDs.
+FM3D = '''#!{python}
+import random
+import time
+
+with open('sources.in') as infile:
+    src = infile.read().split('\\n')
+nsrc = int(src[0])
+srccoords = [float(src[2 + 6 * index].split()[0]) for index in range(nsrc)]
+with open('receivers.in') as infile:
+    rec = infile.read().split('\\n')
+nrec = int(rec[0])
+time.sleep(0.01 * nsrc * random.random())
+with open('arrivals.dat', 'w') as arr, open('frechet.dat', 'w') as frech, open('rays.dat', 'w') as rays:
+    for index in range(nrec):
+        reccoord = float(rec[1 + 4 * index].split()[0])
+        source = int(rec[3 + 4 * index])
+        srccoord = srccoords[source - 1]
+        arr.write('%d %d 1 1 %f 0 0\\n' % (index + 1, source, srccoord * 10000 + reccoord))
+        frech.write('%d %d 1 1 2\\n 1 %f\\n 2 %f\\n' % (index + 1, source, srccoord, reccoord))
+        rays.write('%d %d 1 1 1\\n 2 1 0 0\\n %f 0 0\\n %f 1 1\\n' % (index + 1, source, srccoord, reccoord))
+'''
+
+
+def _writeExecutable(filename, content):
+    with open(filename, 'w') as outfile:
+        outfile.write(content)
+    os.chmod(filename, os.stat(filename).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def _writeSources(filename, nsrc):
+    with open(filename, 'w') as outfile:
+        outfile.write('%d\n' % nsrc)
+        for sourceID in range(1, nsrc + 1):
+            outfile.write('0\n%d.0 1.0 2.0\n1\n1\n0 0\n1\n' % sourceID)
+
+
+def _writeReceivers(filename, sources):
+    with open(filename, 'w') as outfile:
+        outfile.write('%d\n' % len(sources))
+        for index, sourceID in enumerate(sources):
+            outfile.write('%d.0 1.0 2.0\n1\n%d\n1\n' % (index + 1, sourceID))
+
+
+@pytest.fixture
+def fmtomo(tmp_path):
+    '''
+    Returns (fmtomodir, simuldir, sources) of a stub FMTOMO installation and simulation directory,
+    sources being the source ID of every trace.
+    '''
+    fmtomodir = tmp_path / 'fmtomo'
+    simuldir = tmp_path / 'simulation'
+    fmtomodir.mkdir()
+    simuldir.mkdir()
+
+    _writeExecutable(str(fmtomodir / 'fm3d'), FM3D.format(python=sys.executable))
+    _writeExecutable(str(fmtomodir / 'residuals'), '#!/bin/sh\necho 1 2 3\n')
+    for name in ['frechgen', 'invert3d', 'obsdata', 'tomo3d']:
+        _writeExecutable(str(fmtomodir / name), '#!/bin/sh\n')
+    for name in ['frechgen.in', 'invert3d.in', 'mode_set.in', 'obsdata.in', 'residuals.in', 'tomo3d.in']:
+        (fmtomodir / name).write_text(u'')
+
+    # unevenly distributed traces, the sources of the traces are not in order
+    sources = np.random.RandomState(0).randint(1, NSRC + 1, NTRACES)
+    _writeSources(str(simuldir / 'sourcesref.in'), NSRC)
+    _writeReceivers(str(simuldir / 'receivers.in'), sources)
+    for name in ['vgridsref.in', 'interfacesref.in', 'propgrid.in', 'frechet.in']:
+        (simuldir / name).write_text(u'x\n')
+
+    return str(fmtomodir), str(simuldir), sources
+
+
+def _readRecords(filename, nlines):
+    '''
+    Returns the header fields and the following lines (number of lines: nlines(header fields))
+    of all records of a merged FMM output file.
+    '''
+    records = []
+    with open(filename) as infile:
+        lines = infile.read().splitlines()
+    index = 0
+    while index < len(lines):
+        fields = lines[index].split()
+        count = nlines(fields, lines[index + 1:])
+        records.append((fields, lines[index + 1:index + 1 + count]))
+        index += 1 + count
+    return records
+
+
+def _nRayLines(fields, lines):
+    count = 0
+    for section in range(int(fields[4])):
+        count += 1 + int(lines[count].split()[0])
+    return count
+
+
+@pytest.mark.parametrize('nproc, nchunks, balance', [
+    (1, None, 'traces'),
+    (2, None, 'equal'),
+    (3, 5, 'traces'),
+    (4, None, 'runtime'),
+    (2, 100, 'runtime'),
+])
+def test_runTOMO3D_merge(fmtomo, nproc, nchunks, balance):
+    fmtomodir, simuldir, sources = fmtomo
+    tomo = Tomo3d(fmtomodir, simuldir, buildObs=False, balance=balance)
+    tomo.runTOMO3D(nproc, 1, nchunks=nchunks)
+
+    assert tomo.citer == 2
+    # temporary chunk directories are removed
+    assert not [name for name in os.listdir(simuldir) if name.startswith('.proc_')]
+    for iteration in [0, 1]:
+        directory = os.path.join(simuldir, 'it_%d' % iteration)
+
+        arrivals = _readRecords(os.path.join(directory, 'arrivals.dat'), lambda fields, lines: 0)
+        frechet = _readRecords(os.path.join(directory, 'frechet.dat'), lambda fields, lines: int(fields[4]))
+        rays = _readRecords(os.path.join(directory, 'rays.dat'), _nRayLines)
+        for records in [arrivals, frechet, rays]:
+            assert len(records) == NTRACES
+            assert [int(fields[0]) for fields, _ in records] == list(range(1, NTRACES + 1))
+            assert [int(fields[1]) for fields, _ in records] == sources.tolist()
+
+        traceIDs = np.arange(1, NTRACES + 1)
+        np.testing.assert_allclose([float(fields[4]) for fields, _ in arrivals], sources * 10000. + traceIDs)
+        np.testing.assert_allclose([float(lines[0].split()[1]) for _, lines in frechet], sources)
+        np.testing.assert_allclose([float(lines[1].split()[1]) for _, lines in frechet], traceIDs)
+        np.testing.assert_allclose([float(lines[1].split()[0]) for _, lines in rays], sources)
+        np.testing.assert_allclose([float(lines[2].split()[0]) for _, lines in rays], traceIDs)
+
+
+def test_partitionSources_completeness(fmtomo):
+    fmtomodir, simuldir, sources = fmtomo
+    tomo = Tomo3d(fmtomodir, simuldir, buildObs=False)
+    tomo.nchunks = 6
+    for balance in ['equal', 'traces']:
+        tomo.balance = balance
+        tomo.partitionSources()
+        srcIDs = sorted(sum([tomo.srcIDs4Kernel(chunkID) for chunkID in tomo.getChunkIDs()], []))
+        assert srcIDs == list(range(1, NSRC + 1))
+
+
+def test_runQueue_failing_fmm(fmtomo):
+    fmtomodir, simuldir, sources = fmtomo
+    _writeExecutable(os.path.join(fmtomodir, 'fm3d'), '#!/bin/sh\nexit 3\n')
+    tomo = Tomo3d(fmtomodir, simuldir, buildObs=False)
+    with pytest.raises(RuntimeError, match='returned 3'):
+        tomo.runTOMO3D(2, 1)
+
+
+def test_merge_incomplete_output(fmtomo):
+    fmtomodir, simuldir, sources = fmtomo
+    # the FMM code drops the last record of every chunk
+    _writeExecutable(os.path.join(fmtomodir, 'fm3d'),
+                     FM3D.format(python=sys.executable).replace('range(nrec)', 'range(nrec - 1)'))
+    tomo = Tomo3d(fmtomodir, simuldir, buildObs=False)
+    with pytest.raises(ValueError, match='ends after'):
+        tomo.runTOMO3D(2, 1)